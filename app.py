@@ -1,89 +1,81 @@
+from functions.startup import startup_tracer, StartupTracer, LazyModule
+
+# every import below is timed, so the startup report shows which modules slow the cold start
+startup_tracer.start_import_trace()
+
 from typing import Dict, List, Tuple, Union
-from flask import Flask, request, url_for, redirect
+from flask import Flask, request, url_for, redirect, send_from_directory
+from jinja2 import ChoiceLoader, ModuleLoader
 
 import os
 import json
 import toml
-
-import requests
-import py3Dmol
-
-import tidytcells as tt
-import numpy as np
+import hashlib
 
 from io import StringIO
 #from Bio.PDB import PDBParser, PDBIO, Select
 
 from functions.decorators import templated
-from functions.templating import render
-from functions.text import slugify
+from functions.cache import ResponseCache, LRUCache, hash_files
+from functions.compression import compress_response
+from functions.timing import RequestMetrics, start_request_timer, record_request_timing, timed_phase
+from functions.structures import StructureFetcher, StructureFetchError, structure_url
+from functions.generations import AllelesApp, DataReloader, pin_data_generation, reload_authorised
+from functions.profiling import start_profiling, finish_profiling, profiling_authorised, list_profiles, profile_filename
+from functions.fragments import build_motif_fragments, build_simple_motif_html, score_circle
+from functions.variability import build_variability_lookup, build_polymorphism_information
+from functions.population import build_population_frequencies
+from functions.adr import build_adr_index, adr_index_fields
+from functions.structure_index import build_structure_index
+from functions.motif_similarity import build_motif_tensor, similarity_metrics
+from functions.templating import render, precompiled_templates_current
+from functions.naming import build_name_maps
 from functions.forms import get_request_data
+from functions.pockets import pockets, map_pocket, netmhcpan_pocket_residues, netmhc_pocket_labels, gdomain_length
+from functions.sequences import clean_sequence, build_sequence_encodings
+from functions.pmbec import build_pmbec_matrix
+from functions.stats import build_stats
+from functions.pocket_distances import load_pocket_distances, pocket_distance_metrics
 
 import handlers
+# imported by the allele search handler on first use, listed here so it's reported with the other deferred imports
+from handlers.allele_lookup import tt as tidytcells
 
 import sys
 
+startup_tracer.stop_import_trace()
 
-def build_pmbec_matrix():
-    with open ('data/pmbec_covariance_matrix.mat', 'r') as f:
-        raw_matrix = f.read()
-
-    aa_list = []
-    new_matrix = {}
-
-    max_val = 0.0
-    min_val = 10.0
-
-    for i, line in enumerate(raw_matrix.split('\n')):   
-        if i == 0:
-            aa_list = line.split()
-        else:
-            elements = [element for element in line.split()]
-            if len(elements) > 1:
-                new_matrix[elements[0]] = {}
-                for j, element in enumerate(elements[1:]):
-                    new_matrix[elements[0]][aa_list[j]] = element
-                    if float(element) > max_val:
-                        max_val = float(element)
-                    elif float(element) < min_val:
-                        min_val = float(element)
-
-
-    # now perform min max normalisation of the matrix
-    normalised_matrix = {}
+# these are only used by particular routes, so they're imported on first use unless DEFER_IMPORTS is turned off
+py3Dmol = LazyModule('py3Dmol')
 
-    for aa in new_matrix:
-        normalised_matrix[aa] = {}
-        for sub in new_matrix[aa]:
-            normalised_matrix[aa][sub] = round((float(new_matrix[aa][sub]) - min_val) / (max_val - min_val) *10, 1)
+deferred_modules = [py3Dmol, tidytcells]
 
-    return normalised_matrix
 
-matrix = build_pmbec_matrix()
+with startup_tracer.phase('build_pmbec_matrix', 'build'):
+    matrix = build_pmbec_matrix()
 
 
 page_size = 25
 
-pockets = {
-        "a": ["5","59","63","66","159","163","167","171"],
-        "b": ["7","9","24","25","33","34","45","60","67","70"],
-        "c": ["73","74"],
-        "d": ["99","114","155","156"],
-        "e": ["97","114","147","152"],
-        "f": ["77","80","81","84","95","116","123","143","146","147"]
-}
+# the most results the similarity and distance lookups will return
+max_result_count = 100
 
 
-def map_pocket(position:int) -> str:
-    for pocket in pockets:
-        if str(position) in pockets[pocket]:
-            return pocket
-    return 'o'
-
-netmhcpan_pocket_residues = [7,9,24,45,59,62,63,66,67,69,70,73,74,76,77,80,81,84,95,97,99,114,116,118,143,147,150,152,156,158,159,163,167,171]
-
-netmhc_pocket_labels = [map_pocket(position) for position in netmhcpan_pocket_residues]
+json_datasets = [
+    'species',
+    'sets', 
+    'peptide_length_distributions', 
+    'simplified_motifs', 
+    'sorted_amino_acid_distributions', 
+    'polymorphisms_and_motifs',
+    'hla_class_i_variability', 
+    '1k_allele_groups', 
+    '1k_alleles',
+    'hla_spread',
+    'hla_adr'
+]
 
+json_dataset_folders = ['protein_alleles','pocket_pseudosequences', 'gdomain_sequences', 'allele_groups', 'reference_alleles']
 
 
 def zero_pad(number:int) -> str:
@@ -93,6 +85,17 @@ def zero_pad(number:int) -> str:
         return str(number)
 
 
+def parse_count(raw_count:str, default:int=10, maximum:int=max_result_count) -> int:
+    """
+    This function parses a count of results or a page number from the querystring, falling back to the default for anything which isn't a number and clamping it to between 1 and the maximum.
+    """
+    try:
+        count = int(raw_count)
+    except (TypeError, ValueError):
+        count = default
+    return min(max(count, 1), maximum)
+
+
 def pagination(records:List, page_size:int, page:int) -> Tuple[List, int]:
     start = (page - 1) * page_size
     end = page * page_size
@@ -100,13 +103,13 @@ def pagination(records:List, page_size:int, page:int) -> Tuple[List, int]:
     return records[start:end], page_count
 
 
-def load_json_data(dataset_name:str) -> Dict:
+def load_json_data(dataset_name:str, data_dir:str='data') -> Dict:
     """
     This is the function which loads the generated datasets which are used by the site.
 
     By loading them in here, we can reduce S3 calls and speed the app up significantly.
     """
-    filename = f"data/{dataset_name}.json"
+    filename = f"{data_dir}/{dataset_name}.json"
     if os.path.exists(filename):
         with open(filename, 'r') as f:
             return json.load(f)
@@ -114,13 +117,13 @@ def load_json_data(dataset_name:str) -> Dict:
         return {}
 
 
-def load_json_data_folder(dataset_name:str) -> Dict:
+def load_json_data_folder(dataset_name:str, data_dir:str='data') -> Dict:
     """
     This is the function which loads the generated datasets which are used by the site.
 
     By loading them in here, we can reduce S3 calls and speed the app up significantly.
     """
-    folder_name = f"data/{dataset_name}"
+    folder_name = f"{data_dir}/{dataset_name}"
     if os.path.exists(folder_name):
         data = {}
         for file in os.listdir(folder_name):
@@ -135,107 +138,226 @@ def load_pandas_data(dataset_name:str) -> Dict:
     pass
 
 
-def process_species_count(data:Dict) -> Dict:
-    completed_species = len(data['species'])
-    ipd_species = []
-    for locus in data['protein_alleles']:
-        species_stem = locus.split('_')[0]
-        if species_stem not in ipd_species:
-            ipd_species.append(species_stem)
-    return {
-        'completed_species': completed_species,
-        'uncompleted_species': len(ipd_species) - completed_species,
-        'total_species': len(ipd_species),
-    }
+def compute_dataset_digest(dataset_name:str, data_dir:str='data') -> str:
+    """
+    This function hashes the contents of a json dataset, or of every file in a dataset folder.
 
-def process_locus_count(data:Dict) -> Dict:
-    completed_loci = [len(data['species'][species]['loci']) for species in data['species']]
-    ipd_loci = len(data['protein_alleles'].keys())
-    return {
-        'completed_loci': sum(completed_loci),
-        'uncompleted_loci': ipd_loci - sum(completed_loci),
-        'total_loci': ipd_loci
-    }
+    Args:
+        dataset_name (string): the name of the json dataset or dataset folder
+        data_dir (string): the folder the datasets are loaded from
 
+    Returns:
+        string: a hex digest of the dataset files
+    """
+    dataset_hash = hashlib.sha1()
+    if os.path.isdir(f"{data_dir}/{dataset_name}"):
+        filenames = [f"{data_dir}/{dataset_name}/{file}" for file in sorted(os.listdir(f"{data_dir}/{dataset_name}"))]
+    else:
+        filenames = [f"{data_dir}/{dataset_name}.json"]
+    for filename in filenames:
+        if os.path.exists(filename):
+            dataset_hash.update(filename.encode('utf-8'))
+            with open(filename, 'rb') as f:
+                dataset_hash.update(f.read())
+    return dataset_hash.hexdigest()
 
-def process_allele_group_count(data:Dict, locus:str) -> Dict:
-    allele_groups = {}
-    for allele in data['protein_alleles'][locus]:
-        allele_group = '_'.join(allele.split('_')[:3])
-        if allele_group not in allele_groups:
-            allele_groups[allele_group] = {'allele_count':0, 'alleles':[], 'variability':'', 'motifs':[], 'motif_count':0, 'structure_count':0, 'structures':[]}
-        allele_groups[allele_group]['allele_count'] += 1
-        allele_groups[allele_group]['alleles'].append(allele)
-    return {
-        'allele_group_count': len(allele_groups),
-        'allele_count': len(data['protein_alleles'][locus]),
-        'allele_groups': allele_groups
-    }
 
+def compute_data_version(dataset_digests:Dict) -> str:
+    """
+    This function combines the digests of each dataset, giving a version for the loaded data.
 
+    The version is used in the cache keys and ETags for rendered pages, so that any change to the data invalidates them.
 
+    Args:
+        dataset_digests (dictionary): the digest of each dataset, keyed by dataset name
 
-def create_app():
+    Returns:
+        string: a hex digest of all of the datasets
     """
-    Creates an instance of the Flask app, and associated configuration and blueprints registration for specific routes. 
+    data_hash = hashlib.sha1()
+    for dataset in sorted(dataset_digests):
+        data_hash.update(f"{dataset}:{dataset_digests[dataset]}".encode('utf-8'))
+    return data_hash.hexdigest()
 
-    Configuration includes
 
-    - Relevant secrets stored in the config.toml file
-    - Storing in configuration a set of credentials for AWS (decided upon by the environment of the application e.g. development, live)
-    
+def process_locus_summary(data:Dict, locus:str) -> Dict:
+    """
+    This function summarises the allele groups of a locus, counting the alleles, structures and motifs for each, so that locus pages only need to slice the summary.
+
+    Args:
+        data (dictionary): the app.data datasets
+        locus (string): the slugified locus e.g. hla_a
+
     Returns:
-            A configured instance of the Flask app
+        dict: the per allele group summary and the totals for the locus
+    """
+    raw_allele_groups = data['allele_groups'][locus]
+    raw_structure_sets = data['sets']['allele_groups']
+
+    allele_group_summary = {}
+    allele_count = 0
+    structure_count = 0
+    motif_count = 0
+
+    for allele_group in raw_allele_groups:
+        allele_group_summary[allele_group] = {
+            'allele_count': len(raw_allele_groups[allele_group]),
+            'structure_count': 0,
+            'motif_count': 0
+        }
+        allele_count += len(raw_allele_groups[allele_group])
+
+    for allele_group in raw_structure_sets:
+        if allele_group in allele_group_summary:
+            allele_group_summary[allele_group]['structure_count'] = raw_structure_sets[allele_group]['count']
+            structure_count += raw_structure_sets[allele_group]['count']
+
+    for motif in data['simplified_motifs']:
+        allele_group = '_'.join(motif.split('_')[0:3])
+        if allele_group in allele_group_summary:
+            allele_group_summary[allele_group]['motif_count'] += 1
+            motif_count += 1
+
+    return {
+        'allele_groups': allele_group_summary,
+        'allele_group_count': len(raw_allele_groups),
+        'allele_count': allele_count,
+        'structure_count': structure_count,
+        'motif_count': motif_count
+    }
+
+
+def compute_dataset_digests(data_dir:str='data') -> Dict[str, str]:
+    return {dataset: compute_dataset_digest(dataset, data_dir) for dataset in json_datasets + json_dataset_folders}
 
+
+def load_data(config:Dict, tracer:StartupTracer=startup_tracer) -> Dict:
     """
-    app = Flask(__name__)
-
-    app.config.from_file('config.toml', toml.load)
-    # removing whitespace from templated returns    
-    app.jinja_env.trim_blocks = True
-    app.jinja_env.lstrip_blocks = True
-
-    json_datasets = [
-        'species',
-        'sets', 
-        'peptide_length_distributions', 
-        'simplified_motifs', 
-        'sorted_amino_acid_distributions', 
-        'polymorphisms_and_motifs',
-        'hla_class_i_variability', 
-        '1k_allele_groups', 
-        '1k_alleles',
-        'hla_spread',
-        'hla_adr'
-    ]
-    
-    json_dataset_folders = ['protein_alleles','pocket_pseudosequences', 'gdomain_sequences', 'allele_groups', 'reference_alleles']
+    This function loads a complete generation of the datasets, along with the stats and derived datasets built from them.
+
+    It's used both at startup and to build a new generation in the background when the data is reloaded.
+
+    Args:
+        config (dictionary): the app configuration
+        tracer (StartupTracer): the tracer to record the time taken by each phase with
 
+    Returns:
+        dict: the datasets, keyed by name, including the 'data_version' they make up
+    """
     pandas_datasets = []
 
-    app.data = {'stats':{}}
+    data_dir = config.get('DATA_DIR', 'data')
+
+    data = {}
 
     with open('forms.json', 'r') as f:
-        app.data['forms'] = json.load(f)
+        data['forms'] = json.load(f)
 
     for dataset in json_datasets:
-        app.data[dataset] = load_json_data(dataset)
+        with tracer.phase(f"load:{dataset}", 'load'):
+            data[dataset] = load_json_data(dataset, data_dir)
 
     for dataset in json_dataset_folders:
-        app.data[dataset] = load_json_data_folder(dataset)
+        with tracer.phase(f"load:{dataset}", 'load'):
+            data[dataset] = load_json_data_folder(dataset, data_dir)
 
     for dataset in pandas_datasets:
-        app.data[dataset] = load_pandas_data(dataset)
+        data[dataset] = load_pandas_data(dataset)
+
+    with tracer.phase('stats', 'build'):
+        data['stats'] = build_stats(data)
+
+    derived_datasets = {
+        'name_maps': lambda: build_name_maps(data),
+        'locus_summaries': lambda: {locus: process_locus_summary(data, locus) for locus in data['allele_groups']},
+        'motif_fragments': lambda: build_motif_fragments(data['simplified_motifs']),
+        'variability_lookup': lambda: build_variability_lookup(data['hla_class_i_variability']),
+        'polymorphism_information': lambda: {},
+        'population_frequencies': lambda: build_population_frequencies(data['1k_alleles']),
+        'adr_index': lambda: build_adr_index(data['hla_adr']),
+        'structure_index': lambda: build_structure_index(data['sets']),
+        'motif_tensor': lambda: build_motif_tensor(data['sorted_amino_acid_distributions']),
+        'sequence_encodings': lambda: build_sequence_encodings(data['protein_alleles']),
+        'comparison_cache': lambda: LRUCache(config.get('COMPARISON_CACHE_SIZE', 4096)),
+        # the matrices are memory mapped, so loading them only reads their headers, they're built from the data folder so are kept in it unless set elsewhere
+        'pocket_distances': lambda: load_pocket_distances(config.get('POCKET_DISTANCE_DIR') or f"{data_dir}/pocket_distances")
+    }
 
-    app.data['stats']['species'] = process_species_count(app.data)
-    app.data['stats']['loci'] = process_locus_count(app.data)
+    for dataset, builder in derived_datasets.items():
+        with tracer.phase(f"build:{dataset}", 'build'):
+            data[dataset] = builder()
 
-    app.data['stats']['allele_groups'] = {}
+    with tracer.phase('data_version', 'build'):
+        data['dataset_digests'] = compute_dataset_digests(data_dir)
+        data['data_version'] = compute_data_version(data['dataset_digests'])
 
-    for locus in app.data['species']['homo_sapiens']['loci']:
-        app.data['stats']['allele_groups'][locus] = process_allele_group_count(app.data, locus)
+    return data
 
-    app.data['stats']['motifs'] = len(app.data['sorted_amino_acid_distributions'].keys())
+
+def create_app(tracer:StartupTracer=startup_tracer):
+    """
+    Creates an instance of the Flask app, and associated configuration and blueprints registration for specific routes. 
+
+    Configuration includes
+
+    - Relevant secrets stored in the config.toml file
+    - Storing in configuration a set of credentials for AWS (decided upon by the environment of the application e.g. development, live)
+
+    Args:
+        tracer (StartupTracer): the tracer to record the phases of the start in, a fresh one keeps repeated starts e.g. in benchmarks out of the cold start's report
+    
+    Returns:
+            A configured instance of the Flask app
+
+    """
+    app = AllelesApp(__name__)
+
+    with tracer.phase('configure', 'configure'):
+        app.config.from_file('config.toml', toml.load)
+        # settings can be overridden from the environment e.g. ALLELES_STRUCTURE_ROUTE, to point the app at a stand-in structure server
+        app.config.from_prefixed_env('ALLELES')
+        # removing whitespace from templated returns    
+        app.jinja_env.trim_blocks = True
+        app.jinja_env.lstrip_blocks = True
+
+        # load templates compiled by precompile_templates.py if they're shipped, falling back to the template sources for any that aren't
+        precompiled_templates = app.config.get('PRECOMPILED_TEMPLATES')
+        if precompiled_templates and os.path.isdir(precompiled_templates) and not app.debug:
+            # compiled templates are only used if they were compiled from the current sources, so an edited template is never shadowed by a stale build
+            if precompiled_templates_current(precompiled_templates, f"{app.root_path}/{app.template_folder}"):
+                app.jinja_env.loader = ChoiceLoader([ModuleLoader(precompiled_templates), app.jinja_env.loader])
+            else:
+                print (f"Ignoring the compiled templates in {precompiled_templates} as they weren't compiled from the current templates, run precompile_templates.py to rebuild them")
+
+    if not app.config.get('DEFER_IMPORTS', True):
+        for module in deferred_modules:
+            module.load()
+
+    app.data = load_data(app.config, tracer)
+    # each reload is traced separately, so the startup report only covers the cold start
+    app.data_reloader = DataReloader(app, lambda: load_data(app.config, StartupTracer()), lambda: compute_dataset_digests(app.config.get('DATA_DIR', 'data')))
+    # registered first, so every other handler of a request sees the same generation of the data
+    app.before_request(pin_data_generation)
+
+    # cached pages and their ETags are keyed on this too, so a deploy never serves pages rendered by the previous code or templates
+    app.app_version = hash_files([f"{app.root_path}/{app.template_folder}", f"{app.root_path}/app.py", f"{app.root_path}/functions", f"{app.root_path}/handlers"])
+
+    if app.config.get('RESPONSE_CACHE_SIZE', 0) > 0:
+        app.response_cache = ResponseCache(app.config['RESPONSE_CACHE_SIZE'], app.config.get('RESPONSE_CACHE_DIR') or None, app.config.get('RESPONSE_CACHE_DISK_SIZE', 4096), app.config.get('RESPONSE_CACHE_MAX_AGE', 86400))
+    else:
+        app.response_cache = None
+
+    app.structure_fetcher = StructureFetcher(app.config.get('STRUCTURE_CONCURRENCY', 16), app.config.get('STRUCTURE_TIMEOUT', 10.0))
+
+    app.request_metrics = RequestMetrics()
+    app.before_request(start_request_timer)
+    # after_request handlers run in reverse order of registration, so registering this first means its timing includes compression
+    app.after_request(record_request_timing)
+    app.after_request(compress_response)
+
+    # profiling is opt-in, requests are only profiled when PROFILING_SECRET is set
+    app.before_request(start_profiling)
+    app.after_request(finish_profiling)
 
     dataset_size = 0
 
@@ -244,6 +366,10 @@ def create_app():
         dataset_size += item_size
 
     print (f"Data held in memory for app.data is {round(dataset_size / 1024, 1)}MB")
+
+    tracer.mark_ready()
+    if app.config.get('STARTUP_TRACE_LOG', True):
+        print (json.dumps({'startup_report': tracer.report(deferred_modules)}))
         
     return app
 
@@ -253,24 +379,13 @@ app = create_app()
 
 @app.template_filter()
 def polymorphism_information(polymorphism:str) -> str:
-    locus_slug = polymorphism.split('|')[0]
-    locus = locus_slug.replace('_','-').upper()
-    polymorphism_details = polymorphism.split('|')[1].split('_')
-    amino_acid = polymorphism_details[0]
-    position = polymorphism_details[1]
-    position_information = app.data['hla_class_i_variability'][locus_slug]['variability'][position]
-    index = position_information['labels'].index(amino_acid)
-    rarity = position_information['rarities'][index]
-    if rarity == 'majority':
-        info_string = f"<strong>{amino_acid}</strong> is found at position {position} in the majority of {locus} alleles."
-    elif rarity == 'unique':    
-        info_string = f"<strong>{amino_acid}</strong> is uniquely found at position {position} in this particular {locus} allele."
-    elif 'only' in rarity:    
-        info_string = f"<strong>{amino_acid}</strong> is found at position {position} in {rarity.replace('_',' ')} {locus} alleles."
-    else:
-        info_string = f"<strong>{amino_acid}</strong> is {rarity.replace('_',' ')}ly found at position {position} of {locus}."
-    return info_string
-    
+    information = app.data['polymorphism_information']
+    if polymorphism not in information:
+        locus_slug, _, polymorphism_details = polymorphism.partition('|')
+        amino_acid, _, position = polymorphism_details.partition('_')
+        rarity, percentage = app.data['variability_lookup'][(locus_slug, position, amino_acid)]
+        information[polymorphism] = build_polymorphism_information(locus_slug, amino_acid, position, rarity)
+    return information[polymorphism]
 
 
 @app.template_filter()
@@ -304,21 +419,20 @@ def structure_count_display(structure_count:int) -> str:
         return f"{structure_count} structures"
 
 
+# the name filters read the current generation's maps rather than the request's pinned ones, as a slug's name never changes and app.data costs more per call than the lookup
 @app.template_filter()
 def deslugify_locus(text:str) -> str:
-    return text.replace('_', '-').upper()
+    return app.current_data['name_maps'].locus_name(text)
 
 
 @app.template_filter()
 def deslugify_allele_group(text:str) -> str:
-    elements = text.split('_')
-    return f"{elements[0]}-{elements[1]}*{elements[2]}".upper()
+    return app.current_data['name_maps'].allele_group_name(text)
 
 
 @app.template_filter()
 def deslugify_allele(text:str) -> str:
-    elements = text.split('_')
-    return f"{elements[0]}-{elements[1]}*{elements[2]}:{elements[3]}".upper()
+    return app.current_data['name_maps'].allele_name(text)
 
 
 @app.template_filter()
@@ -327,34 +441,16 @@ def mhc_flurry_url(allele_number:str) -> str:
 
 
 @app.template_filter()
-def display_simple_motif(motif:Dict) -> str:
-    spacer = '<span>.</span>'
-    motif_string = "<table width='90%'>"
-    rows = [0,1]
-    motif_string += "<tr>"
-    for position in motif:
-        if motif[position] != []:
-            motif_string += "<td width='10%' class='motif-bar'>|</td>"
-        else:
-            motif_string += "<td width='10%'></td>"
-    motif_string += "</tr>"
-    for row in rows:
-        motif_string += "<tr>"
-        for position in motif:
-            motif_string += "<td width='10%'>"
-            if motif[position] == [] and row == 0:
-                motif_string += "<span class='motif-spacer'>.</span>"
-            elif len(motif[position]) > row:
-                motif_string += f"<span class='motif-amino-acid simplified-{motif[position][row]['grade']}-frequency'>{motif[position][row]['amino_acid']}</span>"
-            motif_string += "</td>"
-        motif_string += "</tr>"
-    motif_string += "</table>"
-    return motif_string
+def display_simple_motif(motif_allele:str) -> str:
+    motif_fragments = app.data['motif_fragments']
+    if motif_allele not in motif_fragments:
+        motif_fragments[motif_allele] = build_simple_motif_html(app.data['simplified_motifs'][motif_allele])
+    return motif_fragments[motif_allele]
 
 
 @app.template_filter()
 def slugify_this(text:str) -> str:
-    return slugify(text)
+    return app.current_data['name_maps'].slug(text)
 
 
 def add_prototype_message(message_type:str, text:str) -> str:
@@ -423,6 +519,277 @@ def alleles_lookup(api=False):
 
 
 
+@app.route('/alleles/api/coverage/', methods=['GET', 'POST'])
+@app.route('/alleles/api/coverage', methods=['GET', 'POST'])
+def population_coverage(api=True):
+    """
+    This is the handler for the population coverage calculator, it returns the expected 1K Genomes superpopulation coverage for a panel of alleles
+
+    The arguments are provided either as querystring or post variables
+        alleles (string): a comma separated list of allele numbers or slugs e.g. HLA-A*02:01,hla_b_07_02
+        panel_size (int): optionally, the size of the best panel to choose (from the alleles given, or from all alleles if none are)
+    """
+    request_data = get_request_data(request, app.data['forms']['population_coverage'])
+    response_dict = handlers.population_coverage(request_data, app.data)
+    return response_dict
+
+
+
+@app.route('/alleles/api/adr/<string:field>/<path:term>/')
+@app.route('/alleles/api/adr/<string:field>/<path:term>')
+def adr_search(field, term, api=True):
+    """
+    This is the handler for adverse drug reaction queries, it returns the alleles associated with a drug, PubMed ID or ancestry and a page of the supporting evidence
+
+    Args:
+        field (string): the field to search, one of drug, pubmed_id or ancestry
+        term (string): the value to search for e.g. carbamazepine
+    """
+    if field not in adr_index_fields:
+        return {'error': f"Unable to search adverse drug reactions by {field}", 'code': 404}, 404
+
+    response_dict = handlers.adr_lookup(field, term, app.data)
+
+    # page numbers which aren't numbers fall back to the first page, and are clamped to the pages there are
+    current_page = parse_count(request.args.get('page_number'), 1, (len(response_dict['evidence']) // page_size) + 1)
+
+    response_dict['evidence'], response_dict['page_count'] = pagination(response_dict['evidence'], page_size, current_page)
+    response_dict['current_page'] = current_page
+    response_dict['page_size'] = page_size
+    return response_dict
+
+
+
+@app.route('/alleles/api/structure/<string:pdb_code>/')
+@app.route('/alleles/api/structure/<string:pdb_code>')
+def structure_page(pdb_code, api=True):
+    """
+    This is the handler for the structure lookup, it returns the alleles, allele groups, loci and species a structure belongs to
+
+    Args:
+        pdb_code (string): the PDB code e.g. 1hhk
+    """
+    response_dict = handlers.structure_lookup([pdb_code], app.data)
+    if response_dict['structure_count'] == 0:
+        return {'error': f"Structure {pdb_code} not found", 'code': 404}, 404
+    return response_dict['structures'][pdb_code.lower()]
+
+
+@app.route('/alleles/api/structures/', methods=['GET', 'POST'])
+@app.route('/alleles/api/structures', methods=['GET', 'POST'])
+def structures_lookup(api=True):
+    """
+    This is the handler for the bulk structure lookup, it returns the sets for each structure and the number of structures in each locus
+
+    The arguments are provided either as querystring or post variables
+        pdb_codes (string): a comma separated list of PDB codes e.g. 1hhk,1hsa
+    """
+    request_data = get_request_data(request, app.data['forms']['structure_lookup'])
+    pdb_codes = handlers.parse_pdb_codes(request_data['pdb_codes']) if request_data['pdb_codes'] else []
+    return handlers.structure_lookup(pdb_codes, app.data)
+
+
+
+@app.route('/alleles/api/motifs/<string:allele>/similar/')
+@app.route('/alleles/api/motifs/<string:allele>/similar')
+def similar_motifs(allele, api=True):
+    """
+    This is the handler for motif similarity search, it returns the alleles with the most similar experimental peptide binding motifs to an allele's motif
+
+    Args:
+        allele (string): the slugified allele number e.g. hla_a_01_01
+
+    The querystring may include
+        metric (string): either cosine (the default) or jensen_shannon
+        count (int): the number of alleles to return, by default 10 and at most 100
+    """
+    metric = request.args.get('metric', 'cosine')
+    if metric not in similarity_metrics:
+        return {'error': f"Unknown similarity metric {metric}", 'code': 400}, 400
+    count = parse_count(request.args.get('count'))
+    return handlers.similar_motif_lookup(allele, app.data, count, metric)
+
+
+
+@app.route('/alleles/api/classify/', methods=['GET', 'POST'])
+@app.route('/alleles/api/classify', methods=['GET', 'POST'])
+def sequence_classification(api=True):
+    """
+    This is the handler for novel sequence classification, it returns the closest known alleles to a class I protein sequence
+
+    The arguments are provided either as querystring or post variables
+        sequence (string): the protein sequence, with or without a leader peptide
+    """
+    request_data = get_request_data(request, app.data['forms']['sequence_classification'])
+    if not request_data['sequence']:
+        return {'error': "You didn't provide a sequence", 'code': 400}, 400
+    sequence = clean_sequence(request_data['sequence'])
+    # the g-domain is matched exactly and the pocket positions run to 171, so anything shorter can't be classified
+    if len(sequence) < gdomain_length:
+        return {'error': f"The sequence must be at least {gdomain_length} amino acids long, {len(sequence)} were provided", 'code': 400}, 400
+    return handlers.classify_sequence(sequence, app.data)
+
+
+
+@app.route('/alleles/api/compare/<string:allele>/<string:other_allele>/')
+@app.route('/alleles/api/compare/<string:allele>/<string:other_allele>')
+@app.route('/alleles/api/compare/<string:allele>/', methods=['GET', 'POST'])
+@app.route('/alleles/api/compare/<string:allele>', methods=['GET', 'POST'])
+def allele_comparison(allele, other_allele=None, api=True):
+    """
+    This is the handler for allele comparison, it returns the differences between an allele and one or more others
+
+    Args:
+        allele (string): the slugified allele the others are compared against e.g. hla_b_57_01
+        other_allele (string): optionally, a single slugified allele to compare e.g. hla_b_58_01
+
+    Otherwise the arguments are provided either as querystring or post variables
+        alleles (string): a comma separated list of allele numbers or slugs to compare
+    """
+    if other_allele:
+        others = [other_allele]
+    else:
+        request_data = get_request_data(request, app.data['forms']['allele_comparison'])
+        others = handlers.parse_allele_list(request_data['alleles']) if request_data['alleles'] else []
+    response_dict = handlers.compare_alleles(allele, others, app.data, matrix)
+    if allele in response_dict['unmatched']:
+        return {'error': f"Allele {allele} not found", 'code': 404}, 404
+    return response_dict
+
+
+@app.route('/alleles/api/pocket_distances/<string:allele>/')
+@app.route('/alleles/api/pocket_distances/<string:allele>')
+def pocket_distances(allele, api=True):
+    """
+    This is the handler for pocket distance lookups, it returns the closest pocket pseudosequences in the locus to an allele's pseudosequence from the precomputed distance matrices
+
+    Args:
+        allele (string): the slugified allele number e.g. hla_a_01_01
+
+    The querystring may include
+        metric (string): either hamming (the default) or pmbec
+        count (int): the number of pseudosequences to return, by default 10 and at most 100
+    """
+    if not app.data['pocket_distances']:
+        return {'error': "The pocket distance matrices haven't been built", 'code': 503}, 503
+    metric = request.args.get('metric', 'hamming')
+    if metric not in pocket_distance_metrics:
+        return {'error': f"Unknown distance metric {metric}", 'code': 400}, 400
+    count = parse_count(request.args.get('count'))
+    response_dict = handlers.pocket_neighbours(allele, app.data, metric, count)
+    if not response_dict['pocket_pseudosequence']:
+        return {'error': f"Allele {allele} not found", 'code': 404}, 404
+    return response_dict
+
+
+
+@app.route('/alleles/compare/<string:allele>/<string:other_allele>/')
+@app.route('/alleles/compare/<string:allele>/<string:other_allele>')
+@templated('alleles_compare')
+def allele_comparison_page(allele, other_allele, api=False):
+    """
+    This is the handler for the allele comparison page, it shows the differences between two alleles
+
+    Args:
+        allele (string): the slugified allele the other is compared against e.g. hla_b_57_01
+        other_allele (string): the slugified allele to compare e.g. hla_b_58_01
+    """
+    response_dict = handlers.compare_alleles(allele, [other_allele], app.data, matrix)
+    if response_dict['unmatched']:
+        return {
+            'error': f"Allele {response_dict['unmatched'][0]} not found",
+            'code': 404
+        }
+    comparison = response_dict['comparisons'][0]
+    return {
+        'allele': allele,
+        'other_allele': other_allele,
+        'locus': '_'.join(allele.split('_')[0:2]),
+        'comparison': comparison,
+        'page_url': url_for('allele_comparison_page', allele=allele, other_allele=other_allele)
+    }
+
+
+
+@app.route('/alleles/metrics/')
+@app.route('/alleles/metrics')
+def metrics(api=True):
+    """
+    This is the handler for the request metrics, it returns the latency histograms and quantiles of each endpoint in the Prometheus text format
+    """
+    return app.request_metrics.render_prometheus(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+
+
+@app.route('/alleles/profiles/')
+@app.route('/alleles/profiles')
+def profiles(api=True):
+    """
+    This is the handler for the list of stored request profiles, it requires the profiling secret in the X-Profile header or profile querystring argument
+    """
+    if not profiling_authorised():
+        return {'error': 'Not found', 'code': 404}, 404
+    return {'profiles': list_profiles(app.config.get('PROFILING_DIR', 'profiles'))}
+
+
+@app.route('/alleles/profiles/<string:name>.<string:profile_format>')
+def profile_download(name, profile_format, api=True):
+    """
+    This is the handler for downloading a stored request profile, it requires the profiling secret in the X-Profile header or profile querystring argument
+
+    Args:
+        name (string): the name of the profile, as given in the list of profiles and the X-Profile-Name response header
+        profile_format (string): either pstats, for use with pstats or snakeviz, or collapsed, for flamegraph tools
+    """
+    if not profiling_authorised():
+        return {'error': 'Not found', 'code': 404}, 404
+    folder = os.path.abspath(app.config.get('PROFILING_DIR', 'profiles'))
+    filename = profile_filename(folder, name, profile_format)
+    if not filename:
+        return {'error': f"Profile {name}.{profile_format} not found", 'code': 404}, 404
+    return send_from_directory(folder, filename, as_attachment=True)
+
+
+
+@app.route('/alleles/diagnostics/startup/')
+@app.route('/alleles/diagnostics/startup')
+def startup_diagnostics(api=True):
+    """
+    This is the handler for the startup diagnostics, it returns the time and memory change of each import and phase of the cold start, and which deferred imports have since been loaded
+    """
+    return startup_tracer.report(deferred_modules)
+
+
+
+@app.route('/alleles/admin/reload/', methods=['GET', 'POST'])
+@app.route('/alleles/admin/reload', methods=['GET', 'POST'])
+def reload_data(api=True):
+    """
+    This is the handler for reloading the datasets, a POST starts building a new generation of the data in the background and a GET returns the progress of the last reload. It requires the reload secret in the X-Reload-Secret header
+
+    The querystring may include
+        force (string): set to true to rebuild the data even if no dataset has changed
+    """
+    if not reload_authorised():
+        return {'error': 'Not found', 'code': 404}, 404
+    if request.method == 'POST':
+        if not app.data_reloader.start(request.args.get('force') == 'true'):
+            return {'error': 'A reload is already in progress', 'code': 409, 'status': app.data_reloader.status}, 409
+        return app.data_reloader.status, 202
+    return app.data_reloader.status
+
+
+
+@app.route('/alleles/diagnostics/structures/')
+@app.route('/alleles/diagnostics/structures')
+def structure_fetch_diagnostics(api=True):
+    """
+    This is the handler for the structure fetcher diagnostics, it returns the number of structure downloads in flight, completed, coalesced and failed
+    """
+    return app.structure_fetcher.status()
+
+
+
 @app.route('/alleles/search/', methods=['GET', 'POST'])
 @app.route('/alleles/search', methods=['GET', 'POST'])
 @templated('advanced_search')
@@ -464,12 +831,10 @@ def species_page(species_stem, api=False):
         locus_stats = {}
 
         for locus in loci:
-            locus_group = data['stats']['allele_groups'][locus]['allele_groups']
-            
-            allele_count = sum([locus_group[allele_group]['allele_count'] for allele_group in locus_group])
+            locus_counts = data['stats']['allele_groups'].get(locus, {'allele_group_count': 0, 'allele_count': 0})
             locus_stats[locus] = {
-                'allele_group_count': len(locus_group),
-                'allele_count': allele_count
+                'allele_group_count': locus_counts['allele_group_count'],
+                'allele_count': locus_counts['allele_count']
             }
         
 
@@ -479,6 +844,25 @@ def species_page(species_stem, api=False):
         }
 
 
+def paged_allele_groups(locus:str) -> Tuple[List, int, int]:
+    """
+    This function returns the allele groups of a locus for the page given in the querystring.
+
+    Args:
+        locus (string): the slugified locus e.g. hla_a
+
+    Returns:
+        tuple: the allele groups on the page, the page count and the current page
+    """
+    current_page = 1
+
+    if 'page_number' in request.args:
+        current_page = int(request.args['page_number'])
+
+    allele_groups, page_count = pagination(list(app.data['locus_summaries'][locus]['allele_groups']), page_size, current_page)
+    return allele_groups, page_count, current_page
+
+
 @app.route('/alleles/locus/<string:locus>/expanded/')
 @app.route('/alleles/locus/<string:locus>/expanded')
 @app.route('/alleles/locus/<string:locus>/')
@@ -486,7 +870,9 @@ def species_page(species_stem, api=False):
 @templated('alleles_locus')
 def locus_page(locus, api=False):
     """
-    This is the handler for the locus page, it provides a list of allele groups
+    This is the handler for the locus page, it provides a paginated list of allele groups
+
+    The 1K Genomes and disease association/adverse drug reaction tables are loaded separately from the locus_populations and locus_adr fragments.
 
     Args:
         species_stem (string): the slugified MHC species stem  e.g. hla
@@ -498,38 +884,42 @@ def locus_page(locus, api=False):
         expanded = False
     data = app.data.copy()
 
-    raw_allele_groups = data['allele_groups'][locus]
+    locus_summary = data['locus_summaries'][locus]
 
+    paged_groups, page_count, current_page = paged_allele_groups(locus)
 
+    allele_group_summary = {allele_group: locus_summary['allele_groups'][allele_group] for allele_group in paged_groups}
 
-    raw_structure_sets = data['sets']['allele_groups']
-    raw_motifs = data['simplified_motifs']
+    return {
+        'locus': locus,
+        'allele_groups': allele_group_summary,
+        'allele_group_count': locus_summary['allele_group_count'],
+        'allele_count': locus_summary['allele_count'],
+        'structure_count': locus_summary['structure_count'],
+        'motif_count': locus_summary['motif_count'],
+        'alt_text': '',
+        'page_size': page_size,
+        'page_count': page_count,
+        'pages': [i for i in range(1, page_count + 1)],
+        'current_page': current_page,
+        'expanded': expanded,
+        'page_url': url_for('locus_page', locus=locus)
+    }
 
-    allele_group_summary = {}
-    allele_group_count = len(raw_allele_groups)
-    allele_count = 0
-    structure_count = 0
-    motif_count = 0
 
-    for allele_group in raw_allele_groups:
-        allele_group_summary[allele_group] = {
-            'allele_count': len(raw_allele_groups[allele_group]),
-            'structure_count': 0,
-            'motif_count': 0
-        }
-        allele_count += len(raw_allele_groups[allele_group])
+@app.route('/alleles/locus/<string:locus>/populations/')
+@app.route('/alleles/locus/<string:locus>/populations')
+@templated('fragments/locus_populations')
+def locus_populations(locus, api=False):
+    """
+    This is the handler for the 1K Genomes fragment of the locus page, it provides population frequencies for a page of allele groups
 
-    for allele_group in raw_structure_sets:
-        if allele_group in allele_group_summary:
-            allele_group_summary[allele_group]['structure_count'] = raw_structure_sets[allele_group]['count']
-            structure_count += raw_structure_sets[allele_group]['count']
+    Args:
+        locus (string): the slugified locus e.g. hla_a
+    """
+    data = app.data.copy()
 
-    for motif in raw_motifs:
-        allele_group = '_'.join(motif.split('_')[0:3])
-        if allele_group in allele_group_summary:
-            allele_group_summary[allele_group]['motif_count'] += 1
-            motif_count += 1
-    
+    paged_groups, page_count, current_page = paged_allele_groups(locus)
 
     if locus not in data['1k_allele_groups']:
         onek_allele_groups = None
@@ -537,20 +927,39 @@ def locus_page(locus, api=False):
         onek_allele_groups = data['1k_allele_groups'][locus]
     return {
         'locus': locus,
-        'allele_groups': allele_group_summary,
-        'allele_group_count': allele_group_count,
-        'allele_count': allele_count, 
-        'structure_count': structure_count,
-        'motif_count': motif_count,
+        'allele_groups': paged_groups,
         'onek_allele_groups': onek_allele_groups,
-        'hla_spread': data['hla_spread'][locus],
-        'hla_adr': data['hla_adr'][locus],
-        'alt_text': '',
-        'page_size': 25,
-        'expanded': expanded,
-        'page_url': url_for('locus_page', locus=locus)
+        'current_page': current_page
     }
 
+
+@app.route('/alleles/locus/<string:locus>/adr/')
+@app.route('/alleles/locus/<string:locus>/adr')
+@templated('fragments/locus_adr')
+def locus_adr(locus, api=False):
+    """
+    This is the handler for the disease association and adverse drug reaction fragment of the locus page, it provides counts for a page of allele groups
+
+    Args:
+        locus (string): the slugified locus e.g. hla_a
+    """
+    data = app.data.copy()
+
+    paged_groups, page_count, current_page = paged_allele_groups(locus)
+
+    hla_spread = data['hla_spread'].get(locus, {})
+    hla_adr = data['hla_adr'].get(locus, {'allele_groups': {}})
+
+    return {
+        'locus': locus,
+        'allele_groups': {allele_group: {
+            'disease_association_count': hla_spread[allele_group]['total_count'] if allele_group in hla_spread else 0,
+            'reaction_count': hla_adr['allele_groups'][allele_group]['reaction_count'] if allele_group in hla_adr['allele_groups'] else 0
+        } for allele_group in paged_groups},
+        'current_page': current_page
+    }
+
+
 @app.route('/alleles/allele_group/<string:allele_group>/expanded/')
 @app.route('/alleles/allele_group/<string:allele_group>/expanded')
 @app.route('/alleles/allele_group/<string:allele_group>/')
@@ -683,9 +1092,11 @@ def allele_page(allele, api=False):
     pocket_pseudosequence_match_alleles = []
     cleaned_pocket_pseudosequence_matches = {}
 
+    name_maps = data['name_maps']
+
     for pocket_pseudosequence_match in pocket_pseudosequence_matches:
 
-        match_allele_slug = slugify(pocket_pseudosequence_match['protein_allele_name'])
+        match_allele_slug = name_maps.slug(pocket_pseudosequence_match['protein_allele_name'])
         if match_allele_slug not in pocket_pseudosequence_match_alleles and match_allele_slug != allele:
             pocket_pseudosequence_match_alleles.append(match_allele_slug)
             cleaned_pocket_pseudosequence_matches[match_allele_slug] = pocket_pseudosequence_match
@@ -720,6 +1131,11 @@ def allele_page(allele, api=False):
     else:
         processed_motif = None
 
+    if motif_allele:
+        similar_motifs = handlers.similar_motif_lookup(motif_allele, data, 5)['similar_motifs']
+    else:
+        similar_motifs = []
+
     reference_allele = data['reference_alleles'][locus]['allele_groups'][allele_group]
     if allele != reference_allele:
         polymorphisms = data['polymorphisms_and_motifs'][locus][allele]['polymorphisms']
@@ -739,7 +1155,13 @@ def allele_page(allele, api=False):
         netmhcpan_polymorphisms = None
     reference_allele = data['reference_alleles'][locus]['allele_groups'][allele_group]
 
-    polymorphism_view = polymorphism_structure_viewer(locus, allele, reference_allele, netmhcpan_polymorphisms)
+    with timed_phase('structure'):
+        try:
+            polymorphism_view = polymorphism_structure_viewer(locus, allele, reference_allele, netmhcpan_polymorphisms)
+        except StructureFetchError as e:
+            # the page is still useful without the viewer, but isn't cached so the viewer is shown once the structures can be fetched
+            print (e)
+            polymorphism_view = ''
 
     return {
         'locus': locus,
@@ -759,7 +1181,9 @@ def allele_page(allele, api=False):
         'processed_motif': processed_motif,
         'motif_allele': motif_allele,
         'motif_type': motif_type,
+        'similar_motifs': similar_motifs,
         'polymorphism_view': polymorphism_view,
+        'cacheable': polymorphism_view != '',
         'page_size': 25,
         'page_url': url_for('allele_page', allele=allele)
     }
@@ -769,23 +1193,18 @@ def allele_page(allele, api=False):
 
 def polymorphism_structure_viewer(locus:str, allele_slug:str, reference_allele_slug:str, polymorphisms:List) -> str:
     
-    reference_url = f"https://coordinates.histo.fyi/predictions/view/class_i/{locus}/{reference_allele_slug}_canonical.pdb"
+    structure_route = app.config.get('STRUCTURE_ROUTE', 'https://coordinates.histo.fyi')
+
+    reference_url = structure_url(structure_route, locus, reference_allele_slug)
     print (reference_url)
     
-    allele_url = f"https://coordinates.histo.fyi/predictions/view/class_i/{locus}/{allele_slug}_canonical.pdb"
+    allele_url = structure_url(structure_route, locus, allele_slug)
     print (allele_url)
 
     view = py3Dmol.view(width=800, height=500)
 
-    reference_request = requests.get(reference_url)
-    reference_structure = reference_request.text
-
-    #print (len(reference_structure))
-
-    allele_request = requests.get(allele_url)
-    allele_structure = allele_request.text   
-
-    #print (len(allele_structure)) 
+    # both structures are downloaded at once, sharing the fetcher's connection pool with every other request
+    reference_structure, allele_structure = app.structure_fetcher.fetch_many([reference_url, allele_url])
 
     #reference_polymporphisms = extract_polymorphic_residues(reference_structure, polymorphisms)
     #allele_polymorphisms = extract_polymorphic_residues(allele_structure, polymorphisms)
@@ -821,37 +1240,6 @@ def allele_identifier_page(datasource, identifier, api=False):
     return {}
 
 
-def gradient(color:Tuple, percent:float) -> Tuple:
-    percent = 1 - percent
-    '''assumes color is rgb between (0, 0, 0) and (255, 255, 255)'''
-    color = np.array(color)
-    white = np.array([255, 255, 255])
-    vector = white-color
-    return color + vector * percent
-
-
-def score_circle(value:float, color:Tuple) -> str:
-    if not value:
-        value = 0.0
-    if value == 0.0:
-        r = 255
-        g = 255
-        b = 255
-        empty = True
-    else:
-        gradient_value = gradient(color, value)
-        r = int(gradient_value[0])
-        g = int(gradient_value[1])
-        b = int(gradient_value[2])
-        empty = False
-    dot_class = 'dot'
-    if empty:
-        dot_class += ' empty-dot'
-    else:
-        dot_class += ' value-dot'
-    return f'<div class="data-score dot" aria-label="Score: {round(value, 2)}" class="{dot_class}" style="background-color: rgb({r}, {g}, {b});"></div>'
-
-
 @app.template_filter()
 def onekall_score_circle(value:float) -> str:
     return score_circle(value, (33, 113, 181))
\ No newline at end of file
@@ -0,0 +1,13 @@
+"""
+The ASGI entry point, for serving the app with an ASGI server such as uvicorn:
+
+    ASGI_THREADS=64 uvicorn asgi:application --port 8088
+
+The views are synchronous, so each request runs the Flask app in a thread from asgiref's pool, and the number of requests served at once is capped by ASGI_THREADS. The structure downloads made by the allele page are run concurrently on the structure fetcher's event loop, sharing one pooled client and coalescing requests for the same structure, while the request's thread waits for them.
+"""
+from asgiref.wsgi import WsgiToAsgi
+
+from app import app
+
+
+application = WsgiToAsgi(app)
@@ -0,0 +1,223 @@
+from typing import Callable, Dict, List, Optional
+
+from contextlib import redirect_stdout
+from unittest import mock
+
+import argparse
+import io
+import json
+import platform
+import statistics
+import sys
+import time
+
+
+# a minimal structure, returned in place of the coordinates server so the allele page can be timed without the network
+stub_structure = "ATOM      1  CA  GLY A   1       0.000   0.000   0.000  1.00  0.00           C\nEND\n"
+
+
+def summarise_timings(timings:List[float]) -> Dict:
+    return {
+        'min_ms': round(min(timings), 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'mean_ms': round(statistics.mean(timings), 3),
+        'repeats': len(timings)
+    }
+
+
+def time_call(function:Callable, repeats:int) -> Dict:
+    """
+    This function times repeated calls of a function.
+
+    Args:
+        function (callable): the function to time, called with no arguments
+        repeats (int): the number of times to call it
+
+    Returns:
+        dict: the minimum, median and mean times in milliseconds, and the number of repeats
+    """
+    timings = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return summarise_timings(timings)
+
+
+def benchmark_startup(repeats:int) -> Dict:
+    """
+    This function times create_app as a whole, and each phase of load_data, the loading of each dataset and the building of each derived dataset.
+
+    The phases are read from the StartupTracer passed to load_data, so every dataset the app loads or builds is timed as it is at startup. Each create_app is given a fresh tracer, and its output is discarded, so the repeats are neither added to the cold start's report nor logged.
+    """
+    import app as alleles_app
+
+    with redirect_stdout(io.StringIO()):
+        results = {'create_app': time_call(lambda: alleles_app.create_app(alleles_app.StartupTracer()), repeats)}
+    phase_timings = {}
+    for i in range(repeats):
+        tracer = alleles_app.StartupTracer()
+        alleles_app.load_data(alleles_app.app.config, tracer)
+        for phase in tracer.phases:
+            phase_timings.setdefault(phase['name'], []).append(phase['ms'])
+    for name, timings in phase_timings.items():
+        results[name] = summarise_timings(timings)
+    return results
+
+
+def benchmark_routes(repeats:int, max_pages:int) -> Dict:
+    """
+    This function times the main routes through the Flask test client, with the response cache turned off so every request is rendered.
+
+    The status of each route is kept with its timings, as an error page is no measure of the route.
+    """
+    from app import app
+
+    app.response_cache = None
+    client = app.test_client()
+
+    locus = next(locus for locus in app.data['allele_groups'] if app.data['allele_groups'][locus])
+    allele_group = next(iter(app.data['allele_groups'][locus]))
+    allele = app.data['allele_groups'][locus][allele_group][0]
+    allele_number = allele.replace('_', ':').upper().replace(':', '-', 1).replace(':', '*', 1)
+
+    urls = {
+        'locus_page': f"/alleles/locus/{locus}/",
+        'locus_page:expanded': f"/alleles/locus/{locus}/expanded/",
+        'allele_page': f"/alleles/allele/{allele}/",
+        'alleles_lookup': f"/alleles/lookup/?allele_number_query={allele_number}"
+    }
+    for page_number in range(1, max_pages + 1):
+        urls[f"allele_group_page:{page_number}"] = f"/alleles/allele_group/{allele_group}/?page_number={page_number}"
+
+    results = {}
+    with mock.patch.object(app.structure_fetcher, 'fetch_many', return_value=[stub_structure, stub_structure]), redirect_stdout(io.StringIO()):
+        for name, url in urls.items():
+            # the first request warms the template cache, which is the state a running server is in
+            status = client.get(url).status_code
+            results[f"route:{name}"] = time_call(lambda: client.get(url), repeats)
+            results[f"route:{name}"]['status'] = status
+    return results
+
+
+def benchmark_filters(repeats:int, sample_size:int) -> Dict:
+    """
+    This function times the hot template filters over a sample of real inputs, with their memos cleared before each run.
+    """
+    from app import app, matrix
+
+    filters = app.jinja_env.filters
+    polymorphisms = [f"{locus}|{amino_acid}_{position}" for locus, position, amino_acid in list(app.data['variability_lookup'])[:sample_size]]
+    motif_alleles = list(app.data['simplified_motifs'])[:sample_size]
+    substitutions = [f"{from_aa}{to_aa}" for from_aa in matrix for to_aa in matrix[from_aa]][:sample_size]
+
+    def run_polymorphism_information():
+        app.data['polymorphism_information'].clear()
+        for polymorphism in polymorphisms:
+            filters['polymorphism_information'](polymorphism)
+
+    return {
+        'filter:polymorphism_information': time_call(run_polymorphism_information, repeats),
+        'filter:display_simple_motif': time_call(lambda: [filters['display_simple_motif'](motif_allele) for motif_allele in motif_alleles], repeats),
+        'filter:substitution_effect': time_call(lambda: [filters['substitution_effect'](substitution) for substitution in substitutions], repeats)
+    }
+
+
+def benchmark_build(repeats:int, loci:List[str]) -> Dict:
+    """
+    This function times the offline polymorphism and motif build for each locus.
+    """
+    from build_motif_and_polymophism_data import build_motif_and_polymophism_data
+
+    results = {}
+    with redirect_stdout(io.StringIO()):
+        for locus in loci:
+            results[f"build_motif_and_polymophism_data:{locus}"] = time_call(lambda: build_motif_and_polymophism_data(locus), repeats)
+    return results
+
+
+def compare_to_baseline(results:Dict, baseline:Dict, threshold:float) -> List[Dict]:
+    """
+    This function finds the benchmarks whose median time has grown beyond the threshold since the baseline.
+
+    Args:
+        results (dictionary): the benchmark results, keyed by benchmark
+        baseline (dictionary): the baseline results, keyed by benchmark
+        threshold (float): the allowed fractional slowdown e.g. 0.2 for 20%
+
+    Returns:
+        list: the regressions, with the baseline and current medians and the fractional change
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline or baseline[name]['median_ms'] <= 0:
+            continue
+        change = (result['median_ms'] - baseline[name]['median_ms']) / baseline[name]['median_ms']
+        if change > threshold:
+            regressions.append({'benchmark': name, 'baseline_ms': baseline[name]['median_ms'], 'median_ms': result['median_ms'], 'change': round(change, 3)})
+    return regressions
+
+
+def run_benchmarks(repeats:int, max_pages:int, sample_size:int, loci:List[str], suites:Optional[List[str]]=None) -> Dict:
+    suite_functions = {
+        'startup': lambda: benchmark_startup(max(1, repeats // 5)),
+        'routes': lambda: benchmark_routes(repeats, max_pages),
+        'filters': lambda: benchmark_filters(repeats, sample_size),
+        'build': lambda: benchmark_build(max(1, repeats // 5), loci)
+    }
+    results = {}
+    for suite, function in suite_functions.items():
+        if suites and suite not in suites:
+            continue
+        results.update(function())
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark app startup, routes, filters and the offline build')
+    parser.add_argument('--suite', action='append', dest='suites', choices=['startup', 'routes', 'filters', 'build'], help='only run this suite (can be repeated)')
+    parser.add_argument('--repeats', type=int, default=20, help='the number of timed runs of each route and filter, startup and build benchmarks run a fifth as many')
+    parser.add_argument('--pages', type=int, default=3, help='the number of allele group pages to time')
+    parser.add_argument('--sample-size', type=int, default=500, help='the number of inputs each filter is called with per run')
+    parser.add_argument('--locus', action='append', dest='loci', help='a locus to time the offline build for (can be repeated), by default hla_a')
+    parser.add_argument('--output', default='benchmark_results.json', help='the file to write the results to')
+    parser.add_argument('--baseline', help='a previous results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='the fractional slowdown of a median time which counts as a regression')
+    args = parser.parse_args()
+
+    from app import app
+
+    results = run_benchmarks(args.repeats, args.pages, args.sample_size, args.loci or ['hla_a'], args.suites)
+    output = {
+        'data_version': app.data['data_version'],
+        'python_version': platform.python_version(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results
+    }
+    with open(args.output, 'w') as f:
+        json.dump(output, f, indent=4)
+
+    for name, result in results.items():
+        print (f"{name}: {result['median_ms']}ms median ({result['min_ms']}ms min, {result['repeats']} runs)")
+    print (f"Wrote {len(results)} results to {args.output}")
+
+    failures = [name for name, result in results.items() if result.get('status', 200) != 200]
+    for name in failures:
+        print (f"FAILED {name}: returned {results[name]['status']}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)['results']
+        regressions = compare_to_baseline(results, baseline, args.threshold)
+        for regression in regressions:
+            print (f"REGRESSION {regression['benchmark']}: {regression['baseline_ms']}ms -> {regression['median_ms']}ms (+{round(regression['change'] * 100, 1)}%)")
+        if regressions:
+            sys.exit(1)
+        print (f"No regressions beyond {round(args.threshold * 100)}% of {args.baseline}")
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,84 +2,7 @@ from typing import Dict, List, Union
 
 import json
 
-def map_pocket(position:int) -> str:
-    for pocket in pockets:
-        if str(position) in pockets[pocket]:
-            return pocket
-    return 'o'
-
-
-def check_position_for_polymorphism(reference, test):
-    if test == '-':
-        return False
-    if reference == test:
-        return False
-    else:
-        return True
-
-
-
-
-# constants
-
-pockets = {
-        "a": ["5","59","63","66","159","163","167","171"],
-        "b": ["7","9","24","25","33","34","45","60","67","70"],
-        "c": ["73","74"],
-        "d": ["99","114","155","156"],
-        "e": ["97","114","147","152"],
-        "f": ["77","80","81","84","95","116","123","143","146","147"]
-}
-
-netmhcpan_pocket_residues = [7,9,24,45,59,62,63,66,67,69,70,73,74,76,77,80,81,84,95,97,99,114,116,118,143,147,150,152,156,158,159,163,167,171]
-netmhc_pocket_labels = [map_pocket(position) for position in netmhcpan_pocket_residues]
-
-
-
-
-
-
-
-
-
-
-
-def build_sequence_polymorphism_data(reference_sequence, test_sequence):
-    i = 0
-    polymorphisms = []
-    for position in reference_sequence:
-        if i >= len(test_sequence):
-            break
-        if check_position_for_polymorphism(reference_sequence[i], test_sequence[i]):
-            polymorphism = {'position': i + 1, 'from': reference_sequence[i], 'to': test_sequence[i]}
-            polymorphisms.append(polymorphism)
-        i += 1
-    return polymorphisms
-    
-
-def build_allele_polymorphism_data(reference_pocket_pseudosequence, reference_cytoplasmic_sequence, pocket_pseudosequence, cytoplasmic_sequence):
-
-    binding_pocket_polymorphisms = build_sequence_polymorphism_data(reference_pocket_pseudosequence, pocket_pseudosequence)
-
-    for polymorphism in binding_pocket_polymorphisms:
-        polymorphism['position'] = netmhcpan_pocket_residues[int(polymorphism['position']) - 1]
-        polymorphism['pocket'] = map_pocket(polymorphism['position'])
-
-    cytoplasmic_polymorphisms = build_sequence_polymorphism_data(reference_cytoplasmic_sequence, cytoplasmic_sequence)
-
-    abd_polymorphisms = []
-    non_abd_polymorphisms = []
-
-    if cytoplasmic_polymorphisms != []:
-        for polymorphism in cytoplasmic_polymorphisms:
-            if polymorphism not in abd_polymorphisms:
-                if polymorphism['position']  > 180:
-                    non_abd_polymorphisms.append(polymorphism)
-                else:
-                    abd_polymorphisms.append(polymorphism)
-    
-    return {'binding_pocket': binding_pocket_polymorphisms, 'abd': abd_polymorphisms, 'non-abd': non_abd_polymorphisms}
-        
+from functions.sequences import build_allele_polymorphism_data
 
 
 def build_motif_and_polymophism_data(locus:str) -> Dict:
@@ -207,6 +130,5 @@ def main():
         json.dump(allele_polymorphism_and_motif_data, f, indent=4)
 
 
-
-
-main()
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+from typing import Dict, Tuple
+
+from multiprocessing import Pool
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from functions.pmbec import build_pmbec_matrix, build_pmbec_lookup
+from functions.pocket_distances import block_distances, matrix_path, index_filename
+from functions.pockets import netmhcpan_pocket_residues
+from functions.sequences import encode_sequences
+
+
+encoded = None
+pmbec_lookup = None
+
+
+def initialise_worker(worker_encoded:np.ndarray, worker_pmbec_lookup:np.ndarray):
+    global encoded, pmbec_lookup
+    encoded = worker_encoded
+    pmbec_lookup = worker_pmbec_lookup
+
+
+def compute_block(block:Tuple[int, int]) -> Tuple[int, np.ndarray, np.ndarray]:
+    start, stop = block
+    hamming, pmbec = block_distances(encoded, start, stop, pmbec_lookup)
+    return start, hamming, pmbec
+
+
+def build_locus_matrices(locus:str, pseudosequences:list, output_folder:str, processes:int, block_size:int):
+    """
+    This function builds the Hamming and PMBEC distance matrices for a locus, a block of rows at a time in a process pool.
+
+    Each block is written straight into a memory mapped .npy file, so neither the parent nor the workers hold more than a few blocks at once.
+
+    Args:
+        locus (string): the slugified locus e.g. hla_a
+        pseudosequences (list): the unique pocket pseudosequences of the locus, in matrix order
+        output_folder (string): the folder to write the matrices to
+        processes (int): the number of worker processes
+        block_size (int): the number of rows in each block
+    """
+    locus_encoded = encode_sequences(pseudosequences, len(netmhcpan_pocket_residues))
+    count = len(pseudosequences)
+    hamming = np.lib.format.open_memmap(matrix_path(output_folder, locus, 'hamming'), mode='w+', dtype=np.uint8, shape=(count, count))
+    pmbec = np.lib.format.open_memmap(matrix_path(output_folder, locus, 'pmbec'), mode='w+', dtype=np.uint16, shape=(count, count))
+
+    blocks = [(start, min(start + block_size, count)) for start in range(0, count, block_size)]
+    with Pool(processes, initializer=initialise_worker, initargs=(locus_encoded, build_pmbec_lookup(build_pmbec_matrix()))) as pool:
+        for start, hamming_block, pmbec_block in pool.imap_unordered(compute_block, blocks):
+            hamming[start:start + len(hamming_block)] = hamming_block
+            pmbec[start:start + len(pmbec_block)] = pmbec_block
+
+    hamming.flush()
+    pmbec.flush()
+    del hamming, pmbec
+
+
+def build_pocket_distance_matrices(output_folder:str, processes:int, block_size:int, data_dir:str='data') -> Dict:
+    """
+    This function builds the pocket distance matrices for every locus, along with an index of the pseudosequence of each row.
+
+    Args:
+        output_folder (string): the folder to write the matrices to
+        processes (int): the number of worker processes
+        block_size (int): the number of rows in each block
+        data_dir (string): the data folder holding the pocket_pseudosequences to build from
+
+    Returns:
+        dict: the number of unique pseudosequences in each locus
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    index = {}
+    for filename in sorted(os.listdir(f"{data_dir}/pocket_pseudosequences")):
+        locus = filename.replace('.json', '')
+        with open(f"{data_dir}/pocket_pseudosequences/{filename}", 'r') as f:
+            pseudosequences = sorted(json.load(f).keys())
+        build_locus_matrices(locus, pseudosequences, output_folder, processes, block_size)
+        index[locus] = {'pseudosequences': pseudosequences}
+
+    # the index is written last, so the app never loads matrices from a partial build
+    with open(f"{output_folder}/{index_filename}", 'w') as f:
+        json.dump(index, f)
+    return {locus: len(index[locus]['pseudosequences']) for locus in index}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompute the all-vs-all pocket pseudosequence distance matrices for each locus')
+    parser.add_argument('--data-dir', default='data', help='the data folder to build the matrices from')
+    parser.add_argument('--output', help='the folder to write the matrices to, by default pocket_distances in the data folder')
+    parser.add_argument('--processes', type=int, default=os.cpu_count(), help='the number of worker processes')
+    parser.add_argument('--block-size', type=int, default=128, help='the number of rows computed by each task')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    summary = build_pocket_distance_matrices(args.output or f"{args.data_dir}/pocket_distances", args.processes, args.block_size, args.data_dir)
+    for locus in summary:
+        print (f"{locus}: {summary[locus]} unique pocket pseudosequences")
+    print (f"Built the pocket distance matrices in {round(time.perf_counter() - start, 1)}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+from typing import Dict, List, Optional
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from functions.population import build_population_frequencies, superpopulations
+from functions.variability import build_locus_variability
+
+
+def load_locus_sequences(locus:str, data_dir:str='data') -> Dict[str, List[str]]:
+    """
+    This function loads the unique canonical sequences of a locus, in allele order, along with the alleles which share each sequence.
+
+    Args:
+        locus (string): the slugified locus e.g. hla_a
+        data_dir (string): the data folder holding protein_alleles
+
+    Returns:
+        dict: the alleles for each unique sequence, keyed by sequence
+    """
+    with open(f"{data_dir}/protein_alleles/{locus}.json", 'r') as f:
+        protein_alleles = json.load(f)
+    sequences = {}
+    for allele, allele_data in protein_alleles.items():
+        sequences.setdefault(allele_data['canonical_sequence'], []).append(allele)
+    return sequences
+
+
+def sequence_weights(sequences:Dict[str, List[str]], population_frequencies:Dict, weight_by:str) -> Optional[np.ndarray]:
+    """
+    This function sums the 1K Genomes allele frequencies of the alleles sharing each sequence.
+
+    Args:
+        sequences (dictionary): the alleles for each unique sequence, keyed by sequence
+        population_frequencies (dictionary): the arrays built by build_population_frequencies
+        weight_by (string): a superpopulation e.g. EUR, or 'all' for the mean across superpopulations
+
+    Returns:
+        numpy array: the weight of each sequence, or None if none of the alleles have frequencies
+    """
+    if weight_by == 'all':
+        allele_weights = population_frequencies['frequencies'].mean(axis=1)
+    else:
+        allele_weights = population_frequencies['frequencies'][:, superpopulations.index(weight_by)]
+    allele_index = population_frequencies['allele_index']
+    weights = np.array([sum([allele_weights[allele_index[allele]] for allele in alleles if allele in allele_index]) for alleles in sequences.values()])
+    if not weights.any():
+        return None
+    return weights
+
+
+def build_variability_data(loci:List[str], weight_by:Optional[str]=None, data_dir:str='data') -> Dict:
+    """
+    This function recomputes the variability statistics of each locus from the canonical sequences in protein_alleles.
+
+    The shipped hla_class_i_variability dataset was built from a different set of sequences, including partial ones, so recomputing it from protein_alleles gives different counts, percentages and entropies.
+
+    Args:
+        loci (list): the slugified loci to compute
+        weight_by (string): optionally, a superpopulation or 'all' to weight the frequencies by
+        data_dir (string): the data folder holding protein_alleles and 1k_alleles
+
+    Returns:
+        dict: the variability of each locus, keyed by locus
+    """
+    population_frequencies = None
+    if weight_by:
+        with open(f"{data_dir}/1k_alleles.json", 'r') as f:
+            population_frequencies = build_population_frequencies(json.load(f))
+
+    variability = {}
+    for locus in loci:
+        sequences = load_locus_sequences(locus, data_dir)
+        weights = sequence_weights(sequences, population_frequencies, weight_by) if population_frequencies else None
+        variability[locus] = build_locus_variability(list(sequences.keys()), weights)
+    return variability
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Recompute the per-position variability statistics from the protein allele sequences')
+    parser.add_argument('--locus', action='append', dest='loci', help='a locus to compute e.g. hla_a (can be repeated), by default every locus of the species')
+    parser.add_argument('--species', default='homo_sapiens', help='the species whose loci are computed when no locus is given')
+    parser.add_argument('--weight-by', choices=superpopulations + ['all'], help='weight the frequencies by 1K Genomes allele frequencies for a superpopulation, or the mean of all of them')
+    parser.add_argument('--data-dir', default='data', help='the data folder to compute the variability from')
+    parser.add_argument('--output', help='the file to write, by default hla_class_i_variability.json in the data folder, loci already in it which aren\'t recomputed are kept')
+    args = parser.parse_args()
+
+    output_filename = args.output or f"{args.data_dir}/hla_class_i_variability.json"
+
+    loci = args.loci
+    if not loci:
+        with open(f"{args.data_dir}/species.json", 'r') as f:
+            loci = json.load(f)[args.species]['loci']
+    loci = [locus for locus in loci if os.path.exists(f"{args.data_dir}/protein_alleles/{locus}.json")]
+
+    start = time.perf_counter()
+    variability = build_variability_data(loci, args.weight_by, args.data_dir)
+
+    output = {}
+    if os.path.exists(output_filename):
+        with open(output_filename, 'r') as f:
+            output = json.load(f)
+    output.update(variability)
+    with open(output_filename, 'w') as f:
+        json.dump(output, f, indent=4)
+
+    for locus in variability:
+        print (f"{locus}: {variability[locus]['unique_sequence_count']} unique sequences")
+    print (f"Recomputed the variability of {len(variability)} loci in {round(time.perf_counter() - start, 2)}s")
+
+
+if __name__ == '__main__':
+    main()
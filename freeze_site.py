@@ -0,0 +1,228 @@
+from typing import Dict, List, Tuple
+
+from multiprocessing import Pool
+
+import argparse
+import hashlib
+import json
+import os
+import time
+
+
+# the datasets each page type is rendered from, a page is only re-rendered when one of these (or the code or templates) changes
+route_dependencies = {
+    'alleles_home': ['species', 'protein_alleles', 'sorted_amino_acid_distributions'],
+    'species_page': ['species', 'protein_alleles'],
+    'locus_page': ['allele_groups', 'sets', 'simplified_motifs'],
+    'locus_populations': ['allele_groups', '1k_allele_groups'],
+    'locus_adr': ['allele_groups', 'hla_spread', 'hla_adr'],
+    'allele_group_page': ['allele_groups', 'reference_alleles', 'polymorphisms_and_motifs', 'simplified_motifs', 'sets', '1k_alleles', 'hla_class_i_variability'],
+    'allele_page': ['protein_alleles', 'gdomain_sequences', 'pocket_pseudosequences', 'reference_alleles', 'polymorphisms_and_motifs', 'sorted_amino_acid_distributions', 'sets']
+}
+
+manifest_filename = '.freeze_manifest.json'
+
+client = None
+
+
+def enumerate_pages(data:Dict, page_size:int) -> List[Tuple[str, str]]:
+    """
+    This function lists every url served under /alleles/, along with the endpoint which renders it.
+
+    Args:
+        data (dictionary): the app.data datasets
+        page_size (int): the number of alleles shown on each allele group page
+
+    Returns:
+        list: tuples of (endpoint, url)
+    """
+    pages = [('alleles_home', '/alleles/')]
+    for species in data['species']:
+        pages.append(('species_page', f"/alleles/species/{species}/"))
+        for locus in data['species'][species]['loci']:
+            if locus not in data['allele_groups']:
+                continue
+            locus_page_count = (len(data['allele_groups'][locus]) // page_size) + 1
+            for page_number in range(1, locus_page_count + 1):
+                querystring = f"?page_number={page_number}" if page_number > 1 else ''
+                pages.append(('locus_page', f"/alleles/locus/{locus}/{querystring}"))
+                pages.append(('locus_page', f"/alleles/locus/{locus}/expanded/{querystring}"))
+                # the fragments are always requested with a page number by the locus page
+                pages.append(('locus_populations', f"/alleles/locus/{locus}/populations/?page_number={page_number}"))
+                pages.append(('locus_adr', f"/alleles/locus/{locus}/adr/?page_number={page_number}"))
+            for allele_group in data['allele_groups'][locus]:
+                # the reference allele is shown above the paginated list, so it is not counted in the pages
+                allele_count = len([allele for allele in data['allele_groups'][locus][allele_group] if allele != data['reference_alleles'].get(locus, {}).get('allele_groups', {}).get(allele_group)])
+                page_count = (allele_count // page_size) + 1
+                for page_number in range(1, page_count + 1):
+                    for variant in ['', 'expanded/']:
+                        url = f"/alleles/allele_group/{allele_group}/{variant}"
+                        if page_number > 1:
+                            url += f"?page_number={page_number}"
+                        pages.append(('allele_group_page', url))
+                for allele in data['allele_groups'][locus][allele_group]:
+                    pages.append(('allele_page', f"/alleles/allele/{allele}/"))
+    return pages
+
+
+def output_path(output_folder:str, url:str) -> str:
+    """
+    This function maps a url onto a file in the static tree.
+
+    Querystring pages are written as subfolders e.g. /alleles/allele_group/hla_a_01/?page_number=2 becomes alleles/allele_group/hla_a_01/page_number/2/index.html, which the CDN maps back onto the querystring.
+
+    Args:
+        output_folder (string): the root of the static tree
+        url (string): the url of the page
+
+    Returns:
+        string: the path of the file for the page
+    """
+    path, _, querystring = url.partition('?')
+    path = path.strip('/')
+    if querystring:
+        for argument in querystring.split('&'):
+            key, _, value = argument.partition('=')
+            path += f"/{key}/{value}"
+    return f"{output_folder}/{path}/index.html"
+
+
+def page_fingerprint(endpoint:str, url:str, dataset_digests:Dict, app_version:str) -> str:
+    fingerprint = hashlib.sha1(f"{url}|{app_version}".encode('utf-8'))
+    for dataset in route_dependencies[endpoint]:
+        fingerprint.update(f"{dataset}:{dataset_digests.get(dataset, '')}".encode('utf-8'))
+    return fingerprint.hexdigest()
+
+
+def initialise_worker():
+    global client
+    from app import app
+    # pages are only rendered once, so holding them in the response cache would just use memory
+    app.response_cache = None
+    client = app.test_client()
+
+
+def render_page(job:Tuple[str, str, str]) -> Dict:
+    """
+    This function renders a single page in a worker and writes it out if its contents have changed.
+
+    Args:
+        job (tuple): the url, the output path and the content hash from the previous build (or None)
+
+    Returns:
+        dict: the url, the status code, the content hash and whether the file was written
+    """
+    url, path, previous_content_hash = job
+    try:
+        response = client.get(url)
+    except Exception as e:
+        return {'url': url, 'status': 500, 'error': str(e), 'content_hash': None, 'written': False}
+    if response.status_code != 200:
+        return {'url': url, 'status': response.status_code, 'content_hash': None, 'written': False}
+    body = response.get_data()
+    content_hash = hashlib.sha1(body).hexdigest()
+    written = False
+    if content_hash != previous_content_hash or not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(body)
+        written = True
+    return {'url': url, 'status': response.status_code, 'content_hash': content_hash, 'written': written}
+
+
+def freeze(output_folder:str, processes:int, force:bool=False, endpoints:List=None) -> Dict:
+    """
+    This function pre-renders the site into a static tree, only rendering pages whose inputs have changed since the last build.
+
+    Args:
+        output_folder (string): the root of the static tree
+        processes (int): the number of worker processes to render with
+        force (boolean): whether to ignore the manifest from the previous build and render every page
+        endpoints (list): optionally, a subset of endpoints to render
+
+    Returns:
+        dict: a summary of the build
+    """
+    start = time.perf_counter()
+
+    from app import app, page_size
+
+    # a digest of app.py, functions/, handlers/ and the templates, as a change to any of them may alter any page
+    app_version = app.app_version
+    dataset_digests = app.data['dataset_digests']
+
+    manifest_path = f"{output_folder}/{manifest_filename}"
+    manifest = {}
+    if os.path.exists(manifest_path) and not force:
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+
+    jobs = []
+    fingerprints = {}
+    skipped = 0
+    for endpoint, url in enumerate_pages(app.data, page_size):
+        if endpoints and endpoint not in endpoints:
+            continue
+        path = output_path(output_folder, url)
+        fingerprint = page_fingerprint(endpoint, url, dataset_digests, app_version)
+        fingerprints[url] = fingerprint
+        previous = manifest.get(url)
+        if previous and previous['fingerprint'] == fingerprint and os.path.exists(path):
+            skipped += 1
+            continue
+        jobs.append((url, path, previous['content_hash'] if previous else None))
+
+    render_start = time.perf_counter()
+    results = []
+    if jobs:
+        with Pool(processes, initializer=initialise_worker) as pool:
+            for result in pool.imap_unordered(render_page, jobs, chunksize=8):
+                results.append(result)
+    render_time = time.perf_counter() - render_start
+
+    errors = []
+    written = 0
+    for result in results:
+        if result['status'] == 200:
+            manifest[result['url']] = {'fingerprint': fingerprints[result['url']], 'content_hash': result['content_hash']}
+            if result['written']:
+                written += 1
+        else:
+            manifest.pop(result['url'], None)
+            errors.append(result)
+
+    os.makedirs(output_folder, exist_ok=True)
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=4)
+
+    total_time = time.perf_counter() - start
+    return {
+        'rendered': len(results),
+        'written': written,
+        'skipped': skipped,
+        'errors': errors,
+        'render_time': render_time,
+        'pages_per_second': len(results) / render_time if render_time > 0 else 0.0,
+        'total_time': total_time
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pre-render every page under /alleles/ to a static tree')
+    parser.add_argument('--output', default='build/site', help='the folder to write the static tree to')
+    parser.add_argument('--processes', type=int, default=os.cpu_count(), help='the number of worker processes')
+    parser.add_argument('--force', action='store_true', help='render every page, ignoring the previous build')
+    parser.add_argument('--endpoint', action='append', dest='endpoints', help='only render pages for this endpoint (can be repeated)')
+    args = parser.parse_args()
+
+    summary = freeze(args.output, args.processes, args.force, args.endpoints)
+
+    for error in summary['errors']:
+        print (f"Failed to render {error['url']} ({error['status']}) {error.get('error', '')}")
+    print (f"Rendered {summary['rendered']} pages ({summary['written']} changed, {summary['skipped']} unchanged and skipped, {len(summary['errors'])} failed)")
+    print (f"Rendered at {round(summary['pages_per_second'], 1)} pages per second")
+    print (f"Total build time {round(summary['total_time'], 1)}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+from typing import Dict, List
+
+
+adr_index_fields = ['drug', 'pubmed_id', 'ancestry']
+
+
+def normalise_term(term:str) -> str:
+    return term.strip().lower()
+
+
+def build_adr_index(hla_adr:Dict) -> Dict:
+    """
+    This function flattens the adverse drug reaction dataset into a list of evidence records, and builds an inverted index from drug, PubMed ID and ancestry to those records.
+
+    Args:
+        hla_adr (dictionary): the hla_adr dataset, keyed by locus, then allele group, then allele
+
+    Returns:
+        dict: the 'evidence' records and the 'index' of each field, mapping normalised terms to record positions
+    """
+    evidence = []
+    index = {field: {} for field in adr_index_fields}
+    for locus in hla_adr:
+        for allele_group, allele_group_data in hla_adr[locus]['allele_groups'].items():
+            for allele, allele_data in allele_group_data['alleles'].items():
+                for reaction in allele_data['reactions']:
+                    record = {
+                        'allele': allele,
+                        'allele_number': allele_data['allele_number'],
+                        'allele_group': allele_group,
+                        'locus': locus
+                    }
+                    record.update(reaction)
+                    for field in adr_index_fields:
+                        if reaction.get(field):
+                            index[field].setdefault(normalise_term(reaction[field]), []).append(len(evidence))
+                    evidence.append(record)
+    return {'evidence': evidence, 'index': index}
@@ -0,0 +1,215 @@
+from typing import Dict, List, Optional
+
+from collections import OrderedDict
+
+import hashlib
+import os
+import threading
+import time
+
+
+def hash_files(paths:List[str]) -> str:
+    """
+    This function hashes the contents of a list of files and folders, walking each folder in a stable order.
+
+    Args:
+        paths (list): the paths of the files and folders to hash
+
+    Returns:
+        string: a hex digest of the files
+    """
+    file_hash = hashlib.sha1()
+    for path in paths:
+        if os.path.isfile(path):
+            filepaths = [path]
+        else:
+            filepaths = []
+            for root, folders, files in sorted(os.walk(path)):
+                # compiled bytecode changes whenever the source does, and differs between machines
+                folders[:] = sorted([folder for folder in folders if folder != '__pycache__'])
+                filepaths += [f"{root}/{file}" for file in sorted(files)]
+        for filepath in filepaths:
+            with open(filepath, 'rb') as f:
+                file_hash.update(os.path.relpath(filepath, path).encode('utf-8'))
+                file_hash.update(f.read())
+    return file_hash.hexdigest()
+
+
+def build_cache_key(data_version:str, app_version:str, endpoint:str, path:str, query_args:Dict) -> str:
+    """
+    This function builds the key used to store a rendered page in the response cache.
+
+    The rendered output only depends on the loaded datasets, the code and templates which render it, the url and the querystring, so the key is built from those.
+
+    Args:
+        data_version (string): the hash of the currently loaded datasets
+        app_version (string): the hash of the application code and templates
+        endpoint (string): the name of the Flask endpoint
+        path (string): the request path, which carries flags such as /expanded
+        query_args (dictionary): the querystring arguments for the request
+
+    Returns:
+        string: the cache key
+    """
+    querystring = '&'.join([f"{arg}={query_args[arg]}" for arg in sorted(query_args)])
+    return f"{data_version}|{app_version}|{endpoint}|{path.rstrip('/')}|{querystring}"
+
+
+def build_etag(cache_key:str) -> str:
+    """
+    This function builds a strong ETag for a cache key, as the key includes the data and app versions the ETag changes whenever the data, code or templates do.
+
+    Args:
+        cache_key (string): the key generated by build_cache_key
+
+    Returns:
+        string: the ETag value (without quotes)
+    """
+    return hashlib.sha1(cache_key.encode('utf-8')).hexdigest()
+
+
+class LRUCache():
+    """
+    A thread safe, bounded least recently used cache.
+    """
+    def __init__(self, max_entries:int=512):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+
+    def get(self, cache_key:str):
+        with self.lock:
+            if cache_key in self.entries:
+                self.entries.move_to_end(cache_key)
+                return self.entries[cache_key]
+        return None
+
+
+    def store(self, cache_key:str, entry):
+        with self.lock:
+            self.entries[cache_key] = entry
+            self.entries.move_to_end(cache_key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class ResponseCache(LRUCache):
+    """
+    A bounded least recently used cache of rendered pages, with an optional disk tier.
+
+    Entries are dictionaries containing the rendered 'body' and its 'etag', along with any compressed copies of the body in 'encodings'.
+
+    Pages on disk outlive the process, so the disk tier is pruned to its newest max_disk_entries pages, and pages older than max_age seconds are neither served nor kept.
+    """
+    def __init__(self, max_entries:int=512, cache_dir:Optional[str]=None, max_disk_entries:int=4096, max_age:int=86400, prune_interval:int=64):
+        super().__init__(max_entries)
+        self.cache_dir = cache_dir
+        self.max_disk_entries = max_disk_entries
+        self.max_age = max_age
+        self.prune_interval = prune_interval
+        self.disk_writes = 0
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self.prune_disk()
+
+
+    def disk_path(self, etag:str) -> str:
+        return f"{self.cache_dir}/{etag}.html"
+
+
+    def remove_files(self, etag:str):
+        for path in [self.disk_path(etag), f"{self.disk_path(etag)}.br", f"{self.disk_path(etag)}.gzip"]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # another worker sharing the folder may have already removed it
+                pass
+
+
+    def prune_disk(self):
+        """
+        Removes pages from the disk tier which are older than max_age, then the oldest pages beyond max_disk_entries, along with their compressed copies.
+        """
+        pages = []
+        for file in os.listdir(self.cache_dir):
+            if file.endswith('.html'):
+                try:
+                    pages.append((os.path.getmtime(f"{self.cache_dir}/{file}"), file[:-len('.html')]))
+                except FileNotFoundError:
+                    pass
+        pages.sort(reverse=True)
+        expiry = time.time() - self.max_age
+        for position, (modified, etag) in enumerate(pages):
+            if position >= self.max_disk_entries or modified < expiry:
+                self.remove_files(etag)
+
+
+    def clear(self):
+        super().clear()
+        if self.cache_dir:
+            for file in os.listdir(self.cache_dir):
+                if file.endswith('.html'):
+                    self.remove_files(file[:-len('.html')])
+
+
+    def get(self, cache_key:str) -> Optional[Dict]:
+        entry = super().get(cache_key)
+        if entry is not None:
+            return entry
+        if self.cache_dir:
+            etag = build_etag(cache_key)
+            try:
+                if os.path.getmtime(self.disk_path(etag)) < time.time() - self.max_age:
+                    self.remove_files(etag)
+                    return None
+                with open(self.disk_path(etag), 'r') as f:
+                    entry = {'body': f.read(), 'etag': etag, 'encodings': {}}
+            except FileNotFoundError:
+                # not cached, or pruned by another worker sharing the folder
+                return None
+            for encoding in ['br', 'gzip']:
+                try:
+                    with open(f"{self.disk_path(etag)}.{encoding}", 'rb') as f:
+                        entry['encodings'][encoding] = f.read()
+                except FileNotFoundError:
+                    pass
+            self.store(cache_key, entry)
+            return entry
+        return None
+
+
+    def set(self, cache_key:str, body:str) -> Dict:
+        etag = build_etag(cache_key)
+        entry = {'body': body, 'etag': etag, 'encodings': {}}
+        self.store(cache_key, entry)
+        if self.cache_dir:
+            self.write_file(self.disk_path(etag), body.encode('utf-8'))
+            with self.lock:
+                self.disk_writes += 1
+                prune = self.disk_writes % self.prune_interval == 0
+            if prune:
+                self.prune_disk()
+        return entry
+
+
+    def set_encoded(self, entry:Dict, encoding:str, encoded_body:bytes):
+        """
+        Stores a compressed copy of a cached body alongside the entry, so that each page is only compressed once per encoding.
+        """
+        entry['encodings'][encoding] = encoded_body
+        if self.cache_dir:
+            self.write_file(f"{self.disk_path(entry['etag'])}.{encoding}", encoded_body)
+
+
+    def write_file(self, path:str, contents:bytes):
+        # write to a temporary file first so that other workers never read a partial page
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, 'wb') as f:
+            f.write(contents)
+        os.replace(temporary_path, path)
@@ -0,0 +1,126 @@
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from flask import request, current_app
+
+import gzip
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def supported_encodings() -> List[str]:
+    """
+    This function lists the content encodings the app can produce, in order of preference. Brotli is used when the brotli package is installed.
+    """
+    if brotli is not None:
+        return ['br', 'gzip']
+    return ['gzip']
+
+
+def negotiate_encoding() -> Optional[str]:
+    """
+    This function picks the best content encoding for the current request from its Accept-Encoding header.
+
+    Returns:
+        string: the encoding to use, or None if the response should be sent uncompressed
+    """
+    return request.accept_encodings.best_match(supported_encodings())
+
+
+def variant_etag(etag:str, encoding:Optional[str]) -> str:
+    """
+    This function gives the strong ETag for an encoded variant of a response, as each encoding has different bytes.
+    """
+    if encoding is None:
+        return etag
+    return f"{etag}-{encoding}"
+
+
+def variant_etags(etag:str) -> List[str]:
+    return [etag] + [variant_etag(etag, encoding) for encoding in supported_encodings()]
+
+
+def compress(body:bytes, encoding:str) -> bytes:
+    """
+    This function compresses a response body.
+
+    Args:
+        body (bytes): the uncompressed body
+        encoding (string): the content encoding, either br or gzip
+
+    Returns:
+        bytes: the compressed body
+    """
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+def stream_compress(chunks:Iterable, encoding:str) -> Iterator[bytes]:
+    """
+    This function compresses a streamed response body chunk by chunk, so that large responses do not need to be held in memory.
+
+    Args:
+        chunks (iterable): the chunks of the uncompressed body, as strings or bytes
+        encoding (string): the content encoding, either br or gzip
+
+    Yields:
+        bytes: chunks of the compressed body
+    """
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=5)
+        compress_chunk = compressor.process
+        finish = compressor.finish
+    else:
+        # a window of 16 + MAX_WBITS gives a gzip header and trailer
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        compress_chunk = compressor.compress
+        finish = compressor.flush
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        compressed = compress_chunk(chunk)
+        if compressed:
+            yield compressed
+    yield finish()
+
+
+def compressible(response) -> bool:
+    """
+    This function checks whether a response should be compressed by the middleware.
+    """
+    if response.status_code != 200 or 'Content-Encoding' in response.headers:
+        return False
+    if response.mimetype not in ['text/html', 'application/json', 'text/plain', 'text/csv']:
+        return False
+    if response.is_streamed:
+        return True
+    return response.content_length is not None and response.content_length >= current_app.config.get('COMPRESSION_MIN_SIZE', 1024)
+
+
+def compress_response(response):
+    """
+    This function is registered as an after_request handler and compresses responses which were not already compressed from the response cache.
+
+    Streamed responses are compressed as they are sent, buffered ones in one pass.
+    """
+    if not compressible(response):
+        return response
+    encoding = negotiate_encoding()
+    response.vary.add('Accept-Encoding')
+    if encoding is None:
+        return response
+    if response.is_streamed:
+        response.response = stream_compress(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        response.set_data(compress(response.get_data(), encoding))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(variant_etag(etag, encoding), weak)
+    return response
+
@@ -1,23 +1,76 @@
-from flask import request, current_app, redirect, abort
+from flask import request, current_app, redirect, abort, make_response
 
 from functools import wraps
 from .templating import render
+from .cache import build_cache_key, build_etag
+from .compression import compress, negotiate_encoding, variant_etag, variant_etags
+from .timing import timed_phase
+
+
+def cached_response(entry:dict, cache=None):
+    """
+    This function builds a response for a cached page, returning a 304 if the client already holds the current version.
+
+    Large pages are compressed according to the Accept-Encoding header, and the compressed body is kept with the cache entry.
+
+    Args:
+        entry (dictionary): the cache entry containing the rendered 'body' and its 'etag'
+        cache (ResponseCache): the cache holding the entry
+    """
+    encoding = None
+    if len(entry['body']) >= current_app.config.get('COMPRESSION_MIN_SIZE', 1024):
+        encoding = negotiate_encoding()
+    etag = variant_etag(entry['etag'], encoding)
+    if etag in request.if_none_match:
+        response = make_response('', 304)
+    elif encoding is None:
+        response = make_response(entry['body'])
+    else:
+        if encoding not in entry['encodings']:
+            cache.set_encoded(entry, encoding, compress(entry['body'].encode('utf-8'), encoding))
+        response = make_response(entry['encodings'][encoding])
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.set_etag(etag)
+    return response
 
 
 def templated(template:str):
     """
     This decorator is used perform html templating of views.
 
+    Rendered pages for GET requests are held in the application's response cache, keyed by endpoint and arguments, and served with strong ETags.
+
+    The cache lookup, view and render phases are timed and reported in the Server-Timing header.
+
     Args:
         template (string) : the name of the template to be used
     """
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
+            cache = getattr(current_app, 'response_cache', None)
+            cache_key = None
+            if cache is not None and request.method == 'GET':
+                with timed_phase('cache'):
+                    # the profile argument only turns on profiling, it doesn't change the page, so profiled requests share the page's cache entry
+                    query_args = {arg: value for arg, value in request.args.items() if arg != 'profile'}
+                    cache_key = build_cache_key(current_app.data['data_version'], current_app.app_version, request.endpoint, request.path, query_args)
+                    # the ETag is derived from the cache key, so a matching client copy can be confirmed without rendering
+                    for etag in variant_etags(build_etag(cache_key)):
+                        if etag in request.if_none_match:
+                            response = make_response('', 304)
+                            response.vary.add('Accept-Encoding')
+                            response.set_etag(etag)
+                            return response
+                    entry = cache.get(cache_key)
+                    if entry is not None:
+                        return cached_response(entry, cache)
             template_name = template
             if template_name is None:
                 template_name = f"{request.endpoint.replace('.', '/')}.html"
-            ctx = f(*args, **kwargs)
+            with timed_phase('view'):
+                ctx = f(*args, **kwargs)
             if ctx is None:
                 ctx = {}
             elif not isinstance(ctx, dict):
@@ -28,13 +81,19 @@ def templated(template:str):
             ctx['site_title'] = current_app.config['SITE_TITLE']
             ctx['static_route'] = current_app.config['STATIC_ROUTE']
             if 'error' in ctx:
-                return render('error', ctx)
+                with timed_phase('render'):
+                    return render('error', ctx)
             else:
                 if not 'redirect_to' in ctx:
                     if not 'code' in ctx:
                         ctx['code'] = 200
-                    return render(template_name, ctx)
+                    with timed_phase('render'):
+                        body = render(template_name, ctx)
+                    # views can mark a page as not cacheable e.g. when it's been rendered without data from another service
+                    if cache_key is not None and ctx.get('cacheable', True):
+                        return cached_response(cache.set(cache_key, body), cache)
+                    return body
                 else:
                     return redirect(ctx['redirect_to'], 302)
         return decorated_function
-    return decorator
\ No newline at end of file
+    return decorator
@@ -41,8 +41,8 @@ def get_querystring_item(request, field:str) -> Union[str, None]:
     """
     This function takes a request object and a field name and returns the value of the field from the querystring.
     """
-    if field in request.form:
-        value = request.args.get[field]
+    if field in request.args:
+        value = request.args.get(field)
         return nullify_empty_string(value)
     else:
         return None
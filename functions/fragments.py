@@ -0,0 +1,93 @@
+from typing import Dict, List, Tuple
+
+from functools import lru_cache
+
+
+colour_steps = 256
+
+
+def build_simple_motif_html(motif:Dict) -> str:
+    """
+    This function builds the html table for a simplified motif, with a bar above each anchor position and up to two amino acids per position.
+
+    Args:
+        motif (dictionary): the simplified motif, keyed by position
+
+    Returns:
+        string: the html table
+    """
+    rows = [0,1]
+    html = ["<table width='90%'>", "<tr>"]
+    for position in motif:
+        if motif[position] != []:
+            html.append("<td width='10%' class='motif-bar'>|</td>")
+        else:
+            html.append("<td width='10%'></td>")
+    html.append("</tr>")
+    for row in rows:
+        html.append("<tr>")
+        for position in motif:
+            html.append("<td width='10%'>")
+            if motif[position] == [] and row == 0:
+                html.append("<span class='motif-spacer'>.</span>")
+            elif len(motif[position]) > row:
+                html.append(f"<span class='motif-amino-acid simplified-{motif[position][row]['grade']}-frequency'>{motif[position][row]['amino_acid']}</span>")
+            html.append("</td>")
+        html.append("</tr>")
+    html.append("</table>")
+    return ''.join(html)
+
+
+def build_motif_fragments(motifs:Dict) -> Dict[str, str]:
+    """
+    This function prerenders the simplified motif html for every motif allele, so pages showing many alleles don't rebuild the same tables.
+
+    Args:
+        motifs (dictionary): the simplified motifs, keyed by allele slug
+
+    Returns:
+        dict: the html for each motif, keyed by allele slug
+    """
+    return {allele: build_simple_motif_html(motifs[allele]) for allele in motifs}
+
+
+@lru_cache(maxsize=None)
+def build_colour_lookup(color:Tuple) -> List[str]:
+    """
+    This function builds a lookup table of css colours running from white to the given colour, quantised to 256 steps.
+
+    Args:
+        color (tuple): the rgb colour for a score of 1, between (0, 0, 0) and (255, 255, 255)
+
+    Returns:
+        list: css rgb() values, indexed by the quantised score
+    """
+    lookup = []
+    for step in range(colour_steps):
+        percent = 1 - (step / (colour_steps - 1))
+        r, g, b = [int(channel + (255 - channel) * percent) for channel in color]
+        lookup.append(f"rgb({r}, {g}, {b})")
+    return lookup
+
+
+def score_circle(value:float, color:Tuple) -> str:
+    """
+    This function builds the html for a score circle, shaded between white and the given colour by the score.
+
+    Args:
+        value (float): the score, between 0 and 1
+        color (tuple): the rgb colour for a score of 1
+
+    Returns:
+        string: the html for the circle
+    """
+    if not value:
+        value = 0.0
+    if value == 0.0:
+        background = 'rgb(255, 255, 255)'
+        dot_class = 'dot empty-dot'
+    else:
+        step = min(max(int(round(value * (colour_steps - 1))), 0), colour_steps - 1)
+        background = build_colour_lookup(color)[step]
+        dot_class = 'dot value-dot'
+    return f'<div class="data-score dot" aria-label="Score: {round(value, 2)}" class="{dot_class}" style="background-color: {background};"></div>'
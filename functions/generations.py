@@ -0,0 +1,120 @@
+from typing import Callable, Dict
+
+from threading import Lock, Thread
+
+from flask import Flask, g, has_app_context, request, current_app
+
+import hmac
+import time
+
+
+class AllelesApp(Flask):
+    """
+    This class is the Flask app, with the datasets held as a generation which can be swapped while the app is serving.
+
+    Each request is pinned to the generation that was current when it started, so app.data doesn't change under a request when a reload is swapped in.
+    """
+    @property
+    def data(self) -> Dict:
+        if has_app_context() and 'data' in g:
+            return g.data
+        return self.current_data
+
+
+    @data.setter
+    def data(self, data:Dict):
+        self.current_data = data
+
+
+# held while a lazily built dataset is built, so concurrent requests build it once
+lazy_dataset_lock = Lock()
+
+
+def lazy_dataset(data:Dict, dataset:str, builder:Callable[[], object]):
+    """
+    This function returns a derived dataset which is only built on first use, for datasets used by a single rarely used endpoint.
+
+    The dataset is stored in the generation it was built from, so a reload starts without it and it's rebuilt from the new datasets on first use.
+
+    Args:
+        data (dictionary): the generation of the datasets
+        dataset (string): the name of the derived dataset
+        builder (callable): builds the dataset from the generation
+
+    Returns:
+        the derived dataset
+    """
+    if dataset not in data:
+        with lazy_dataset_lock:
+            if dataset not in data:
+                data[dataset] = builder()
+    return data[dataset]
+
+
+def pin_data_generation():
+    g.data = current_app.current_data
+
+
+def reload_authorised() -> bool:
+    """
+    This function checks whether a request carries the reload secret in the X-Reload-Secret header, reloading is turned off when no secret is configured.
+    """
+    secret = current_app.config.get('RELOAD_SECRET')
+    supplied = request.headers.get('X-Reload-Secret')
+    return bool(secret) and bool(supplied) and hmac.compare_digest(supplied, secret)
+
+
+class DataReloader():
+    """
+    This class builds a new generation of the datasets in a background thread and swaps it in once it's complete.
+    """
+    def __init__(self, app:AllelesApp, loader:Callable[[], Dict], digester:Callable[[], Dict]):
+        """
+        Args:
+            app (AllelesApp): the app to reload
+            loader (callable): builds a complete generation of the datasets, including the derived datasets
+            digester (callable): returns the digest of each dataset on disk, to tell whether anything has changed
+        """
+        self.app = app
+        self.loader = loader
+        self.digester = digester
+        self.lock = Lock()
+        self.status = {'state': 'idle', 'data_version': app.current_data['data_version']}
+
+
+    def start(self, force:bool=False) -> bool:
+        """
+        This function starts a reload in the background, unless one is already running.
+
+        Args:
+            force (boolean): whether to rebuild even if no dataset has changed
+
+        Returns:
+            boolean: whether a reload was started
+        """
+        if not self.lock.acquire(blocking=False):
+            return False
+        self.status = {'state': 'loading', 'started': time.strftime('%Y-%m-%dT%H:%M:%S'), 'data_version': self.app.current_data['data_version']}
+        Thread(target=self.reload, args=(force,), daemon=True).start()
+        return True
+
+
+    def reload(self, force:bool=False):
+        start = time.perf_counter()
+        previous_version = self.app.current_data['data_version']
+        try:
+            if not force and self.digester() == self.app.current_data['dataset_digests']:
+                self.status.update({'state': 'unchanged'})
+                return
+            generation = self.loader()
+            # a single reference assignment, requests already in flight keep the generation they were pinned to
+            self.app.current_data = generation
+            # entries for the previous version can't be served again, so they're dropped from memory and disk rather than left to age out
+            if getattr(self.app, 'response_cache', None) is not None:
+                self.app.response_cache.clear()
+            self.status.update({'state': 'swapped', 'previous_data_version': previous_version, 'data_version': generation['data_version']})
+        except Exception as e:
+            self.status.update({'state': 'failed', 'error': str(e)})
+        finally:
+            self.status.update({'finished': time.strftime('%Y-%m-%dT%H:%M:%S'), 'duration_ms': round((time.perf_counter() - start) * 1000, 2)})
+            self.lock.release()
@@ -0,0 +1,86 @@
+from typing import Dict, List
+
+import numpy as np
+
+
+amino_acids = 'ACDEFGHIKLMNPQRSTVWY'
+
+amino_acid_index = {amino_acid: i for i, amino_acid in enumerate(amino_acids)}
+
+similarity_metrics = ['cosine', 'jensen_shannon']
+
+
+def build_motif_tensor(distributions:Dict, peptide_length:str='9') -> Dict:
+    """
+    This function converts the positional amino acid distributions of each motif into a dense (motifs x positions x amino acids) array.
+
+    Each position is normalised to sum to 1, so that motifs built from different numbers of peptides are comparable.
+
+    Args:
+        distributions (dictionary): the sorted_amino_acid_distributions dataset, keyed by allele then peptide length then position
+        peptide_length (string): the peptide length of the motifs to compare
+
+    Returns:
+        dict: the ordered motif alleles, an index of allele to row, and the motif array
+    """
+    alleles = sorted([allele for allele in distributions if peptide_length in distributions[allele]])
+    position_count = max([len(distributions[allele][peptide_length]) for allele in alleles], default=0)
+    tensor = np.zeros((len(alleles), position_count, len(amino_acids)), dtype=np.float32)
+    for i, allele in enumerate(alleles):
+        for j, position in enumerate(distributions[allele][peptide_length]):
+            for amino_acid in distributions[allele][peptide_length][position]:
+                if amino_acid['amino_acid'] in amino_acid_index:
+                    tensor[i, j, amino_acid_index[amino_acid['amino_acid']]] = amino_acid['percentage']
+    totals = tensor.sum(axis=2, keepdims=True)
+    tensor = np.divide(tensor, totals, out=np.zeros_like(tensor), where=totals > 0)
+    return {
+        'alleles': alleles,
+        'allele_index': {allele: i for i, allele in enumerate(alleles)},
+        'tensor': tensor
+    }
+
+
+def motif_similarities(motif_tensor:Dict, allele:str, metric:str='cosine') -> np.ndarray:
+    """
+    This function compares the motif of one allele against every motif in a single vectorised step.
+
+    Args:
+        motif_tensor (dictionary): the arrays built by build_motif_tensor
+        allele (string): the slugified allele with an experimental motif e.g. hla_a_02_01
+        metric (string): either cosine (of the flattened motifs) or jensen_shannon (one minus the mean per position divergence)
+
+    Returns:
+        numpy array: the similarity, between 0 and 1, of each motif to the allele's motif
+    """
+    tensor = motif_tensor['tensor']
+    motif = tensor[motif_tensor['allele_index'][allele]]
+    if metric == 'jensen_shannon':
+        mean = (tensor + motif) / 2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            motif_divergence = np.where(motif > 0, motif * np.log2(motif / mean), 0.0).sum(axis=2)
+            tensor_divergence = np.where(tensor > 0, tensor * np.log2(tensor / mean), 0.0).sum(axis=2)
+        return 1 - ((motif_divergence + tensor_divergence) / 2).mean(axis=1)
+    flattened = tensor.reshape(len(tensor), -1)
+    norms = np.linalg.norm(flattened, axis=1) * np.linalg.norm(motif)
+    return np.divide(flattened @ motif.reshape(-1), norms, out=np.zeros(len(tensor), dtype=np.float32), where=norms > 0)
+
+
+def most_similar_motifs(motif_tensor:Dict, allele:str, count:int=10, metric:str='cosine') -> List[Dict]:
+    """
+    This function lists the alleles whose motifs are most similar to the motif of an allele, excluding the allele itself.
+
+    Returns:
+        list: dictionaries of 'allele' and 'similarity', in decreasing similarity
+    """
+    if allele not in motif_tensor['allele_index']:
+        return []
+    similarities = motif_similarities(motif_tensor, allele, metric)
+    order = np.argsort(-similarities, kind='stable')
+    similar = []
+    for i in order:
+        if motif_tensor['alleles'][i] == allele:
+            continue
+        similar.append({'allele': motif_tensor['alleles'][i], 'similarity': round(float(similarities[i]), 4)})
+        if len(similar) == count:
+            break
+    return similar
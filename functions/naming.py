@@ -0,0 +1,98 @@
+from typing import Dict
+
+from .text import slugify
+
+
+def format_locus(slug:str) -> str:
+    return slug.replace('_', '-').upper()
+
+
+def format_allele_group(slug:str) -> str:
+    elements = slug.split('_')
+    return f"{elements[0]}-{elements[1]}*{elements[2]}".upper()
+
+
+def format_allele(slug:str) -> str:
+    elements = slug.split('_')
+    return f"{elements[0]}-{elements[1]}*{elements[2]}:{elements[3]}".upper()
+
+
+class NameMaps():
+    """
+    This class holds the display name of every locus, allele group and allele slug, and the slug of every name, built once when the data is loaded.
+
+    Slugs and names which aren't in the maps, such as user input, fall back to being converted on each call.
+    """
+    def __init__(self):
+        self.slugs = {}
+        self.locus_names = {}
+        self.allele_group_names = {}
+        self.allele_names = {}
+
+
+    def add(self, names:Dict[str, str], slug:str, formatter):
+        if slug not in names:
+            name = formatter(slug)
+            names[slug] = name
+            self.slugs[name] = slug
+
+
+    def slug(self, name:str) -> str:
+        slug = self.slugs.get(name)
+        if slug is None:
+            slug = slugify(name)
+        return slug
+
+
+    def locus_name(self, slug:str) -> str:
+        name = self.locus_names.get(slug)
+        if name is None:
+            name = format_locus(slug)
+        return name
+
+
+    def allele_group_name(self, slug:str) -> str:
+        name = self.allele_group_names.get(slug)
+        if name is None:
+            name = format_allele_group(slug)
+        return name
+
+
+    def allele_name(self, slug:str) -> str:
+        name = self.allele_names.get(slug)
+        if name is None:
+            name = format_allele(slug)
+        return name
+
+
+def build_name_maps(data:Dict) -> NameMaps:
+    """
+    This function builds the name and slug maps for every locus, allele group and allele in the datasets.
+
+    The IPD protein allele names of every allele are mapped to their slugs too, as they're slugified for each match in the sequence and pocket pseudosequence lookups.
+
+    Args:
+        data (dictionary): the datasets, with species, allele_groups and protein_alleles loaded
+
+    Returns:
+        NameMaps: the maps
+    """
+    name_maps = NameMaps()
+    for species in data['species']:
+        for locus in data['species'][species]['loci']:
+            name_maps.add(name_maps.locus_names, locus, format_locus)
+    for locus, allele_groups in data['allele_groups'].items():
+        name_maps.add(name_maps.locus_names, locus, format_locus)
+        for allele_group, alleles in allele_groups.items():
+            name_maps.add(name_maps.allele_group_names, allele_group, format_allele_group)
+            for allele in alleles:
+                name_maps.add(name_maps.allele_names, allele, format_allele)
+    for locus, protein_alleles in data['protein_alleles'].items():
+        name_maps.add(name_maps.locus_names, locus, format_locus)
+        for allele, allele_data in protein_alleles.items():
+            name_maps.add(name_maps.allele_names, allele, format_allele)
+            for gene_allele in allele_data['alleles']:
+                protein_allele_name = gene_allele['protein_allele_name']
+                if protein_allele_name not in name_maps.slugs:
+                    name_maps.slugs[protein_allele_name] = slugify(protein_allele_name)
+    return name_maps
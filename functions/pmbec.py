@@ -0,0 +1,58 @@
+from typing import Dict
+
+import numpy as np
+
+
+def build_pmbec_matrix() -> Dict[str, Dict[str, float]]:
+    with open ('data/pmbec_covariance_matrix.mat', 'r') as f:
+        raw_matrix = f.read()
+
+    aa_list = []
+    new_matrix = {}
+
+    max_val = 0.0
+    min_val = 10.0
+
+    for i, line in enumerate(raw_matrix.split('\n')):   
+        if i == 0:
+            aa_list = line.split()
+        else:
+            elements = [element for element in line.split()]
+            if len(elements) > 1:
+                new_matrix[elements[0]] = {}
+                for j, element in enumerate(elements[1:]):
+                    new_matrix[elements[0]][aa_list[j]] = element
+                    if float(element) > max_val:
+                        max_val = float(element)
+                    elif float(element) < min_val:
+                        min_val = float(element)
+
+
+    # now perform min max normalisation of the matrix
+    normalised_matrix = {}
+
+    for aa in new_matrix:
+        normalised_matrix[aa] = {}
+        for sub in new_matrix[aa]:
+            normalised_matrix[aa][sub] = round((float(new_matrix[aa][sub]) - min_val) / (max_val - min_val) *10, 1)
+
+    return normalised_matrix
+
+
+def build_pmbec_lookup(matrix:Dict[str, Dict[str, float]]) -> np.ndarray:
+    """
+    This function converts the normalised PMBEC matrix into an array indexed by the byte values of the two amino acids, so substitutions in encoded sequences can be scored in a single lookup.
+
+    Pairs not in the matrix, such as gaps, score 0.
+
+    Args:
+        matrix (dictionary): the normalised matrix from build_pmbec_matrix
+
+    Returns:
+        numpy array: a 128 x 128 array of scores
+    """
+    lookup = np.zeros((128, 128), dtype=np.float32)
+    for from_aa in matrix:
+        for to_aa in matrix[from_aa]:
+            lookup[ord(from_aa), ord(to_aa)] = matrix[from_aa][to_aa]
+    return lookup
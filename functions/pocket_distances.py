@@ -0,0 +1,99 @@
+from typing import Dict, List, Optional, Tuple
+
+import json
+import os
+
+import numpy as np
+
+
+pocket_distance_metrics = ['hamming', 'pmbec']
+
+# PMBEC distances are stored in tenths as uint16, the normalised matrix is rounded to 1 decimal place so nothing is lost
+pmbec_distance_scale = 10
+
+index_filename = 'index.json'
+
+
+def block_distances(encoded:np.ndarray, start:int, stop:int, pmbec_lookup:np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    This function calculates the distances from a block of pseudosequences to every pseudosequence in a locus.
+
+    The Hamming distance counts the differing residues. The PMBEC distance sums 10 minus the normalised PMBEC score of each differing pair, so similar substitutions cost less, and a substitution to or from a gap costs 10.
+
+    Args:
+        encoded (numpy array): the (pseudosequences x positions) encoded pseudosequences of the locus
+        start (int): the first row of the block
+        stop (int): the row after the last row of the block
+        pmbec_lookup (numpy array): the 128 x 128 array from build_pmbec_lookup
+
+    Returns:
+        tuple: the (block x pseudosequences) Hamming distances as uint8 and PMBEC distances in tenths as uint16
+    """
+    block = encoded[start:stop, None, :]
+    different = block != encoded[None, :, :]
+    hamming = different.sum(axis=2, dtype=np.uint8)
+    substitution_costs = np.where(different, 10 - pmbec_lookup[block, encoded[None, :, :]], 0.0)
+    pmbec = np.rint(substitution_costs.sum(axis=2) * pmbec_distance_scale).astype(np.uint16)
+    return hamming, pmbec
+
+
+def matrix_path(folder:str, locus:str, metric:str) -> str:
+    return f"{folder}/{locus}_{metric}.npy"
+
+
+def load_pocket_distances(folder:str) -> Dict:
+    """
+    This function opens the distance matrices written by build_pocket_distance_matrices.py as read-only memory maps, so rows are only read from disk when they're sliced.
+
+    Args:
+        folder (string): the folder containing the matrices and their index
+
+    Returns:
+        dict: for each locus, the ordered pseudosequences, an index of pseudosequence to row and a memory mapped matrix for each metric, or an empty dictionary if the matrices haven't been built
+    """
+    index_path = f"{folder}/{index_filename}"
+    if not os.path.exists(index_path):
+        return {}
+    with open(index_path, 'r') as f:
+        index = json.load(f)
+    pocket_distances = {}
+    for locus in index:
+        pseudosequences = index[locus]['pseudosequences']
+        pocket_distances[locus] = {
+            'pseudosequences': pseudosequences,
+            'pseudosequence_index': {pseudosequence: i for i, pseudosequence in enumerate(pseudosequences)}
+        }
+        for metric in pocket_distance_metrics:
+            pocket_distances[locus][metric] = np.load(matrix_path(folder, locus, metric), mmap_mode='r')
+    return pocket_distances
+
+
+def pocket_distance_row(pocket_distances:Dict, locus:str, pseudosequence:str, metric:str='hamming') -> Optional[np.ndarray]:
+    """
+    This function slices the distances from a pseudosequence to every other pseudosequence in its locus.
+
+    Returns:
+        numpy array: the distances, with PMBEC distances scaled back from tenths, or None if the pseudosequence isn't in the matrices
+    """
+    locus_distances = pocket_distances.get(locus)
+    if not locus_distances or pseudosequence not in locus_distances['pseudosequence_index']:
+        return None
+    row = np.asarray(locus_distances[metric][locus_distances['pseudosequence_index'][pseudosequence]])
+    if metric == 'pmbec':
+        return row / pmbec_distance_scale
+    return row
+
+
+def nearest_pseudosequences(pocket_distances:Dict, locus:str, pseudosequence:str, metric:str='hamming', count:int=10) -> List[Dict]:
+    """
+    This function finds the closest pseudosequences in a locus to a pseudosequence, excluding itself.
+
+    Returns:
+        list: dictionaries of 'pocket_pseudosequence' and 'distance', in increasing distance
+    """
+    row = pocket_distance_row(pocket_distances, locus, pseudosequence, metric)
+    if row is None:
+        return []
+    pseudosequences = pocket_distances[locus]['pseudosequences']
+    nearest = [i for i in np.argsort(row, kind='stable')[:count + 1] if pseudosequences[i] != pseudosequence][:count]
+    return [{'pocket_pseudosequence': pseudosequences[i], 'distance': float(row[i]) if metric == 'pmbec' else int(row[i])} for i in nearest]
@@ -0,0 +1,26 @@
+from typing import Dict, List
+
+
+pockets = {
+        "a": ["5","59","63","66","159","163","167","171"],
+        "b": ["7","9","24","25","33","34","45","60","67","70"],
+        "c": ["73","74"],
+        "d": ["99","114","155","156"],
+        "e": ["97","114","147","152"],
+        "f": ["77","80","81","84","95","116","123","143","146","147"]
+}
+
+
+def map_pocket(position:int) -> str:
+    for pocket in pockets:
+        if str(position) in pockets[pocket]:
+            return pocket
+    return 'o'
+
+
+netmhcpan_pocket_residues = [7,9,24,45,59,62,63,66,67,69,70,73,74,76,77,80,81,84,95,97,99,114,116,118,143,147,150,152,156,158,159,163,167,171]
+
+netmhc_pocket_labels = [map_pocket(position) for position in netmhcpan_pocket_residues]
+
+# the length of the alpha1/alpha2 (g-domain) sequence, the antigen binding domain, in the mature protein
+gdomain_length = 182
@@ -0,0 +1,107 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+superpopulations = ['AFR','AMR','EAS','EUR','SAS']
+
+
+def build_population_frequencies(onek_alleles:Dict) -> Dict:
+    """
+    This function converts the 1K Genomes allele frequencies into arrays indexed by allele, so that coverage can be calculated for whole panels at once.
+
+    Args:
+        onek_alleles (dictionary): the 1k_alleles dataset, keyed by allele group then allele
+
+    Returns:
+        dict: the ordered alleles, an index of allele to row, the loci, the locus of each row and a (alleles x superpopulations) array of allele frequencies
+    """
+    alleles = sorted([allele for allele_group in onek_alleles for allele in onek_alleles[allele_group]])
+    allele_groups = {allele: allele_group for allele_group in onek_alleles for allele in onek_alleles[allele_group]}
+    loci = sorted(set(['_'.join(allele.split('_')[0:2]) for allele in alleles]))
+    locus_index = {locus: i for i, locus in enumerate(loci)}
+
+    frequencies = np.zeros((len(alleles), len(superpopulations)))
+    allele_loci = np.zeros(len(alleles), dtype=np.int64)
+    for i, allele in enumerate(alleles):
+        allele_loci[i] = locus_index['_'.join(allele.split('_')[0:2])]
+        row = onek_alleles[allele_groups[allele]][allele]
+        frequencies[i] = [row[superpopulation]['percentage'] / 100 for superpopulation in superpopulations]
+
+    return {
+        'alleles': alleles,
+        'allele_index': {allele: i for i, allele in enumerate(alleles)},
+        'loci': loci,
+        'allele_loci': allele_loci,
+        'frequencies': frequencies
+    }
+
+
+def locus_gene_frequencies(population_frequencies:Dict, panel:np.ndarray) -> np.ndarray:
+    """
+    This function sums the allele frequencies of a panel within each locus.
+
+    Returns:
+        numpy array: a (loci x superpopulations) array of the combined allele frequency of the panel
+    """
+    gene_frequencies = np.zeros((len(population_frequencies['loci']), len(superpopulations)))
+    np.add.at(gene_frequencies, population_frequencies['allele_loci'][panel], population_frequencies['frequencies'][panel])
+    return np.clip(gene_frequencies, 0.0, 1.0)
+
+
+def population_coverage(population_frequencies:Dict, panel:np.ndarray) -> np.ndarray:
+    """
+    This function calculates the expected fraction of each superpopulation carrying at least one allele of a panel.
+
+    Assuming Hardy-Weinberg equilibrium and independent loci, an individual is not covered only if both of their copies of every locus fall outside the panel.
+
+    Args:
+        population_frequencies (dictionary): the arrays built by build_population_frequencies
+        panel (numpy array): the row indices of the alleles in the panel
+
+    Returns:
+        numpy array: the coverage for each superpopulation
+    """
+    gene_frequencies = locus_gene_frequencies(population_frequencies, panel)
+    return 1 - np.prod((1 - gene_frequencies) ** 2, axis=0)
+
+
+def optimise_panel(population_frequencies:Dict, panel_size:int, candidates:Optional[np.ndarray]=None) -> List[int]:
+    """
+    This function greedily builds a panel of alleles which maximises the mean coverage across the superpopulations.
+
+    At each step the coverage gained by adding every remaining candidate is calculated in a single vectorised step.
+
+    Args:
+        population_frequencies (dictionary): the arrays built by build_population_frequencies
+        panel_size (int): the maximum number of alleles in the panel
+        candidates (numpy array): optionally, the row indices of the alleles to choose from, by default all alleles
+
+    Returns:
+        list: the row indices of the chosen alleles, in the order they were chosen
+    """
+    if candidates is None:
+        candidates = np.arange(len(population_frequencies['alleles']))
+    candidates = np.unique(candidates)
+    frequencies = population_frequencies['frequencies'][candidates]
+    candidate_loci = population_frequencies['allele_loci'][candidates]
+
+    gene_frequencies = np.zeros((len(population_frequencies['loci']), len(superpopulations)))
+    available = np.ones(len(candidates), dtype=bool)
+    panel = []
+
+    for i in range(min(panel_size, len(candidates))):
+        uncovered = (1 - gene_frequencies) ** 2
+        # the uncovered fraction of each superpopulation at every other locus, for the locus of each candidate
+        other_loci = np.array([np.prod(np.delete(uncovered, locus, axis=0), axis=0) for locus in range(len(uncovered))])
+        new_gene_frequencies = np.clip(gene_frequencies[candidate_loci] + frequencies, 0.0, 1.0)
+        coverage = 1 - other_loci[candidate_loci] * (1 - new_gene_frequencies) ** 2
+        scores = np.where(available, coverage.mean(axis=1), -1.0)
+        best = int(np.argmax(scores))
+        if scores[best] <= 1 - np.prod(uncovered, axis=0).mean():
+            # no remaining candidate adds any coverage
+            break
+        available[best] = False
+        gene_frequencies[candidate_loci[best]] = new_gene_frequencies[best]
+        panel.append(int(candidates[best]))
+    return panel
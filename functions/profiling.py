@@ -0,0 +1,180 @@
+from typing import Dict, List, Optional
+
+from flask import g, request, current_app
+
+import cProfile
+import hmac
+import json
+import os
+import pstats
+import random
+import time
+import uuid
+
+from urllib.parse import urlencode
+
+
+profile_formats = ['pstats', 'collapsed']
+
+# paths deeper than this are cut off when building the collapsed stacks
+max_stack_depth = 64
+
+
+def profiling_authorised() -> bool:
+    """
+    This function checks whether a request carries the profiling secret, either in the X-Profile header or the profile querystring argument.
+
+    Profiling is turned off entirely when no secret is configured.
+    """
+    secret = current_app.config.get('PROFILING_SECRET')
+    if not secret:
+        return False
+    supplied = request.headers.get('X-Profile') or request.args.get('profile')
+    return bool(supplied) and hmac.compare_digest(supplied, secret)
+
+
+def should_profile() -> bool:
+    if not current_app.config.get('PROFILING_SECRET'):
+        return False
+    if profiling_authorised():
+        return True
+    return random.random() < current_app.config.get('PROFILING_SAMPLE_RATE', 0.0)
+
+
+def function_label(function:tuple) -> str:
+    filename, line, name = function
+    return f"{os.path.basename(filename)}:{name}:{line}".replace(';', ',').replace(' ', '_')
+
+
+def build_collapsed_stacks(stats:pstats.Stats) -> List[str]:
+    """
+    This function estimates collapsed stacks, as read by flamegraph tools, from a cProfile call graph.
+
+    cProfile only records caller and callee pairs, so the time along each path is estimated by splitting each function's time between its callers in proportion to the time spent in it through each of them.
+
+    Args:
+        stats (pstats.Stats): the profile statistics
+
+    Returns:
+        list: lines of semicolon separated frames followed by the estimated self time in microseconds
+    """
+    children = {}
+    for function, (cc, nc, tt, ct, callers) in stats.stats.items():
+        for caller, edge in callers.items():
+            children.setdefault(caller, []).append((function, edge[3]))
+
+    roots = [function for function, (cc, nc, tt, ct, callers) in stats.stats.items() if not callers]
+    totals = {}
+
+    def walk(function:tuple, path:List[str], cumulative_time:float):
+        cc, nc, tt, ct, callers = stats.stats[function]
+        path = path + [function_label(function)]
+        if ct > 0:
+            self_time = cumulative_time * (tt / ct)
+            stack = ';'.join(path)
+            totals[stack] = totals.get(stack, 0.0) + self_time
+        if len(path) >= max_stack_depth:
+            return
+        for child, edge_time in children.get(function, []):
+            if function_label(child) in path or ct <= 0:
+                continue
+            walk(child, path, cumulative_time * (edge_time / ct))
+
+    for root in roots:
+        walk(root, [], stats.stats[root][3])
+
+    return [f"{stack} {int(round(duration * 1000000))}" for stack, duration in totals.items() if duration > 0]
+
+
+def profile_folder() -> str:
+    return current_app.config.get('PROFILING_DIR', 'profiles')
+
+
+def prune_profiles(folder:str, keep:int):
+    metadata_files = sorted([file for file in os.listdir(folder) if file.endswith('.json')])
+    for metadata_file in metadata_files[:-keep] if keep > 0 else metadata_files:
+        name = metadata_file[:-len('.json')]
+        for extension in profile_formats + ['json']:
+            path = f"{folder}/{name}.{extension}"
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def start_profiling():
+    if should_profile():
+        g.profiler = cProfile.Profile()
+        g.profile_start = time.perf_counter()
+        g.profiler.enable()
+
+
+def profiled_path() -> str:
+    """
+    This function returns the path and querystring of the profiled request, without the profile argument, so the secret isn't written to the profile summary.
+    """
+    query_args = [(arg, value) for arg, value in request.args.items(multi=True) if arg != 'profile']
+    if query_args:
+        return f"{request.path}?{urlencode(query_args)}"
+    return request.path
+
+
+def finish_profiling(response):
+    """
+    This function is registered as an after_request handler, it stops the profiler for a profiled request and writes out the pstats, the collapsed stacks and a summary of the request.
+    """
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return response
+    profiler.disable()
+    duration = time.perf_counter() - g.pop('profile_start')
+
+    folder = profile_folder()
+    os.makedirs(folder, exist_ok=True)
+    # names sort by time, so the oldest profiles are pruned first
+    now = time.time()
+    name = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}{int(now * 1000) % 1000:03d}-{request.endpoint or 'not_found'}-{uuid.uuid4().hex[:8]}"
+
+    profiler.dump_stats(f"{folder}/{name}.pstats")
+    with open(f"{folder}/{name}.collapsed", 'w') as f:
+        f.write('\n'.join(build_collapsed_stacks(pstats.Stats(profiler))) + '\n')
+    with open(f"{folder}/{name}.json", 'w') as f:
+        json.dump({
+            'name': name,
+            'endpoint': request.endpoint,
+            'method': request.method,
+            'path': profiled_path(),
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 2),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S')
+        }, f, indent=4)
+
+    prune_profiles(folder, current_app.config.get('PROFILING_KEEP', 50))
+    response.headers['X-Profile-Name'] = name
+    return response
+
+
+def list_profiles(folder:str) -> List[Dict]:
+    """
+    This function lists the stored profiles, most recent first.
+
+    Returns:
+        list: the summary of each profiled request
+    """
+    if not os.path.isdir(folder):
+        return []
+    profiles = []
+    for metadata_file in sorted([file for file in os.listdir(folder) if file.endswith('.json')], reverse=True):
+        with open(f"{folder}/{metadata_file}", 'r') as f:
+            profiles.append(json.load(f))
+    return profiles
+
+
+def profile_filename(folder:str, name:str, profile_format:str) -> Optional[str]:
+    """
+    This function returns the filename of a stored profile, or None if it doesn't exist or the name isn't a profile name.
+    """
+    if profile_format not in profile_formats or '/' in name or name.startswith('.'):
+        return None
+    filename = f"{name}.{profile_format}"
+    if not os.path.exists(f"{folder}/{filename}"):
+        return None
+    return filename
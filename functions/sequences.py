@@ -0,0 +1,272 @@
+from typing import Dict, List, Optional
+
+import re
+
+import numpy as np
+
+from .pockets import map_pocket, netmhcpan_pocket_residues
+
+
+kmer_size = 5
+minhash_count = 64
+
+# a Mersenne prime larger than any packed k-mer code, the hash permutations are (a * code + b) mod prime
+minhash_prime = (1 << 31) - 1
+
+
+def clean_sequence(raw_sequence:str) -> str:
+    """
+    This function strips whitespace, numbering and FASTA headers from a pasted protein sequence.
+    """
+    lines = [line for line in raw_sequence.splitlines() if not line.startswith('>')]
+    return re.sub(r'[^A-Za-z]', '', ''.join(lines)).upper()
+
+
+def extract_pocket_pseudosequence(sequence:str) -> str:
+    """
+    This function extracts the NetMHCpan pocket pseudosequence from a mature class I sequence.
+
+    Args:
+        sequence (string): the mature protein sequence, numbered from position 1
+
+    Returns:
+        string: the residues at each pocket position, with a gap for positions beyond the end of the sequence
+    """
+    return ''.join([sequence[position - 1] if position <= len(sequence) else '-' for position in netmhcpan_pocket_residues])
+
+
+def check_position_for_polymorphism(reference:str, test:str) -> bool:
+    if test == '-':
+        return False
+    if reference == test:
+        return False
+    else:
+        return True
+
+
+def build_sequence_polymorphism_data(reference_sequence:str, test_sequence:str) -> List[Dict]:
+    polymorphisms = []
+    for i in range(min(len(reference_sequence), len(test_sequence))):
+        if check_position_for_polymorphism(reference_sequence[i], test_sequence[i]):
+            polymorphisms.append({'position': i + 1, 'from': reference_sequence[i], 'to': test_sequence[i]})
+    return polymorphisms
+
+
+def build_allele_polymorphism_data(reference_pocket_pseudosequence:str, reference_sequence:str, pocket_pseudosequence:str, sequence:str) -> Dict:
+    """
+    This function finds the binding pocket, antigen binding domain and non antigen binding domain polymorphisms of a sequence compared to a reference, in the same form as the polymorphisms_and_motifs dataset.
+
+    Args:
+        reference_pocket_pseudosequence (string): the pocket pseudosequence of the reference allele
+        reference_sequence (string): the canonical sequence of the reference allele
+        pocket_pseudosequence (string): the pocket pseudosequence being compared
+        sequence (string): the sequence being compared
+
+    Returns:
+        dict: lists of polymorphisms for the 'binding_pocket', 'abd' and 'non-abd'
+    """
+    binding_pocket_polymorphisms = build_sequence_polymorphism_data(reference_pocket_pseudosequence, pocket_pseudosequence)
+
+    for polymorphism in binding_pocket_polymorphisms:
+        polymorphism['position'] = netmhcpan_pocket_residues[int(polymorphism['position']) - 1]
+        polymorphism['pocket'] = map_pocket(polymorphism['position'])
+
+    abd_polymorphisms = []
+    non_abd_polymorphisms = []
+
+    for polymorphism in build_sequence_polymorphism_data(reference_sequence, sequence):
+        if polymorphism['position'] > 180:
+            non_abd_polymorphisms.append(polymorphism)
+        else:
+            abd_polymorphisms.append(polymorphism)
+
+    return {'binding_pocket': binding_pocket_polymorphisms, 'abd': abd_polymorphisms, 'non-abd': non_abd_polymorphisms}
+
+
+# sequences are signed in batches, which bounds the memory used by the k-mer arrays
+signature_batch_size = 2048
+
+
+def kmer_codes(encoded:np.ndarray) -> np.ndarray:
+    """
+    This function packs every k-mer of a set of encoded sequences into an integer, five bits per residue, so k-mers are hashed with arithmetic rather than one at a time.
+
+    Args:
+        encoded (numpy array): the (sequences x length) encoded sequences, from encode_sequences
+
+    Returns:
+        numpy array: a (sequences x k-mers) array of k-mer codes, in sequence order
+    """
+    kmer_count = max(encoded.shape[1] - kmer_size + 1, 0)
+    codes = np.zeros((encoded.shape[0], kmer_count), dtype=np.int32)
+    for i in range(kmer_size):
+        codes |= (encoded[:, i:i + kmer_count].astype(np.int32) & 31) << (5 * i)
+    return codes
+
+
+def minhash_signatures(sequences:List[str], coefficients:np.ndarray) -> np.ndarray:
+    """
+    This function builds the MinHash signatures of the k-mers of many sequences, the minimum of each hash permutation over each sequence's k-mers.
+
+    Each permutation is (a * code + b) mod prime of the packed k-mer code. Related sequences share most of their k-mers, so each distinct k-mer of a batch is only hashed once, and each sequence's signature is gathered from those hashes.
+
+    Args:
+        sequences (list): the protein sequences
+        coefficients (numpy array): a (2 x minhash_count) array of the a and b values of each permutation
+
+    Returns:
+        numpy array: a (sequences x minhash_count) array of signatures, sequences with no k-mers have every value set to the prime
+    """
+    signatures = np.full((len(sequences), minhash_count), minhash_prime, dtype=np.int64)
+    for start in range(0, len(sequences), signature_batch_size):
+        batch = sequences[start:start + signature_batch_size]
+        codes = kmer_codes(encode_sequences(batch))
+        if codes.shape[1] == 0:
+            continue
+        kmers, kmer_rows = np.unique(codes, return_inverse=True)
+        # every permutation is below the prime, so the hashes fit in 32 bits, with an extra row of the prime for the padding
+        hashes = np.full((minhash_count, len(kmers) + 1), minhash_prime, dtype=np.int32)
+        hashes[:, :-1] = (coefficients[0][:, None] * kmers[None, :].astype(np.int64) + coefficients[1][:, None]) % minhash_prime
+        # k-mers running into the padding of shorter sequences point at the prime, so they're never the minimum
+        lengths = np.array([len(sequence) for sequence in batch], dtype=np.int64)
+        padded = np.arange(codes.shape[1])[None, :] > (lengths - kmer_size)[:, None]
+        kmer_rows = np.where(padded, len(kmers), kmer_rows.reshape(codes.shape))
+        for i in range(minhash_count):
+            signatures[start:start + len(batch), i] = hashes[i][kmer_rows].min(axis=1)
+    return signatures
+
+
+def minhash_signature(sequence:str, coefficients:np.ndarray) -> np.ndarray:
+    return minhash_signatures([sequence], coefficients)[0]
+
+
+def build_kmer_index(protein_alleles:Dict) -> Dict:
+    """
+    This function builds a MinHash index over the canonical sequence of every allele, used to find the nearest known alleles to a novel sequence.
+
+    Alleles sharing a canonical sequence share a signature, so each distinct sequence is only signed once.
+
+    Args:
+        protein_alleles (dictionary): the protein_alleles datasets, keyed by locus then allele
+
+    Returns:
+        dict: the ordered alleles and their loci, the hash permutation coefficients and a (alleles x minhash_count) array of signatures
+    """
+    random_state = np.random.RandomState(42)
+    coefficients = np.vstack([random_state.randint(1, minhash_prime, minhash_count), random_state.randint(0, minhash_prime, minhash_count)]).astype(np.int64)
+    alleles = []
+    loci = []
+    sequence_rows = {}
+    rows = []
+    for locus in protein_alleles:
+        for allele, allele_data in protein_alleles[locus].items():
+            alleles.append(allele)
+            loci.append(locus)
+            rows.append(sequence_rows.setdefault(allele_data['canonical_sequence'], len(sequence_rows)))
+    signatures = minhash_signatures(list(sequence_rows), coefficients)
+    return {
+        'alleles': alleles,
+        'loci': loci,
+        'coefficients': coefficients,
+        'signatures': signatures[np.array(rows, dtype=np.int64)].reshape(len(alleles), minhash_count)
+    }
+
+
+def nearest_alleles(kmer_index:Dict, sequence:str, count:int=10) -> List[Dict]:
+    """
+    This function estimates the k-mer Jaccard similarity of a sequence to every indexed allele, and returns the closest.
+
+    Returns:
+        list: dictionaries of 'allele', 'locus' and estimated 'similarity', in decreasing similarity
+    """
+    if len(kmer_index['alleles']) == 0:
+        return []
+    signature = minhash_signature(sequence, kmer_index['coefficients'])
+    similarities = (kmer_index['signatures'] == signature).mean(axis=1)
+    nearest = np.argsort(-similarities, kind='stable')[:count]
+    return [{'allele': kmer_index['alleles'][i], 'locus': kmer_index['loci'][i], 'similarity': round(float(similarities[i]), 4)} for i in nearest]
+
+
+def sequence_identity(reference_sequence:str, sequence:str) -> float:
+    length = min(len(reference_sequence), len(sequence))
+    if length == 0:
+        return 0.0
+    reference = np.frombuffer(reference_sequence[:length].encode('utf-8'), dtype=np.uint8)
+    test = np.frombuffer(sequence[:length].encode('utf-8'), dtype=np.uint8)
+    return float((reference == test).mean())
+
+
+def find_mature_start(sequence:str, reference_sequence:str, anchor_length:int=10) -> int:
+    """
+    This function finds where the mature protein starts in a sequence which may include a leader peptide, by finding a short stretch of a closely related mature sequence.
+
+    Returns:
+        int: the offset of the mature protein in the sequence, 0 if it can't be found
+    """
+    for anchor_start in range(0, 30, anchor_length):
+        anchor = reference_sequence[anchor_start:anchor_start + anchor_length]
+        offset = sequence.find(anchor)
+        if len(anchor) == anchor_length and offset >= anchor_start:
+            return offset - anchor_start
+    return 0
+
+
+gap_code = ord('-')
+
+
+def encode_sequences(sequences:List[str], length:Optional[int]=None) -> np.ndarray:
+    """
+    This function encodes sequences as a (sequences x length) array of byte values, padding short sequences with gaps.
+
+    Args:
+        sequences (list): the sequences to encode
+        length (int): the length to pad or truncate to, by default the longest sequence
+
+    Returns:
+        numpy array: the encoded sequences
+    """
+    if length is None:
+        length = max([len(sequence) for sequence in sequences], default=0)
+    padded = ''.join([sequence[:length].ljust(length, '-') for sequence in sequences])
+    return np.frombuffer(padded.encode('ascii'), dtype=np.uint8).reshape(len(sequences), length)
+
+
+def build_sequence_encodings(protein_alleles:Dict) -> Dict:
+    """
+    This function encodes the canonical sequence and pocket pseudosequence of every allele, so that many alleles can be compared against one in a single step.
+
+    Args:
+        protein_alleles (dictionary): the protein_alleles datasets, keyed by locus then allele
+
+    Returns:
+        dict: the ordered alleles, an index of allele to row, the length of each canonical sequence, and the encoded canonical sequences and pocket pseudosequences
+    """
+    alleles = [allele for locus in protein_alleles for allele in protein_alleles[locus]]
+    allele_data = [protein_alleles[locus][allele] for locus in protein_alleles for allele in protein_alleles[locus]]
+    return {
+        'alleles': alleles,
+        'allele_index': {allele: i for i, allele in enumerate(alleles)},
+        'lengths': np.array([len(data['canonical_sequence']) for data in allele_data], dtype=np.int64),
+        'canonical_sequences': encode_sequences([data['canonical_sequence'] for data in allele_data]),
+        'pocket_pseudosequences': encode_sequences([data['pocket_pseudosequence'] for data in allele_data], len(netmhcpan_pocket_residues))
+    }
+
+
+def compare_encoded(reference:np.ndarray, encoded:np.ndarray, reference_length:Optional[int]=None) -> np.ndarray:
+    """
+    This function finds the polymorphic positions of many encoded sequences against a reference, with the same rules as build_sequence_polymorphism_data.
+
+    Gaps in the compared sequences, and positions beyond the end of the reference, are not polymorphisms.
+
+    Args:
+        reference (numpy array): the encoded reference sequence
+        encoded (numpy array): the (sequences x length) encoded sequences to compare
+        reference_length (int): the unpadded length of the reference
+
+    Returns:
+        numpy array: a (sequences x length) boolean array, true at polymorphic positions
+    """
+    polymorphic = (encoded != reference) & (encoded != gap_code)
+    if reference_length is not None:
+        polymorphic[:, reference_length:] = False
+    return polymorphic
@@ -0,0 +1,153 @@
+from typing import Dict, List, Optional
+
+from contextlib import contextmanager
+
+import builtins
+import importlib
+import os
+import resource
+import sys
+import time
+
+
+# imports taking less than this are left out of the report
+minimum_import_ms = 1.0
+
+
+def current_memory_kb() -> int:
+    """
+    This function returns the resident memory of the process in kilobytes, falling back to the peak resident memory where /proc isn't available.
+    """
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class StartupTracer():
+    """
+    This class records the wall time and memory change of each phase of a cold start, and of each module imported while import tracing is on.
+    """
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.start_memory = current_memory_kb()
+        self.ready = None
+        self.ready_memory = None
+        self.phases = []
+        self.imports = []
+        self.import_depth = 0
+        self.original_import = None
+
+
+    @contextmanager
+    def phase(self, name:str, kind:str='phase'):
+        """
+        This context manager times a phase of the startup.
+
+        Args:
+            name (string): the name of the phase e.g. load:sets
+            kind (string): the kind of phase e.g. load, build or import
+        """
+        start = time.perf_counter()
+        start_memory = current_memory_kb()
+        try:
+            yield
+        finally:
+            self.phases.append({
+                'name': name,
+                'kind': kind,
+                'ms': round((time.perf_counter() - start) * 1000, 2),
+                'memory_delta_kb': current_memory_kb() - start_memory
+            })
+
+
+    def traced_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level != 0 or name in sys.modules:
+            return self.original_import(name, globals, locals, fromlist, level)
+        start = time.perf_counter()
+        start_memory = current_memory_kb()
+        self.import_depth += 1
+        try:
+            return self.original_import(name, globals, locals, fromlist, level)
+        finally:
+            self.import_depth -= 1
+            duration = (time.perf_counter() - start) * 1000
+            if duration >= minimum_import_ms:
+                # times include any modules imported in turn, the depth shows which imports are nested in others
+                self.imports.append({
+                    'module': name,
+                    'depth': self.import_depth,
+                    'ms': round(duration, 2),
+                    'memory_delta_kb': current_memory_kb() - start_memory
+                })
+
+
+    def start_import_trace(self):
+        if self.original_import is None:
+            self.original_import = builtins.__import__
+            builtins.__import__ = self.traced_import
+
+
+    def stop_import_trace(self):
+        if self.original_import is not None:
+            builtins.__import__ = self.original_import
+            self.original_import = None
+
+
+    def mark_ready(self):
+        # only the first app created is the cold start, apps created later (e.g. by benchmarks) add phases but don't move this
+        if self.ready is None:
+            self.ready = time.perf_counter()
+            self.ready_memory = current_memory_kb()
+
+
+    def report(self, deferred_modules:Optional[List]=None) -> Dict:
+        """
+        This function builds the startup report.
+
+        Args:
+            deferred_modules (list): the LazyModules whose imports were deferred
+
+        Returns:
+            dict: the time and memory change from the first import until the app was ready, the phases in order, the imports slowest first and the state of each deferred import
+        """
+        ready = self.ready if self.ready is not None else time.perf_counter()
+        ready_memory = self.ready_memory if self.ready_memory is not None else current_memory_kb()
+        return {
+            'total_ms': round((ready - self.start) * 1000, 2),
+            'memory_kb': ready_memory,
+            'memory_delta_kb': ready_memory - self.start_memory,
+            'phases': self.phases,
+            'imports': sorted(self.imports, key=lambda module_import: -module_import['ms']),
+            'deferred_imports': {module.name: module.loaded for module in deferred_modules or []}
+        }
+
+
+startup_tracer = StartupTracer()
+
+
+class LazyModule():
+    """
+    This class stands in for a module which is only needed by particular routes, importing it on first use rather than during the cold start.
+    """
+    def __init__(self, name:str, tracer:StartupTracer=startup_tracer):
+        self.name = name
+        self.tracer = tracer
+        self.module = None
+
+
+    @property
+    def loaded(self) -> bool:
+        return self.module is not None
+
+
+    def load(self):
+        if self.module is None:
+            with self.tracer.phase(f"import:{self.name}", 'deferred_import'):
+                self.module = importlib.import_module(self.name)
+        return self.module
+
+
+    def __getattr__(self, attribute:str):
+        return getattr(self.load(), attribute)
@@ -0,0 +1,82 @@
+from typing import Dict
+
+from collections import Counter
+
+
+def allele_group_slug(allele_slug:str) -> str:
+    return '_'.join(allele_slug.split('_')[:3])
+
+
+def species_stem(locus:str) -> str:
+    return locus.split('_')[0]
+
+
+def count_allele_groups(protein_alleles:Dict, allele_groups:Dict) -> Dict[str, Counter]:
+    """
+    This function counts the alleles in each allele group of every locus, in one pass over the alleles.
+
+    Loci with protein alleles are counted from those, loci which only have allele groups are counted from the allele group lists.
+
+    Args:
+        protein_alleles (dictionary): the protein_alleles dataset, keyed by locus then allele
+        allele_groups (dictionary): the allele_groups dataset, keyed by locus then allele group
+
+    Returns:
+        dict: a Counter of alleles per allele group, keyed by locus
+    """
+    locus_counts = {}
+    for locus, alleles in protein_alleles.items():
+        locus_counts[locus] = Counter(allele_group_slug(allele) for allele in alleles)
+    for locus, groups in allele_groups.items():
+        if locus not in locus_counts:
+            locus_counts[locus] = Counter({allele_group: len(group_alleles) for allele_group, group_alleles in groups.items()})
+    return locus_counts
+
+
+def build_stats(data:Dict) -> Dict:
+    """
+    This function builds the species, locus and allele group statistics for every species, from a single pass over the alleles.
+
+    Only counts are kept, the alleles of each group are already in the allele_groups dataset.
+
+    Args:
+        data (dictionary): the datasets, with species, protein_alleles, allele_groups and sorted_amino_acid_distributions loaded
+
+    Returns:
+        dict: the species and locus totals, the counts for each locus and its allele groups, and the totals for each species
+    """
+    locus_counts = count_allele_groups(data['protein_alleles'], data['allele_groups'])
+
+    completed_loci = set(locus for species in data['species'] for locus in data['species'][species]['loci'])
+    ipd_species = set(species_stem(locus) for locus in locus_counts)
+    completed_species = len(data['species'])
+
+    allele_group_stats = {}
+    species_stats = {}
+    for locus, group_counts in locus_counts.items():
+        allele_count = sum(group_counts.values())
+        allele_group_stats[locus] = {
+            'allele_group_count': len(group_counts),
+            'allele_count': allele_count,
+            'allele_groups': dict(group_counts)
+        }
+        totals = species_stats.setdefault(species_stem(locus), {'locus_count': 0, 'allele_group_count': 0, 'allele_count': 0})
+        totals['locus_count'] += 1
+        totals['allele_group_count'] += len(group_counts)
+        totals['allele_count'] += allele_count
+
+    return {
+        'species': {
+            'completed_species': completed_species,
+            'uncompleted_species': len(ipd_species) - completed_species,
+            'total_species': len(ipd_species)
+        },
+        'loci': {
+            'completed_loci': len(completed_loci),
+            'uncompleted_loci': len(set(locus_counts) - completed_loci),
+            'total_loci': len(set(locus_counts) | completed_loci)
+        },
+        'allele_groups': allele_group_stats,
+        'ipd_species': species_stats,
+        'motifs': len(data['sorted_amino_acid_distributions'])
+    }
@@ -0,0 +1,24 @@
+from typing import Dict
+
+
+structure_index_sets = ['alleles', 'allele_groups', 'loci', 'species']
+
+
+def build_structure_index(sets:Dict) -> Dict[str, Dict]:
+    """
+    This function reverses the structure sets, mapping each PDB code to the alleles, allele groups, loci and species it belongs to.
+
+    Args:
+        sets (dictionary): the sets dataset, where each set has a list of PDB code 'members'
+
+    Returns:
+        dict: for each lowercase PDB code, the slugs of the sets containing it, keyed by set type
+    """
+    structure_index = {}
+    for set_type in structure_index_sets:
+        for slug, structure_set in sets.get(set_type, {}).items():
+            for pdb_code in structure_set['members']:
+                if pdb_code.lower() not in structure_index:
+                    structure_index[pdb_code.lower()] = {set_type: [] for set_type in structure_index_sets}
+                structure_index[pdb_code.lower()][set_type].append(slug)
+    return structure_index
@@ -0,0 +1,128 @@
+from typing import Dict, List
+
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock, Thread
+
+import asyncio
+
+
+def structure_url(structure_route:str, locus:str, allele_slug:str) -> str:
+    return f"{structure_route}/predictions/view/class_i/{locus}/{allele_slug}_canonical.pdb"
+
+
+class StructureFetchError(Exception):
+    """
+    Raised when a structure can't be downloaded, because the server returned an error or the download failed or timed out.
+    """
+
+
+class StructureFetcher():
+    """
+    This class downloads predicted structures on an event loop in a background thread, so that the downloads for every request are made concurrently on one pooled client.
+
+    Downloads are limited to a number in flight at once, and requests for a structure which is already being downloaded wait for that download rather than starting another. The calling request's thread still waits for its downloads to finish.
+
+    The client is httpx's AsyncClient where httpx is installed, falling back to a pooled requests Session run in an executor with a thread for each download allowed in flight.
+    """
+    def __init__(self, concurrency:int=16, timeout:float=10.0):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.loop = None
+        self.client = None
+        self.asynchronous_client = False
+        self.executor = None
+        self.semaphore = None
+        self.in_flight = {}
+        self.lock = Lock()
+        self.stats = {'downloaded': 0, 'coalesced': 0, 'failed': 0}
+
+
+    def start(self):
+        with self.lock:
+            if self.loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            Thread(target=loop.run_forever, name='structure-fetcher', daemon=True).start()
+            asyncio.run_coroutine_threadsafe(self.open(), loop).result()
+            self.loop = loop
+
+
+    async def open(self):
+        # the clients are imported here rather than at the top, so they don't add to the cold start
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        try:
+            import httpx
+            self.client = httpx.AsyncClient(timeout=self.timeout, limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency))
+            self.asynchronous_client = True
+        except ImportError:
+            import requests
+            # the loop's default executor is capped at a few threads per cpu, which would cap the downloads in flight below the concurrency
+            self.executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='structure-download')
+            self.client = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=self.concurrency, pool_maxsize=self.concurrency)
+            self.client.mount('http://', adapter)
+            self.client.mount('https://', adapter)
+
+
+    async def download(self, url:str) -> str:
+        async with self.semaphore:
+            try:
+                if self.asynchronous_client:
+                    response = await self.client.get(url)
+                else:
+                    response = await asyncio.get_running_loop().run_in_executor(self.executor, lambda: self.client.get(url, timeout=self.timeout))
+            except Exception as e:
+                self.stats['failed'] += 1
+                raise StructureFetchError(f"Unable to download {url}") from e
+            # an error page isn't a structure, so it's never returned as one
+            if not 200 <= response.status_code < 300:
+                self.stats['failed'] += 1
+                raise StructureFetchError(f"{url} returned {response.status_code}")
+            self.stats['downloaded'] += 1
+            return response.text
+
+
+    async def fetch(self, url:str) -> str:
+        # this only runs on the fetcher's loop, so in_flight is never changed by two threads at once
+        task = self.in_flight.get(url)
+        if task is not None:
+            self.stats['coalesced'] += 1
+        else:
+            task = asyncio.get_running_loop().create_task(self.download(url))
+            self.in_flight[url] = task
+            task.add_done_callback(lambda done: self.in_flight.pop(url, None))
+        # shielded, so one caller timing out doesn't cancel the download for the others waiting on it
+        return await asyncio.shield(task)
+
+
+    async def fetch_all(self, urls:List[str]) -> List[str]:
+        return await asyncio.gather(*[self.fetch(url) for url in urls])
+
+
+    def fetch_many(self, urls:List[str]) -> List[str]:
+        """
+        This function downloads several structures at once, for callers outside the event loop such as Flask views.
+
+        Args:
+            urls (list): the urls of the structures
+
+        Returns:
+            list: the text of each structure, in the same order as the urls
+
+        Raises:
+            StructureFetchError: if any of the structures can't be downloaded, or they aren't all downloaded in twice the timeout
+        """
+        self.start()
+        future = asyncio.run_coroutine_threadsafe(self.fetch_all(urls), self.loop)
+        try:
+            return future.result(self.timeout * 2)
+        except StructureFetchError:
+            raise
+        except Exception as e:
+            # cancelling only stops the wait, the shielded downloads carry on for any other request waiting on them
+            future.cancel()
+            raise StructureFetchError(f"Unable to download {', '.join(urls)} within {self.timeout * 2}s") from e
+
+
+    def status(self) -> Dict:
+        return {'concurrency': self.concurrency, 'in_flight': len(self.in_flight), 'asynchronous_client': self.asynchronous_client, **self.stats}
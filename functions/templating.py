@@ -2,6 +2,14 @@ from typing import List, Dict, Optional, Callable, Union
 
 from flask import render_template
 
+import os
+
+from .cache import hash_files
+
+
+# written into the compiled templates folder by precompile_templates.py, holding the hash of the template sources they were compiled from
+template_hash_filename = 'template_hash.txt'
+
 
 def render(template_name : str, variables : Dict) -> str:
     """
@@ -16,4 +24,22 @@ def render(template_name : str, variables : Dict) -> str:
     """
     if ".html" not in template_name:
         template_name += ".html"
-    return render_template(template_name, **variables)
\ No newline at end of file
+    return render_template(template_name, **variables)
+
+
+def precompiled_templates_current(compiled_folder:str, template_folder:str) -> bool:
+    """
+    This function checks whether a folder of compiled templates was compiled from the current template sources, so that compiled templates left over from before a template was edited are never served in its place.
+
+    Args:
+        compiled_folder (string): the folder written by precompile_templates.py
+        template_folder (string): the folder of template sources
+
+    Returns:
+        boolean: whether the hash recorded with the compiled templates matches the template sources
+    """
+    hash_filepath = f"{compiled_folder}/{template_hash_filename}"
+    if not os.path.isfile(hash_filepath):
+        return False
+    with open(hash_filepath, 'r') as f:
+        return f.read().strip() == hash_files([template_folder])
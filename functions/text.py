@@ -1,14 +1,19 @@
+slug_char = '_'
+
+slug_characters = [' ','-','.',',','[',']','{','}','(',')','/','\\','*',':']
+
+# every character which is replaced in a slug, mapped to the slug character so a slug is made in a single translate pass
+ascii_slug_table = bytes.maketrans(''.join(slug_characters).encode('ascii'), slug_char.encode('ascii') * len(slug_characters))
+slug_table = str.maketrans({character: slug_char for character in slug_characters})
+
 
 def slugify(text:str) -> str:
-    slug_char = '_'
-    to_replace = [' ','-','.',',','[',']','{','}','(',')','/','\\','*',':']
-    for replace_me in to_replace:
-        if replace_me in text:
-            text = text.replace(replace_me, slug_char)
-    while slug_char*2 in text:
-        text = text.replace(slug_char*2, slug_char)
-    if text[0] == slug_char:
-        text = text[1:]
-    if text[-1] == slug_char:
-        text = text[:-1]
-    return text.lower()
\ No newline at end of file
+    # bytes.translate is a table lookup per character, str.translate with a mapping is several times slower
+    try:
+        text = text.encode('ascii').translate(ascii_slug_table).decode('ascii')
+    except UnicodeEncodeError:
+        text = text.translate(slug_table)
+    if slug_char * 2 in text or text[:1] == slug_char or text[-1:] == slug_char:
+        # splitting on the slug character and dropping the empty parts collapses runs of it and strips it from either end
+        text = slug_char.join([part for part in text.split(slug_char) if part])
+    return text.lower()
@@ -0,0 +1,141 @@
+from typing import Dict, List, Tuple
+
+from collections import deque
+from contextlib import contextmanager
+from threading import Lock
+
+from flask import g, has_request_context, request, current_app
+
+import time
+
+
+# upper bounds in seconds of the latency histogram buckets, as used by Prometheus client libraries
+latency_buckets = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+latency_quantiles = [0.5, 0.95, 0.99]
+
+# the number of recent requests per endpoint the quantiles are calculated from
+latency_sample_size = 1024
+
+
+@contextmanager
+def timed_phase(name:str):
+    """
+    This context manager records how long a phase of a request takes, to be reported in the Server-Timing header.
+
+    Outside a request, such as in build scripts and benchmarks, it does nothing.
+
+    Args:
+        name (string): the name of the phase e.g. render
+    """
+    if not has_request_context() or 'phase_timings' not in g:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        g.phase_timings.append((name, time.perf_counter() - start))
+
+
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    g.phase_timings = []
+
+
+def build_server_timing(phase_timings:List[Tuple[str, float]], total:float) -> str:
+    """
+    This function builds a Server-Timing header value, with durations in milliseconds.
+
+    Repeated phases are summed, so that e.g. two structure fetches are reported as one.
+    """
+    durations = {}
+    for name, duration in phase_timings:
+        durations[name] = durations.get(name, 0.0) + duration
+    durations['total'] = total
+    return ', '.join([f"{name};dur={round(duration * 1000, 2)}" for name, duration in durations.items()])
+
+
+class LatencyHistogram():
+    """
+    This class holds the latency distribution of an endpoint, as cumulative histogram buckets for Prometheus and a window of recent latencies for the quantiles.
+    """
+    def __init__(self):
+        self.bucket_counts = [0] * len(latency_buckets)
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=latency_sample_size)
+
+
+    def observe(self, duration:float):
+        for i, bound in enumerate(latency_buckets):
+            if duration <= bound:
+                self.bucket_counts[i] += 1
+        self.count += 1
+        self.total += duration
+        self.recent.append(duration)
+
+
+    def quantiles(self) -> Dict[float, float]:
+        recent = sorted(self.recent)
+        if not recent:
+            return {}
+        return {quantile: recent[min(int(quantile * len(recent)), len(recent) - 1)] for quantile in latency_quantiles}
+
+
+class RequestMetrics():
+    """
+    This class aggregates the latency histograms of every endpoint in memory.
+    """
+    def __init__(self):
+        self.histograms = {}
+        self.lock = Lock()
+
+
+    def observe(self, endpoint:str, duration:float):
+        with self.lock:
+            if endpoint not in self.histograms:
+                self.histograms[endpoint] = LatencyHistogram()
+            self.histograms[endpoint].observe(duration)
+
+
+    def render_prometheus(self) -> str:
+        """
+        This function writes the histograms in the Prometheus text exposition format, along with the p50, p95 and p99 latencies of each endpoint.
+
+        Returns:
+            string: the metrics
+        """
+        lines = [
+            '# HELP alleles_request_duration_seconds Request latency by endpoint.',
+            '# TYPE alleles_request_duration_seconds histogram'
+        ]
+        quantile_lines = [
+            '# HELP alleles_request_duration_quantile_seconds Request latency quantiles by endpoint, over recent requests.',
+            '# TYPE alleles_request_duration_quantile_seconds gauge'
+        ]
+        with self.lock:
+            for endpoint in sorted(self.histograms):
+                histogram = self.histograms[endpoint]
+                for bound, bucket_count in zip(latency_buckets, histogram.bucket_counts):
+                    lines.append(f'alleles_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {bucket_count}')
+                lines.append(f'alleles_request_duration_seconds_bucket{{endpoint="{endpoint}",le="+Inf"}} {histogram.count}')
+                lines.append(f'alleles_request_duration_seconds_sum{{endpoint="{endpoint}"}} {round(histogram.total, 6)}')
+                lines.append(f'alleles_request_duration_seconds_count{{endpoint="{endpoint}"}} {histogram.count}')
+                for quantile, duration in histogram.quantiles().items():
+                    quantile_lines.append(f'alleles_request_duration_quantile_seconds{{endpoint="{endpoint}",quantile="{quantile}"}} {round(duration, 6)}')
+        return '\n'.join(lines + quantile_lines) + '\n'
+
+
+def record_request_timing(response):
+    """
+    This function is registered as an after_request handler, it adds the Server-Timing header and records the request latency against its endpoint.
+    """
+    if 'request_start' not in g:
+        return response
+    total = time.perf_counter() - g.request_start
+    response.headers['Server-Timing'] = build_server_timing(g.phase_timings, total)
+    metrics = getattr(current_app, 'request_metrics', None)
+    if metrics is not None:
+        metrics.observe(request.endpoint or 'not_found', total)
+    return response
@@ -0,0 +1,155 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .sequences import encode_sequences, gap_code
+
+
+# rarities by count, for amino acids found in five or fewer sequences
+count_rarities = ['unique', 'only_two', 'only_three', 'only_four', 'only_five']
+
+# rarities by percentage, each applies below its threshold
+percentage_rarities = [
+    (1, 'extremely_rare'),
+    (2.5, 'very_rare'),
+    (5, 'rare'),
+    (10, 'unusual'),
+    (15, 'occasional'),
+    (20, 'often'),
+    (30, 'common'),
+    (51, 'regular'),
+    (87.5, 'majority'),
+    (95, 'conserved')
+]
+
+amino_acid_count = 20
+
+
+def build_variability_lookup(variability:Dict) -> Dict[Tuple[str, str, str], Tuple[str, float]]:
+    """
+    This function flattens the per-position variability data into a direct lookup of rarity and percentage.
+
+    Args:
+        variability (dictionary): the hla_class_i_variability dataset, keyed by locus then position
+
+    Returns:
+        dict: (rarity, percentage) tuples keyed by (locus, position, amino acid)
+    """
+    lookup = {}
+    for locus in variability:
+        for position, position_information in variability[locus]['variability'].items():
+            for amino_acid, rarity, percentage in zip(position_information['labels'], position_information['rarities'], position_information['percentages']):
+                lookup[(locus, position, amino_acid)] = (rarity, percentage)
+    return lookup
+
+
+def build_polymorphism_information(locus_slug:str, amino_acid:str, position:str, rarity:str) -> str:
+    """
+    This function builds the sentence describing how common an amino acid is at a position within a locus.
+
+    Args:
+        locus_slug (string): the slugified locus e.g. hla_a
+        amino_acid (string): the single letter amino acid code
+        position (string): the position in the mature protein
+        rarity (string): the rarity label from the variability data e.g. only_two
+
+    Returns:
+        string: the html information string
+    """
+    locus = locus_slug.replace('_','-').upper()
+    if rarity == 'majority':
+        return f"<strong>{amino_acid}</strong> is found at position {position} in the majority of {locus} alleles."
+    elif rarity == 'unique':
+        return f"<strong>{amino_acid}</strong> is uniquely found at position {position} in this particular {locus} allele."
+    elif 'only' in rarity:
+        return f"<strong>{amino_acid}</strong> is found at position {position} in {rarity.replace('_',' ')} {locus} alleles."
+    else:
+        return f"<strong>{amino_acid}</strong> is {rarity.replace('_',' ')}ly found at position {position} of {locus}."
+
+
+def rarity_label(count:int, percentage:float) -> str:
+    if count <= len(count_rarities):
+        return count_rarities[count - 1]
+    for threshold, rarity in percentage_rarities:
+        if percentage < threshold:
+            return rarity
+    return 'highly_conserved'
+
+
+def column_offsets(encoded:np.ndarray) -> np.ndarray:
+    # the flattened (position x 128) index of each residue, in sequence order
+    return (encoded.astype(np.int64) + 128 * np.arange(encoded.shape[1])[None, :]).ravel()
+
+
+def column_counts(encoded:np.ndarray, weights:Optional[np.ndarray]=None) -> np.ndarray:
+    """
+    This function counts every byte value in each column of an encoded sequence matrix in a single bincount.
+
+    Args:
+        encoded (numpy array): the (sequences x positions) encoded sequences
+        weights (numpy array): optionally, a weight for each sequence
+
+    Returns:
+        numpy array: a (positions x 128) array of counts, or summed weights
+    """
+    length = encoded.shape[1]
+    offsets = column_offsets(encoded)
+    if weights is not None:
+        weights = np.repeat(weights, length)
+    return np.bincount(offsets, weights=weights, minlength=128 * length).reshape(length, 128)
+
+
+def build_locus_variability(sequences:List[str], weights:Optional[np.ndarray]=None) -> Dict:
+    """
+    This function calculates the variability of each position of a set of unique sequences, in the form of the hla_class_i_variability dataset.
+
+    Gaps are not counted. When weights are given, the percentages, entropies and percentage based rarities use the weighted frequencies, while the values and count based rarities still count sequences.
+
+    Args:
+        sequences (list): the unique mature protein sequences of a locus, in allele order
+        weights (numpy array): optionally, a population frequency for each sequence
+
+    Returns:
+        dict: the 'unique_sequence_count' and the 'variability' of each position, keyed by position from 1
+    """
+    encoded = encode_sequences(sequences)
+    counts = column_counts(encoded)
+    counts[:, gap_code] = 0
+    if weights is not None:
+        frequencies = column_counts(encoded, weights)
+        frequencies[:, gap_code] = 0
+        # positions where no weighted allele has a residue fall back to counting sequences
+        unweighted = frequencies.sum(axis=1) == 0
+        frequencies[unweighted] = counts[unweighted]
+    else:
+        frequencies = counts.astype(np.float64)
+
+    totals = frequencies.sum(axis=1, keepdims=True)
+    proportions = np.divide(frequencies, totals, out=np.zeros_like(frequencies), where=totals > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        shannon_entropies = np.where(proportions > 0, proportions * np.log2(proportions), 0.0).sum(axis=1)
+
+    # labels are listed in the order they are first seen
+    offsets, first_offsets = np.unique(column_offsets(encoded), return_index=True)
+    first_seen = np.full(counts.size, len(sequences), dtype=np.int64)
+    first_seen[offsets] = first_offsets // encoded.shape[1]
+    first_seen = first_seen.reshape(counts.shape)
+
+    variability = {}
+    for i in range(encoded.shape[1]):
+        codes = sorted(np.flatnonzero(counts[i]), key=lambda code: first_seen[i, code])
+        if not codes:
+            continue
+        labels = [chr(code) for code in codes]
+        values = [int(counts[i, code]) for code in codes]
+        percentages = [round(float(proportions[i, code]) * 100, 2) for code in codes]
+        variability[str(i + 1)] = {
+            'labels': labels,
+            'normalised_shannon_entropy': float(-shannon_entropies[i] / np.log2(amino_acid_count)) + 0.0,
+            'percentages': percentages,
+            'rarities': [rarity_label(value, percentage) for value, percentage in zip(values, percentages)],
+            'shannon_entropy': float(shannon_entropies[i]),
+            'values': values,
+            'variability': dict(zip(labels, values))
+        }
+    return {'unique_sequence_count': len(sequences), 'variability': variability}
@@ -0,0 +1,570 @@
+from typing import Dict, List, Tuple
+
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+import shutil
+import string
+import time
+
+from functions.naming import format_locus, format_allele_group, format_allele
+from functions.pockets import netmhcpan_pocket_residues, gdomain_length
+from functions.sequences import build_allele_polymorphism_data
+from functions.variability import build_locus_variability
+
+
+amino_acids = 'ACDEFGHIKLMNPQRSTVWY'
+
+# the length of the mature heavy chain sequence given for each protein allele
+sequence_length = 274
+
+# the allele groups and alleles of each locus in the shipped data, used when there's no source data folder to scale from
+default_locus_sizes = {
+    'hla_a': (21, 3266),
+    'hla_b': (36, 3997),
+    'hla_c': (14, 3206),
+    'hla_e': (1, 137),
+    'hla_f': (1, 18),
+    'hla_g': (1, 45)
+}
+
+# the number of chromosomes sampled in each 1K Genomes superpopulation
+superpopulation_chromosomes = {
+    'AFR': 1322,
+    'AMR': 694,
+    'EAS': 1008,
+    'EUR': 1006,
+    'SAS': 978
+}
+
+# the nonamer positions bound by the B and F pockets, which have the strongest preferences in a motif
+anchor_positions = ['2', '9']
+
+drugs = ['abacavir', 'allopurinol', 'carbamazepine', 'dapsone', 'flucloxacillin', 'lamotrigine', 'nevirapine', 'oxcarbazepine', 'phenytoin', 'sulfamethoxazole']
+
+ancestries = ['African American', 'Caucasian', 'European', 'Han Chinese', 'Japanese', 'Korean', 'Thai']
+
+diseases = ['ankylosing_spondylitis', 'arthritis', 'asthma', 'breast_cancer', 'colitis', 'hepatitis_b', 'hiv_infection', 'malaria', 'melanoma', 'multiple_sclerosis', 'psoriasis', 'tuberculosis']
+
+# the share of new alleles whose change from their parent falls outside the g-domain, in the g-domain but not the pocket, and in the pocket
+mutation_regions = [('outside_gdomain', 0.55), ('gdomain', 0.3), ('pocket', 0.15)]
+
+
+def zipf_weights(count:int, exponent:float) -> List[float]:
+    return [1 / math.pow(rank, exponent) for rank in range(1, count + 1)]
+
+
+def zero_pad(number:int) -> str:
+    if number < 10:
+        return f"0{number}"
+    else:
+        return str(number)
+
+
+def locus_name(locus:str) -> str:
+    stem, gene = locus.split('_', 1)
+    return f"{stem.upper()}-{gene.upper()}"
+
+
+def source_locus_sizes(source:str) -> Dict[str, Tuple[int, int]]:
+    """
+    This function counts the allele groups and alleles of each locus in a data folder, to scale the synthetic data from.
+
+    Returns:
+        dict: a tuple of the allele group count and allele count, keyed by locus
+    """
+    folder = f"{source}/allele_groups"
+    if not os.path.isdir(folder):
+        return dict(default_locus_sizes)
+    locus_sizes = {}
+    for filename in sorted(os.listdir(folder)):
+        with open(f"{folder}/{filename}", 'r') as f:
+            allele_groups = json.load(f)
+        locus_sizes[filename.replace('.json', '')] = (len(allele_groups), sum(len(alleles) for alleles in allele_groups.values()))
+    return locus_sizes
+
+
+class SequenceModel():
+    """
+    This class generates related heavy chain sequences, so that pocket pseudosequences and g-domain sequences are shared between alleles the way they are in IPD.
+
+    Each locus is a variant of a common class I sequence, each allele group a variant of its locus, and each allele is its group's reference allele or an earlier allele of the group with one change. Changes fall outside the g-domain, in the g-domain away from the pocket, or in the pocket, so many alleles share a g-domain sequence and more still a pocket pseudosequence.
+    """
+    def __init__(self, rng:random.Random):
+        self.rng = rng
+        self.pocket_positions = [position - 1 for position in netmhcpan_pocket_residues]
+        pocket_positions = set(self.pocket_positions)
+        self.gdomain_positions = [position for position in range(gdomain_length) if position not in pocket_positions]
+        self.outside_positions = list(range(gdomain_length, sequence_length))
+        self.class_i_sequence = ''.join(rng.choice(amino_acids) for i in range(sequence_length))
+
+
+    def substitute(self, sequence:str, positions:List[int], count:int) -> str:
+        residues = list(sequence)
+        for position in self.rng.sample(positions, count):
+            residues[position] = self.rng.choice(amino_acids.replace(residues[position], ''))
+        return ''.join(residues)
+
+
+    def locus_sequence(self) -> str:
+        return self.substitute(self.class_i_sequence, list(range(sequence_length)), sequence_length // 6)
+
+
+    def allele_group_sequence(self, locus_sequence:str) -> str:
+        # groups differ mostly in the antigen binding domain, and most of all in the pocket
+        sequence = self.substitute(locus_sequence, self.pocket_positions, 6)
+        return self.substitute(sequence, self.gdomain_positions, 8)
+
+
+    def allele_sequence(self, parent_sequence:str) -> str:
+        region = self.rng.choices([region for region, share in mutation_regions], weights=[share for region, share in mutation_regions])[0]
+        positions = {'outside_gdomain': self.outside_positions, 'gdomain': self.gdomain_positions, 'pocket': self.pocket_positions}[region]
+        return self.substitute(parent_sequence, positions, 1)
+
+
+    def pocket_pseudosequence(self, sequence:str) -> str:
+        return ''.join(sequence[position] for position in self.pocket_positions)
+
+
+def allele_group_sizes(rng:random.Random, allele_group_count:int, allele_count:int, exponent:float) -> List[int]:
+    """
+    This function splits the alleles of a locus between its allele groups, with a few large groups and many small ones as in IPD.
+    """
+    allele_group_count = min(allele_group_count, allele_count)
+    sizes = [1] * allele_group_count
+    weights = zipf_weights(allele_group_count, exponent)
+    rng.shuffle(weights)
+    cumulative_weights = list(itertools.accumulate(weights))
+    for allele_group_index in rng.choices(range(allele_group_count), cum_weights=cumulative_weights, k=allele_count - allele_group_count):
+        sizes[allele_group_index] += 1
+    return sizes
+
+
+def build_locus(locus:str, allele_group_count:int, allele_count:int, model:SequenceModel, rng:random.Random, identifiers:itertools.count, exponent:float) -> Dict:
+    """
+    This function builds the protein alleles, allele groups, reference alleles and shared sequences of a synthetic locus.
+
+    Args:
+        locus (string): the slugified locus e.g. hla_a
+        allele_group_count (int): the number of allele groups
+        allele_count (int): the number of protein alleles
+        model (SequenceModel): the sequence model
+        rng (random.Random): the seeded random number generator
+        identifiers (itertools.count): the counter the allele identifiers are drawn from
+        exponent (float): the exponent of the Zipf distribution of allele group sizes
+
+    Returns:
+        dict: the protein_alleles, allele_groups, reference_alleles, pocket_pseudosequences, gdomain_sequences and polymorphisms_and_motifs datasets for the locus
+    """
+    name = locus_name(locus)
+    locus_sequence = model.locus_sequence()
+
+    protein_alleles = {}
+    allele_groups = {}
+    reference_alleles = {}
+    pocket_pseudosequences = {}
+    gdomain_sequences = {}
+    polymorphisms_and_motifs = {}
+    first_seen_pocket_pseudosequences = {}
+    seen_sequences = set()
+
+    for group_number, group_size in enumerate(allele_group_sizes(rng, allele_group_count, allele_count, exponent), start=1):
+        allele_group = f"{locus}_{zero_pad(group_number)}"
+        reference_sequence = model.allele_group_sequence(locus_sequence)
+        group_sequences = []
+        allele_groups[allele_group] = []
+
+        for allele_number in range(1, group_size + 1):
+            if allele_number == 1:
+                sequence = reference_sequence
+            else:
+                # many alleles are one change away from the reference allele, the rest from an earlier allele of the group
+                parent_sequence = reference_sequence if rng.random() < 0.4 else rng.choice(group_sequences)
+                sequence = model.allele_sequence(parent_sequence)
+                # another parent is tried each time, as a large group can use up every single change from one sequence
+                while sequence in seen_sequences:
+                    sequence = model.allele_sequence(rng.choice(group_sequences))
+            seen_sequences.add(sequence)
+            group_sequences.append(sequence)
+
+            allele = f"{allele_group}_{zero_pad(allele_number)}"
+            protein_allele_name = f"{name}*{zero_pad(group_number)}:{zero_pad(allele_number)}"
+            gene_alleles = [{
+                'gene_allele_name': f"{protein_allele_name}:01:{zero_pad(gene_allele_number)}",
+                'id': f"HLA{next(identifiers):05d}",
+                'locus': locus.split('_', 1)[1].upper(),
+                'protein_allele_name': protein_allele_name,
+                'source': 'synthetic'
+            } for gene_allele_number in range(1, 2 + min(int(rng.expovariate(0.5)), 20))]
+
+            gdomain_sequence = sequence[:gdomain_length]
+            pocket_pseudosequence = model.pocket_pseudosequence(sequence)
+
+            protein_alleles[allele] = {
+                'alleles': gene_alleles,
+                'canonical_allele': gene_alleles[0],
+                'canonical_sequence': sequence,
+                'gdomain_sequence': gdomain_sequence,
+                'pocket_pseudosequence': pocket_pseudosequence,
+                'sequences': [sequence]
+            }
+            allele_groups[allele_group].append(allele)
+
+            for shared_sequences, shared_sequence in [(pocket_pseudosequences, pocket_pseudosequence), (gdomain_sequences, gdomain_sequence)]:
+                if shared_sequence not in shared_sequences:
+                    shared_sequences[shared_sequence] = {'alleles': [], 'canonical_allele': gene_alleles[0]}
+                shared_sequences[shared_sequence]['alleles'].append(gene_alleles[0])
+
+            if allele_number == 1:
+                reference_alleles[allele_group] = allele
+                polymorphisms_and_motifs[allele] = {'reference': True}
+            else:
+                reference_allele = reference_alleles[allele_group]
+                reference_pocket_pseudosequence = protein_alleles[reference_allele]['pocket_pseudosequence']
+                if pocket_pseudosequence == reference_pocket_pseudosequence:
+                    matches = reference_allele
+                else:
+                    matches = first_seen_pocket_pseudosequences.get(pocket_pseudosequence)
+                polymorphisms_and_motifs[allele] = {
+                    'matches': matches,
+                    'polymorphisms': build_allele_polymorphism_data(reference_pocket_pseudosequence, reference_sequence, pocket_pseudosequence, sequence)
+                }
+            first_seen_pocket_pseudosequences.setdefault(pocket_pseudosequence, allele)
+
+        allele_groups[allele_group] = sorted(allele_groups[allele_group])
+
+    return {
+        'protein_alleles': protein_alleles,
+        'allele_groups': allele_groups,
+        'reference_alleles': {'allele_groups': reference_alleles},
+        'pocket_pseudosequences': pocket_pseudosequences,
+        'gdomain_sequences': gdomain_sequences,
+        'polymorphisms_and_motifs': polymorphisms_and_motifs
+    }
+
+
+def build_structure_sets(ranked_alleles:List[str], structure_count:int, rng:random.Random, exponent:float) -> Dict:
+    """
+    This function assigns synthetic PDB codes to alleles, with the most popular alleles having the most structures.
+
+    Returns:
+        dict: the sets dataset, with the allele, allele group, locus, species and website sets
+    """
+    pdb_codes = set()
+    while len(pdb_codes) < structure_count:
+        pdb_codes.add(rng.choice('123456789') + ''.join(rng.choices(string.ascii_lowercase + string.digits, k=3)))
+    pdb_codes = sorted(pdb_codes)
+
+    cumulative_weights = list(itertools.accumulate(zipf_weights(len(ranked_alleles), exponent)))
+    allele_members = {}
+    for pdb_code, allele in zip(pdb_codes, rng.choices(ranked_alleles, cum_weights=cumulative_weights, k=structure_count)):
+        allele_members.setdefault(allele, []).append(pdb_code)
+
+    def structure_set(slug:str, title:str, members:List[str]) -> Dict:
+        return {'count': len(members), 'description': '', 'members': members, 'slug': slug, 'title': title}
+
+    sets = {'alleles': {}, 'allele_groups': {}, 'loci': {}, 'species': {}, 'website': {}}
+    grouped_members = {'allele_groups': {}, 'loci': {}}
+    for allele, members in sorted(allele_members.items()):
+        sets['alleles'][allele] = structure_set(allele, f"{allele.upper()} structures", members)
+        grouped_members['allele_groups'].setdefault('_'.join(allele.split('_')[:3]), []).extend(members)
+        grouped_members['loci'].setdefault('_'.join(allele.split('_')[:2]), []).extend(members)
+    for set_type, members_by_slug in grouped_members.items():
+        for slug, members in sorted(members_by_slug.items()):
+            sets[set_type][slug] = structure_set(slug, f"{slug.upper()} structures", members)
+    sets['species']['human'] = structure_set('human', 'Human Class I structures', pdb_codes)
+    sets['website']['all'] = structure_set('all', f"All released structures. Generated {time.strftime('%Y-%m-%dT%H:%M:%S')}", pdb_codes)
+    return sets
+
+
+def min_max_normalise(frequencies:Dict[str, Dict], superpopulation:str):
+    percentages = [frequency[superpopulation]['percentage'] for frequency in frequencies.values()]
+    lowest, highest = min(percentages), max(percentages)
+    for frequency in frequencies.values():
+        normalised = (frequency[superpopulation]['percentage'] - lowest) / (highest - lowest) if highest > lowest else 1.0
+        frequency[superpopulation]['min_max_normalised'] = round(normalised, 3)
+
+
+def build_population_frequencies(locus_alleles:Dict[str, List[str]], ranked_alleles:List[str], share:float, rng:random.Random, exponent:float) -> Tuple[Dict, Dict]:
+    """
+    This function gives the most popular alleles of each locus 1K Genomes style frequencies, which vary between superpopulations around the same overall popularity.
+
+    Args:
+        locus_alleles (dictionary): the alleles of each locus
+        ranked_alleles (list): every allele, most popular first
+        share (float): the share of each locus' alleles which are seen in the 1K Genomes samples
+        rng (random.Random): the seeded random number generator
+        exponent (float): the exponent of the Zipf distribution of allele frequencies
+
+    Returns:
+        tuple: the 1k_alleles dataset keyed by allele group then allele, and the 1k_allele_groups dataset keyed by locus then allele group
+    """
+    rank = {allele: i for i, allele in enumerate(ranked_alleles)}
+    onek_alleles = {}
+    onek_allele_groups = {}
+
+    for locus, alleles in locus_alleles.items():
+        seen_alleles = sorted(alleles, key=lambda allele: rank[allele])[:max(1, round(len(alleles) * share))]
+        allele_frequencies = {allele: {} for allele in seen_alleles}
+        allele_group_frequencies = {}
+
+        for superpopulation, chromosomes in superpopulation_chromosomes.items():
+            weights = [weight * rng.lognormvariate(0, 0.75) for weight in zipf_weights(len(seen_alleles), exponent)]
+            total_weight = sum(weights)
+            for allele, weight in zip(seen_alleles, weights):
+                percentage = weight / total_weight * 100
+                allele_frequencies[allele][superpopulation] = {'count': round(percentage * chromosomes / 100), 'percentage': round(percentage, 3)}
+                allele_group = '_'.join(allele.split('_')[:3])
+                group_frequency = allele_group_frequencies.setdefault(allele_group, {}).setdefault(superpopulation, {'count': 0, 'percentage': 0.0})
+                group_frequency['count'] += allele_frequencies[allele][superpopulation]['count']
+                group_frequency['percentage'] = round(group_frequency['percentage'] + percentage, 3)
+            min_max_normalise(allele_frequencies, superpopulation)
+            min_max_normalise(allele_group_frequencies, superpopulation)
+
+        for allele in sorted(allele_frequencies):
+            onek_alleles.setdefault('_'.join(allele.split('_')[:3]), {})[allele] = allele_frequencies[allele]
+        onek_allele_groups[locus] = {allele_group: allele_group_frequencies[allele_group] for allele_group in sorted(allele_group_frequencies)}
+
+    return onek_alleles, onek_allele_groups
+
+
+def motif_grade(percentage:float) -> str:
+    if percentage >= 40:
+        return 'dominant'
+    elif percentage >= 15:
+        return 'high'
+    elif percentage >= 5:
+        return 'medium'
+    return 'low'
+
+
+def build_motifs(motif_alleles:List[str], rng:random.Random) -> Tuple[Dict, Dict, Dict]:
+    """
+    This function builds nonamer binding motifs for alleles, with strong preferences at the anchor positions and weak ones elsewhere.
+
+    Args:
+        motif_alleles (list): the alleles to give experimental motifs
+        rng (random.Random): the seeded random number generator
+
+    Returns:
+        tuple: the simplified_motifs, sorted_amino_acid_distributions and peptide_length_distributions datasets, keyed by allele
+    """
+    simplified_motifs = {}
+    distributions = {}
+    length_distributions = {}
+    for allele in motif_alleles:
+        simplified_motifs[allele] = {}
+        distributions[allele] = {'9': {}}
+        for position in [str(position) for position in range(1, 10)]:
+            # a lower sigma flattens the distribution, so only the anchor positions have dominant amino acids
+            sigma = 2.0 if position in anchor_positions else 0.8
+            weights = [rng.lognormvariate(0, sigma) for amino_acid in amino_acids]
+            total_weight = sum(weights)
+            distribution = sorted([{'amino_acid': amino_acid, 'percentage': round(weight / total_weight * 100, 2)} for amino_acid, weight in zip(amino_acids, weights)], key=lambda amino_acid: -amino_acid['percentage'])
+            for amino_acid in distribution:
+                amino_acid['grade'] = motif_grade(amino_acid['percentage'])
+            distributions[allele]['9'][position] = distribution
+            simplified_motifs[allele][position] = [{'amino_acid': amino_acid['amino_acid'], 'grade': amino_acid['grade']} for amino_acid in distribution[:2] if amino_acid['grade'] in ['dominant', 'high']]
+        total = rng.randint(500, 8000)
+        lengths = {str(length): rng.lognormvariate(0, 0.5) * (8 if length == 9 else 1) for length in range(8, 15)}
+        length_weight = sum(lengths.values())
+        length_distributions[allele] = {
+            'lengths': {length: {'count': round(weight / length_weight * total), 'percentage': weight / length_weight * 100} for length, weight in sorted(lengths.items())},
+            'total': total
+        }
+    return simplified_motifs, distributions, length_distributions
+
+
+def assign_motifs(polymorphisms_and_motifs:Dict, pocket_pseudosequences:Dict[str, str], simplified_motifs:Dict):
+    """
+    This function marks the alleles of a locus with experimental motifs, and infers the motif of every other allele sharing a motif allele's pocket pseudosequence, as build_motif_and_polymophism_data does.
+
+    Args:
+        polymorphisms_and_motifs (dictionary): the polymorphisms_and_motifs dataset of the locus, updated in place
+        pocket_pseudosequences (dictionary): the pocket pseudosequence of each allele of the locus
+        simplified_motifs (dictionary): the simplified motifs of the motif alleles
+    """
+    pocket_motif_alleles = {}
+    for allele in sorted(polymorphisms_and_motifs):
+        if allele in simplified_motifs:
+            pocket_motif_alleles.setdefault(pocket_pseudosequences[allele], allele)
+    for allele, allele_data in polymorphisms_and_motifs.items():
+        motif_allele = allele if allele in simplified_motifs else pocket_motif_alleles.get(pocket_pseudosequences[allele])
+        if motif_allele:
+            allele_data['motif_allele'] = motif_allele
+            allele_data['motif_type'] = 'experimental' if motif_allele == allele else 'infered'
+            allele_data['motif'] = simplified_motifs[motif_allele]
+
+
+def build_adverse_reactions(ranked_alleles:List[str], allele_count:int, rng:random.Random) -> Dict:
+    """
+    This function gives the most popular alleles adverse drug reactions, in the form of the hla_adr dataset.
+
+    Returns:
+        dict: the hla_adr dataset, keyed by locus, then allele group, then allele
+    """
+    hla_adr = {}
+    for allele in sorted(ranked_alleles[:allele_count]):
+        locus = '_'.join(allele.split('_')[:2])
+        allele_group = '_'.join(allele.split('_')[:3])
+        reactions = []
+        for drug in rng.sample(drugs, rng.randint(1, 3)):
+            for i in range(rng.randint(1, 4)):
+                reactions.append({
+                    'pubmed_id': str(rng.randint(10000000, 36000000)),
+                    'drug': drug,
+                    'ancestry': rng.choice(ancestries),
+                    'adr_url': f"https://www.allelefrequencies.net/hla-adr/adr_report.asp?dis_drug={drug}&dis_pvalue=0.05&dis_ethnicity=&dummy=dummy"
+                })
+        locus_data = hla_adr.setdefault(locus, {'locus': format_locus(locus), 'allele_groups': {}, 'reaction_count': 0})
+        allele_group_data = locus_data['allele_groups'].setdefault(allele_group, {'allele_group': format_allele_group(allele_group), 'alleles': {}, 'reaction_count': 0})
+        allele_group_data['alleles'][allele] = {'allele_number': format_allele(allele), 'reactions': reactions, 'reaction_count': len(reactions)}
+        allele_group_data['reaction_count'] += len(reactions)
+        locus_data['reaction_count'] += len(reactions)
+    return hla_adr
+
+
+def build_disease_associations(locus_allele_groups:Dict[str, List[str]], share:float, rng:random.Random, exponent:float) -> Dict:
+    """
+    This function gives a share of the allele groups of each locus disease associations, in the form of the hla_spread dataset.
+
+    Returns:
+        dict: the hla_spread dataset, keyed by locus then allele group
+    """
+    weights = zipf_weights(len(diseases), exponent)
+    hla_spread = {}
+    for locus, allele_groups in locus_allele_groups.items():
+        hla_spread[locus] = {}
+        for allele_group in allele_groups:
+            if rng.random() < share:
+                associations = {}
+                for disease in rng.choices(diseases, weights=weights, k=rng.randint(1, 40)):
+                    associations[disease] = associations.get(disease, 0) + 1
+                associations = dict(sorted(associations.items(), key=lambda association: -association[1]))
+                hla_spread[locus][allele_group] = {'disease_associations': associations, 'total_count': sum(associations.values())}
+    return hla_spread
+
+
+def write_json(filename:str, data:Dict, indent:int=None):
+    # dumps rather than dump, as dump streams through the pure Python encoder and is several times slower on the larger files
+    with open(filename, 'w') as f:
+        f.write(json.dumps(data, indent=indent))
+
+
+def generate_synthetic_data(output:str, scale:float, seed:int, source:str='data', group_scale:float=None, exponent:float=1.1, structure_share:float=0.13, population_share:float=0.03, motif_share:float=0.01, adr_share:float=0.002, disease_share:float=0.3) -> Dict:
+    """
+    This function writes a synthetic data folder, scaled from the allele group and allele counts of a source data folder.
+
+    The same seed and arguments always write the same alleles and sequences, so runs at a given scale can be compared.
+
+    Args:
+        output (string): the folder to write to
+        scale (float): the multiple of each locus' allele count to generate
+        seed (int): the seed for the random number generator
+        source (string): the data folder whose loci and counts are scaled
+        group_scale (float): the multiple of each locus' allele group count, by default the square root of the scale
+        exponent (float): the exponent of the Zipf distributions of group size and allele popularity
+        structure_share (float): the number of structures per allele
+        population_share (float): the share of each locus' alleles given 1K Genomes frequencies
+        motif_share (float): the share of alleles given experimental motifs
+        adr_share (float): the share of alleles given adverse drug reactions
+        disease_share (float): the share of each locus' allele groups given disease associations
+
+    Returns:
+        dict: the allele group and allele counts of each locus written
+    """
+    rng = random.Random(seed)
+    model = SequenceModel(rng)
+    identifiers = itertools.count(1)
+    group_scale = group_scale if group_scale is not None else math.sqrt(scale)
+
+    for folder in ['protein_alleles', 'allele_groups', 'reference_alleles', 'pocket_pseudosequences', 'gdomain_sequences']:
+        os.makedirs(f"{output}/{folder}", exist_ok=True)
+
+    locus_sizes = source_locus_sizes(source)
+    locus_alleles = {}
+    locus_allele_groups = {}
+    locus_pocket_pseudosequences = {}
+    polymorphisms_and_motifs = {}
+    variability = {}
+    summary = {}
+
+    for locus, (allele_group_count, allele_count) in locus_sizes.items():
+        allele_count = max(1, round(allele_count * scale))
+        allele_group_count = max(1, round(allele_group_count * group_scale))
+        locus_data = build_locus(locus, allele_group_count, allele_count, model, rng, identifiers, exponent)
+
+        for dataset in ['protein_alleles', 'allele_groups', 'reference_alleles', 'pocket_pseudosequences', 'gdomain_sequences']:
+            write_json(f"{output}/{dataset}/{locus}.json", locus_data[dataset])
+        polymorphisms_and_motifs[locus] = locus_data.pop('polymorphisms_and_motifs')
+        locus_alleles[locus] = list(locus_data['protein_alleles'])
+        locus_allele_groups[locus] = list(locus_data['allele_groups'])
+        locus_pocket_pseudosequences[locus] = {allele: allele_data['pocket_pseudosequence'] for allele, allele_data in locus_data['protein_alleles'].items()}
+        # every allele has its own canonical sequence, so they're already the unique sequences the variability is calculated over
+        variability[locus] = build_locus_variability([allele_data['canonical_sequence'] for allele_data in locus_data['protein_alleles'].values()])
+        summary[locus] = {
+            'allele_group_count': len(locus_data['allele_groups']),
+            'allele_count': len(locus_data['protein_alleles']),
+            'pocket_pseudosequence_count': len(locus_data['pocket_pseudosequences']),
+            'gdomain_sequence_count': len(locus_data['gdomain_sequences'])
+        }
+
+    # a single popularity ranking across the loci, so the alleles with structures are also the common ones in the population data
+    ranked_alleles = [allele for alleles in locus_alleles.values() for allele in alleles]
+    rng.shuffle(ranked_alleles)
+
+    # the popular alleles are the most studied, so they're the ones with experimental motifs
+    simplified_motifs, distributions, length_distributions = build_motifs(sorted(ranked_alleles[:max(1, round(len(ranked_alleles) * motif_share))]), rng)
+    for locus in polymorphisms_and_motifs:
+        assign_motifs(polymorphisms_and_motifs[locus], locus_pocket_pseudosequences[locus], simplified_motifs)
+
+    write_json(f"{output}/species.json", {'homo_sapiens': {'loci': list(locus_sizes)}}, 4)
+    write_json(f"{output}/polymorphisms_and_motifs.json", polymorphisms_and_motifs)
+    write_json(f"{output}/hla_class_i_variability.json", variability)
+    write_json(f"{output}/simplified_motifs.json", simplified_motifs)
+    write_json(f"{output}/sorted_amino_acid_distributions.json", distributions)
+    write_json(f"{output}/peptide_length_distributions.json", length_distributions)
+    write_json(f"{output}/hla_adr.json", build_adverse_reactions(ranked_alleles, max(1, round(len(ranked_alleles) * adr_share)), rng))
+    write_json(f"{output}/hla_spread.json", build_disease_associations(locus_allele_groups, disease_share, rng, exponent))
+    write_json(f"{output}/sets.json", build_structure_sets(ranked_alleles, max(1, round(len(ranked_alleles) * structure_share)), rng, exponent))
+
+    onek_alleles, onek_allele_groups = build_population_frequencies(locus_alleles, ranked_alleles, population_share, rng, exponent)
+    write_json(f"{output}/1k_alleles.json", onek_alleles, 4)
+    write_json(f"{output}/1k_allele_groups.json", onek_allele_groups, 4)
+
+    # the PMBEC matrix isn't scaled, but is copied so the folder is complete
+    if os.path.exists(f"{source}/pmbec_covariance_matrix.mat"):
+        shutil.copy(f"{source}/pmbec_covariance_matrix.mat", f"{output}/pmbec_covariance_matrix.mat")
+
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic data folder at a multiple of the current allele count, for capacity testing')
+    parser.add_argument('--scale', type=float, default=10, help='the multiple of each locus\' allele count to generate')
+    parser.add_argument('--group-scale', type=float, help='the multiple of each locus\' allele group count, by default the square root of the scale')
+    parser.add_argument('--seed', type=int, default=42, help='the seed for the random number generator')
+    parser.add_argument('--source', default='data', help='the data folder whose loci and counts are scaled')
+    parser.add_argument('--output', help='the folder to write to, by default synthetic_data/<scale>x')
+    parser.add_argument('--zipf', type=float, default=1.1, help='the exponent of the Zipf distributions of allele group size and allele popularity')
+    parser.add_argument('--structure-share', type=float, default=0.13, help='the number of structures per allele')
+    parser.add_argument('--population-share', type=float, default=0.03, help='the share of each locus\' alleles given 1K Genomes frequencies')
+    parser.add_argument('--motif-share', type=float, default=0.01, help='the share of alleles given experimental motifs')
+    parser.add_argument('--adr-share', type=float, default=0.002, help='the share of alleles given adverse drug reactions')
+    parser.add_argument('--disease-share', type=float, default=0.3, help='the share of each locus\' allele groups given disease associations')
+    args = parser.parse_args()
+
+    output = args.output or f"synthetic_data/{args.scale:g}x"
+    start = time.perf_counter()
+    summary = generate_synthetic_data(output, args.scale, args.seed, args.source, args.group_scale, args.zipf, args.structure_share, args.population_share, args.motif_share, args.adr_share, args.disease_share)
+
+    for locus, counts in summary.items():
+        print (f"{locus}: {counts['allele_count']} alleles in {counts['allele_group_count']} allele groups, {counts['pocket_pseudosequence_count']} pocket pseudosequences, {counts['gdomain_sequence_count']} g-domain sequences")
+    print (f"Wrote {sum(counts['allele_count'] for counts in summary.values())} alleles to {output} in {round(time.perf_counter() - start, 1)}s, serve it with ALLELES_DATA_DIR={output}")
+
+
+if __name__ == '__main__':
+    main()
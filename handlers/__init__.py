@@ -1 +1,8 @@
-from .allele_lookup import allele_lookup
\ No newline at end of file
+from .allele_lookup import allele_lookup
+from .population_coverage import population_coverage, parse_allele_list
+from .adr_lookup import adr_lookup
+from .structure_lookup import structure_lookup, parse_pdb_codes
+from .motif_similarity import similar_motif_lookup
+from .sequence_classification import classify_sequence
+from .allele_comparison import compare_alleles
+from .pocket_distances import pocket_neighbours
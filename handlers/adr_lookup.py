@@ -0,0 +1,29 @@
+from typing import Dict, List
+
+from functions.adr import normalise_term
+
+
+def adr_lookup(field:str, term:str, app_data:Dict) -> Dict:
+    """
+    This function finds the adverse drug reaction evidence, and the alleles it relates to, for a drug, PubMed ID or ancestry.
+
+    Args:
+        field (string): the field to search, one of drug, pubmed_id or ancestry
+        term (string): the value to search for, matched case insensitively
+        app_data (dictionary): the app.data datasets
+
+    Returns:
+        dict: the matching alleles (in order of first appearance) and evidence records
+    """
+    adr_index = app_data['adr_index']
+    positions = adr_index['index'][field].get(normalise_term(term), [])
+    evidence = [adr_index['evidence'][position] for position in positions]
+    alleles = list(dict.fromkeys([record['allele'] for record in evidence]))
+    return {
+        'field': field,
+        'term': term,
+        'alleles': alleles,
+        'allele_count': len(alleles),
+        'evidence': evidence,
+        'evidence_count': len(evidence)
+    }
@@ -0,0 +1,104 @@
+from typing import Dict, List
+
+import numpy as np
+
+from functions.pockets import map_pocket, netmhcpan_pocket_residues
+from functions.sequences import compare_encoded
+from functions.timing import timed_phase
+
+
+def build_comparison(allele:str, other:str, pocket_positions:np.ndarray, sequence_positions:np.ndarray, encodings:Dict, pmbec_matrix:Dict) -> Dict:
+    reference_row = encodings['allele_index'][allele]
+    other_row = encodings['allele_index'][other]
+
+    binding_pocket = []
+    pmbec_distance = 0.0
+    for i in pocket_positions:
+        from_aa = chr(encodings['pocket_pseudosequences'][reference_row, i])
+        to_aa = chr(encodings['pocket_pseudosequences'][other_row, i])
+        pmbec = pmbec_matrix.get(from_aa, {}).get(to_aa)
+        if pmbec is not None:
+            pmbec_distance += 10 - pmbec
+        binding_pocket.append({
+            'position': netmhcpan_pocket_residues[i],
+            'from': from_aa,
+            'to': to_aa,
+            'pocket': map_pocket(netmhcpan_pocket_residues[i]),
+            'pmbec': pmbec
+        })
+
+    abd = []
+    non_abd = []
+    for i in sequence_positions:
+        polymorphism = {
+            'position': int(i) + 1,
+            'from': chr(encodings['canonical_sequences'][reference_row, i]),
+            'to': chr(encodings['canonical_sequences'][other_row, i])
+        }
+        if polymorphism['position'] > 180:
+            non_abd.append(polymorphism)
+        else:
+            abd.append(polymorphism)
+
+    return {
+        'allele': other,
+        'reference': allele,
+        'binding_pocket': binding_pocket,
+        'abd': abd,
+        'non-abd': non_abd,
+        'binding_pocket_count': len(binding_pocket),
+        'abd_count': len(abd),
+        'non_abd_count': len(non_abd),
+        'pmbec_distance': round(pmbec_distance, 1)
+    }
+
+
+def compare_alleles(allele:str, others:List[str], app_data:Dict, pmbec_matrix:Dict) -> Dict:
+    """
+    This function compares one allele against a list of others, giving the binding pocket, antigen binding domain and non antigen binding domain differences of each.
+
+    The sequences are encoded once, every uncached comparison is made in a single vectorised step, and results are kept in an LRU cache.
+
+    Args:
+        allele (string): the slugified allele the others are compared against e.g. hla_b_57_01
+        others (list): the slugified alleles to compare
+        app_data (dictionary): the app.data datasets
+        pmbec_matrix (dictionary): the normalised PMBEC matrix, used to score pocket substitutions
+
+    Returns:
+        dict: the comparison for each allele found, and the alleles which weren't found
+    """
+    encodings = app_data['sequence_encodings']
+    cache = app_data['comparison_cache']
+
+    if allele not in encodings['allele_index']:
+        return {'allele': allele, 'comparisons': [], 'unmatched': [allele] + others}
+
+    unmatched = [other for other in others if other not in encodings['allele_index']]
+    others = [other for other in dict.fromkeys(others) if other in encodings['allele_index']]
+
+    comparisons = {}
+    uncached = []
+    for other in others:
+        comparison = cache.get((app_data['data_version'], allele, other))
+        if comparison is not None:
+            comparisons[other] = comparison
+        else:
+            uncached.append(other)
+
+    if uncached:
+        with timed_phase('compare'):
+            reference_row = encodings['allele_index'][allele]
+            rows = np.array([encodings['allele_index'][other] for other in uncached], dtype=np.int64)
+            pocket_polymorphisms = compare_encoded(encodings['pocket_pseudosequences'][reference_row], encodings['pocket_pseudosequences'][rows])
+            sequence_polymorphisms = compare_encoded(encodings['canonical_sequences'][reference_row], encodings['canonical_sequences'][rows], int(encodings['lengths'][reference_row]))
+            for i, other in enumerate(uncached):
+                comparison = build_comparison(allele, other, np.flatnonzero(pocket_polymorphisms[i]), np.flatnonzero(sequence_polymorphisms[i]), encodings, pmbec_matrix)
+                cache.store((app_data['data_version'], allele, other), comparison)
+                comparisons[other] = comparison
+
+    return {
+        'allele': allele,
+        'comparisons': [comparisons[other] for other in others],
+        'unmatched': unmatched
+    }
@@ -1,11 +1,14 @@
 from typing import Dict, Union, List
 
-import tidytcells as tt
+from functions.naming import NameMaps
+from functions.startup import LazyModule
 
-from functions.text import slugify
 
+# tidytcells is only needed by the allele search, so it's imported on its first use rather than during the cold start
+tt = LazyModule('tidytcells')
 
-def find_allele_match(raw_input:str, alleles):
+
+def find_allele_match(raw_input:str, alleles:Dict, name_maps:NameMaps):
     allele_slug = None
     allele_group = None
     allele_number = None
@@ -34,10 +37,10 @@ def find_allele_match(raw_input:str, alleles):
     if clean_input is None:
         return None
     else:
-        allele_slug = slugify(allele_number)
+        allele_slug = name_maps.slug(allele_number)
         allele_group = clean_input.split(':')[0]
         locus = clean_input.split('*')[0]
-        locus_slug = slugify(locus)
+        locus_slug = name_maps.slug(locus)
     
         if allele_slug in alleles[locus_slug]:
             allele_data = alleles[locus_slug][allele_slug]
@@ -47,7 +50,7 @@ def find_allele_match(raw_input:str, alleles):
     return {
         'allele_slug': allele_slug,
         'allele_group': allele_group,
-        'allele_group_slug': slugify(allele_group),
+        'allele_group_slug': name_maps.slug(allele_group),
         'allele_number': allele_number,
         'locus': locus, 
         'locus_slug': locus_slug,
@@ -65,7 +68,7 @@ def allele_lookup(request_data:Dict, app_data:Dict) -> Dict:
     raw_input = request_data['allele_number_query']
 
     if raw_input:
-        allele_info, suggestion, match = find_allele_match(raw_input, app_data.copy()['protein_alleles'])
+        allele_info, suggestion, match = find_allele_match(raw_input, app_data.copy()['protein_alleles'], app_data['name_maps'])
     else:
         allele_info = None
         suggestion = False
@@ -0,0 +1,27 @@
+from typing import Dict, Optional
+
+from functions.motif_similarity import most_similar_motifs
+
+
+def motif_allele_for(allele:str, app_data:Dict) -> Optional[str]:
+    """
+    This function returns the allele whose experimental motif applies to an allele, either the allele itself or the allele its motif is inferred from.
+    """
+    if allele in app_data['motif_tensor']['allele_index']:
+        return allele
+    locus = '_'.join(allele.split('_')[0:2])
+    allele_info = app_data['polymorphisms_and_motifs'].get(locus, {}).get(allele, {})
+    return allele_info.get('motif_allele')
+
+
+def similar_motif_lookup(allele:str, app_data:Dict, count:int=10, metric:str='cosine') -> Dict:
+    """
+    This function finds the alleles with the most similar experimental motifs to the motif of an allele.
+    """
+    motif_allele = motif_allele_for(allele, app_data)
+    return {
+        'allele': allele,
+        'motif_allele': motif_allele,
+        'metric': metric,
+        'similar_motifs': most_similar_motifs(app_data['motif_tensor'], motif_allele, count, metric) if motif_allele else []
+    }
@@ -0,0 +1,25 @@
+from typing import Dict
+
+from functions.pocket_distances import nearest_pseudosequences
+
+
+def pocket_neighbours(allele:str, app_data:Dict, metric:str='hamming', count:int=10) -> Dict:
+    """
+    This function finds the pocket pseudosequences closest to the pseudosequence of an allele, along with the alleles which share each of them.
+    """
+    locus = '_'.join(allele.split('_')[0:2])
+    allele_data = app_data['protein_alleles'].get(locus, {}).get(allele)
+    if not allele_data:
+        return {'allele': allele, 'pocket_pseudosequence': None, 'metric': metric, 'neighbours': []}
+    pseudosequence = allele_data['pocket_pseudosequence']
+    neighbours = nearest_pseudosequences(app_data['pocket_distances'], locus, pseudosequence, metric, count)
+    name_maps = app_data['name_maps']
+    for neighbour in neighbours:
+        matches = app_data['pocket_pseudosequences'][locus].get(neighbour['pocket_pseudosequence'], {}).get('alleles', [])
+        neighbour['alleles'] = list(dict.fromkeys([name_maps.slug(match['protein_allele_name']) for match in matches]))
+    return {
+        'allele': allele,
+        'pocket_pseudosequence': pseudosequence,
+        'metric': metric,
+        'neighbours': neighbours
+    }
@@ -0,0 +1,60 @@
+from typing import Dict, List
+
+import re
+
+import numpy as np
+
+from functions.text import slugify
+from functions.timing import timed_phase
+from functions.population import superpopulations, population_coverage as calculate_coverage, optimise_panel
+
+
+def parse_allele_list(raw_input:str) -> List[str]:
+    """
+    This function splits a list of allele numbers or slugs separated by commas, semicolons or whitespace, and slugifies each.
+
+    An allele given more than once, e.g. as both HLA-A*02:01 and hla_a_02_01, is only kept the first time.
+    """
+    return list(dict.fromkeys([slugify(allele) for allele in re.split(r'[,;\s]+', raw_input) if allele]))
+
+
+def coverage_summary(population_frequencies:Dict, panel:List[int]) -> Dict:
+    coverage = calculate_coverage(population_frequencies, np.array(panel, dtype=np.int64))
+    return {
+        'alleles': [population_frequencies['alleles'][i] for i in panel],
+        'coverage': {superpopulation: round(float(coverage[i]), 4) for i, superpopulation in enumerate(superpopulations)},
+        'mean_coverage': round(float(coverage.mean()), 4)
+    }
+
+
+def population_coverage(request_data:Dict, app_data:Dict) -> Dict:
+    """
+    This function calculates the expected coverage of each 1K Genomes superpopulation for a panel of alleles, and optionally the best panel of a given size.
+
+    If a panel size is given without any alleles, the optimised panel is chosen from every allele in 1K Genomes.
+    """
+    population_frequencies = app_data['population_frequencies']
+    allele_index = population_frequencies['allele_index']
+
+    alleles = parse_allele_list(request_data['alleles']) if request_data['alleles'] else []
+    # np.add.at counts every index it's given, so an allele in the panel twice would be counted twice
+    panel = list(dict.fromkeys([allele_index[allele] for allele in alleles if allele in allele_index]))
+    unmatched = [allele for allele in alleles if allele not in allele_index]
+
+    response = {
+        'request_data': request_data,
+        'unmatched': unmatched,
+        'panel': coverage_summary(population_frequencies, panel) if panel else None,
+        'optimised_panel': None
+    }
+
+    if request_data['panel_size']:
+        try:
+            panel_size = int(request_data['panel_size'])
+        except ValueError:
+            panel_size = 0
+        if panel_size > 0:
+            candidates = np.array(panel, dtype=np.int64) if panel else None
+            with timed_phase('optimise'):
+                response['optimised_panel'] = coverage_summary(population_frequencies, optimise_panel(population_frequencies, panel_size, candidates))
+    return response
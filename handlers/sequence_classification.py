@@ -0,0 +1,82 @@
+from typing import Dict, List
+
+from functions.naming import NameMaps
+from functions.pockets import gdomain_length
+from functions.generations import lazy_dataset
+from functions.timing import timed_phase
+from functions.sequences import clean_sequence, extract_pocket_pseudosequence, build_allele_polymorphism_data, build_kmer_index, nearest_alleles, sequence_identity, find_mature_start
+
+
+def exact_matches(sequence_sets:Dict, sequence:str, name_maps:NameMaps) -> List[str]:
+    """
+    This function returns the slugs of the alleles sharing a pocket pseudosequence or g-domain sequence, from any locus.
+    """
+    alleles = []
+    for locus in sequence_sets:
+        if sequence in sequence_sets[locus]:
+            for match in sequence_sets[locus][sequence]['alleles']:
+                allele_slug = name_maps.slug(match['protein_allele_name'])
+                if allele_slug not in alleles:
+                    alleles.append(allele_slug)
+    return alleles
+
+
+def classify_sequence(raw_sequence:str, app_data:Dict, count:int=10) -> Dict:
+    """
+    This function finds the closest known alleles to a novel class I sequence.
+
+    The pocket pseudosequence and g-domain of the sequence are matched exactly against the known sequences, and the nearest alleles are found from a MinHash index of canonical sequences and ranked by sequence identity. The polymorphisms are given against the reference allele of the nearest allele's group.
+
+    Args:
+        raw_sequence (string): the pasted protein sequence, with or without a leader peptide or FASTA header
+        app_data (dictionary): the app.data datasets
+        count (int): the number of nearest alleles to return
+
+    Returns:
+        dict: the pseudosequence, exact matches, nearest alleles and polymorphisms
+    """
+    sequence = clean_sequence(raw_sequence)
+
+    protein_alleles = app_data['protein_alleles']
+
+    # only this endpoint uses the index, so it's built on its first use in each generation rather than on every cold start and reload
+    with timed_phase('index'):
+        kmer_index = lazy_dataset(app_data, 'kmer_index', lambda: build_kmer_index(protein_alleles))
+
+    candidates = []
+    with timed_phase('nearest'):
+        for candidate in nearest_alleles(kmer_index, sequence, count * 2):
+            canonical_sequence = protein_alleles[candidate['locus']][candidate['allele']]['canonical_sequence']
+            offset = find_mature_start(sequence, canonical_sequence)
+            candidate['identity'] = round(sequence_identity(canonical_sequence, sequence[offset:]), 4)
+            candidate['offset'] = offset
+            candidates.append(candidate)
+    candidates = sorted(candidates, key=lambda candidate: (-candidate['identity'], -candidate['similarity']))[:count]
+
+    if candidates:
+        mature_sequence = sequence[candidates[0]['offset']:]
+    else:
+        mature_sequence = sequence
+
+    pocket_pseudosequence = extract_pocket_pseudosequence(mature_sequence)
+
+    reference_allele = None
+    polymorphisms = None
+    if candidates:
+        locus = candidates[0]['locus']
+        allele_group = '_'.join(candidates[0]['allele'].split('_')[0:3])
+        reference_allele = app_data['reference_alleles'].get(locus, {}).get('allele_groups', {}).get(allele_group)
+        if reference_allele in protein_alleles[locus]:
+            reference_data = protein_alleles[locus][reference_allele]
+            polymorphisms = build_allele_polymorphism_data(reference_data['pocket_pseudosequence'], reference_data['canonical_sequence'], pocket_pseudosequence, mature_sequence)
+
+    return {
+        'sequence': mature_sequence,
+        'leader_length': len(sequence) - len(mature_sequence),
+        'pocket_pseudosequence': pocket_pseudosequence,
+        'pocket_pseudosequence_matches': exact_matches(app_data['pocket_pseudosequences'], pocket_pseudosequence, app_data['name_maps']),
+        'gdomain_matches': exact_matches(app_data['gdomain_sequences'], mature_sequence[:gdomain_length], app_data['name_maps']),
+        'nearest_alleles': [{key: candidate[key] for key in ['allele', 'locus', 'similarity', 'identity']} for candidate in candidates],
+        'reference_allele': reference_allele,
+        'polymorphisms': polymorphisms
+    }
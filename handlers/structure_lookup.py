@@ -0,0 +1,40 @@
+from typing import Dict, List
+
+import re
+
+
+def structure_lookup(pdb_codes:List[str], app_data:Dict) -> Dict:
+    """
+    This function finds the alleles, allele groups, loci and species for one or more PDB codes, along with the number of the structures in each locus.
+
+    Args:
+        pdb_codes (list): the PDB codes to look up, in any case
+        app_data (dictionary): the app.data datasets
+
+    Returns:
+        dict: the sets for each structure found, the codes not found and the structure count for each locus
+    """
+    structure_index = app_data['structure_index']
+    structures = {}
+    unmatched = []
+    locus_counts = {}
+    for pdb_code in pdb_codes:
+        pdb_code = pdb_code.strip().lower()
+        if pdb_code in structures:
+            continue
+        if pdb_code in structure_index:
+            structures[pdb_code] = structure_index[pdb_code]
+            for locus in structure_index[pdb_code]['loci']:
+                locus_counts[locus] = locus_counts.get(locus, 0) + 1
+        else:
+            unmatched.append(pdb_code)
+    return {
+        'structures': structures,
+        'structure_count': len(structures),
+        'unmatched': unmatched,
+        'locus_counts': locus_counts
+    }
+
+
+def parse_pdb_codes(raw_input:str) -> List[str]:
+    return [pdb_code for pdb_code in re.split(r'[,;\s]+', raw_input) if pdb_code]
@@ -0,0 +1,367 @@
+from typing import Dict, List, Optional, Tuple
+
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread, local
+
+import argparse
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+
+import requests
+
+
+# served by the stand-in for any structure which isn't on disk, so the allele pages can be loaded without a copy of the coordinates
+stub_structure = "ATOM      1  CA  GLY A   1       0.000   0.000   0.000  1.00  0.00           C\nEND\n"
+
+# the share of requests made to each kind of page
+default_mix = {
+    'species': 0.05,
+    'locus': 0.15,
+    'allele_group': 0.25,
+    'allele': 0.4,
+    'lookup': 0.15
+}
+
+page_size = 25
+
+
+class StructureServer():
+    """
+    This class is a local stand-in for the coordinates server, serving predicted structures from disk after a configurable delay.
+
+    Structures are looked for at the same path as on the coordinates server e.g. predictions/view/class_i/hla_a/hla_a_01_01_canonical.pdb, and then by filename alone.
+    """
+    def __init__(self, folder:Optional[str], port:int, latency_ms:float=0.0, jitter_ms:float=0.0, strict:bool=False):
+        """
+        Args:
+            folder (string): the folder holding the structures, or None to serve the stub structure for everything
+            port (int): the port to listen on
+            latency_ms (float): the mean delay before each response
+            jitter_ms (float): the standard deviation of the delay
+            strict (boolean): whether to return a 404 for structures which aren't on disk, rather than the stub structure
+        """
+        self.folder = folder
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.strict = strict
+        self.stats = {'served': 0, 'stubbed': 0, 'missing': 0}
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), self.handler())
+        self.server.daemon_threads = True
+
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+    def find_structure(self, path:str) -> Optional[str]:
+        if not self.folder:
+            return None
+        relative_path = os.path.normpath(path.split('?')[0].lstrip('/'))
+        if relative_path.startswith('..'):
+            return None
+        for candidate in [os.path.join(self.folder, relative_path), os.path.join(self.folder, os.path.basename(relative_path))]:
+            if os.path.isfile(candidate):
+                return candidate
+        return None
+
+
+    def delay(self) -> float:
+        return max(0.0, random.gauss(self.latency_ms, self.jitter_ms) if self.jitter_ms > 0 else self.latency_ms) / 1000
+
+
+    def handler(self):
+        stand_in = self
+
+        class StructureRequestHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                time.sleep(stand_in.delay())
+                filename = stand_in.find_structure(self.path)
+                if filename:
+                    with open(filename, 'rb') as f:
+                        body = f.read()
+                    stand_in.stats['served'] += 1
+                elif stand_in.strict:
+                    stand_in.stats['missing'] += 1
+                    self.send_error(404)
+                    return
+                else:
+                    body = stub_structure.encode('utf-8')
+                    stand_in.stats['stubbed'] += 1
+                self.send_response(200)
+                self.send_header('Content-Type', 'chemical/x-pdb')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                return
+
+        return StructureRequestHandler
+
+
+    def start(self):
+        Thread(target=self.server.serve_forever, name='structure-server', daemon=True).start()
+
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def load_json_folder(folder:str) -> Dict:
+    dataset = {}
+    for filename in sorted(os.listdir(folder)):
+        if filename.endswith('.json'):
+            with open(f"{folder}/{filename}", 'r') as f:
+                dataset[filename[:-len('.json')]] = json.load(f)
+    return dataset
+
+
+def zipf_weights(count:int, exponent:float) -> List[float]:
+    return [1 / math.pow(rank, exponent) for rank in range(1, count + 1)]
+
+
+class Workload():
+    """
+    This class draws a realistic mix of page requests, with the popularity of alleles following a Zipf distribution.
+
+    Alleles are ranked in a shuffled order, so that the popular alleles are spread across the loci. Allele group and locus pages are requested for the group and locus of a drawn allele, so they inherit its popularity, and earlier pages of an allele group are requested more often than later ones.
+    """
+    def __init__(self, data_dir:str, mix:Dict[str, float], exponent:float=1.1, seed:int=42):
+        """
+        Args:
+            data_dir (string): the data folder the app is serving
+            mix (dictionary): the share of requests made to each kind of page
+            exponent (float): the exponent of the Zipf distribution
+            seed (int): the seed for the ranking and the draws
+        """
+        self.random = random.Random(seed)
+        with open(f"{data_dir}/species.json", 'r') as f:
+            self.species = json.load(f)
+        self.protein_alleles = load_json_folder(f"{data_dir}/protein_alleles")
+        self.allele_groups = load_json_folder(f"{data_dir}/allele_groups")
+
+        self.alleles = [(locus, allele) for locus in self.protein_alleles for allele in self.protein_alleles[locus]]
+        if not self.alleles:
+            raise ValueError(f"No protein alleles found in {data_dir}")
+        self.random.shuffle(self.alleles)
+        # cumulative, so each draw is a binary search rather than a pass over every allele's weight
+        self.allele_cumulative_weights = list(itertools.accumulate(zipf_weights(len(self.alleles), exponent)))
+        self.exponent = exponent
+
+        self.kinds = [kind for kind in mix if mix[kind] > 0]
+        self.kind_weights = [mix[kind] for kind in self.kinds]
+
+
+    def draw_allele(self) -> Tuple[str, str]:
+        return self.random.choices(self.alleles, cum_weights=self.allele_cumulative_weights)[0]
+
+
+    def species_stem(self, locus:str) -> str:
+        for species_stem in self.species:
+            if locus in self.species[species_stem]['loci']:
+                return species_stem
+        return next(iter(self.species))
+
+
+    def page_number(self, item_count:int) -> int:
+        page_count = max(1, math.ceil(item_count / page_size))
+        return self.random.choices(range(1, page_count + 1), weights=zipf_weights(page_count, self.exponent))[0]
+
+
+    def next_request(self) -> Tuple[str, str]:
+        """
+        This function draws the next request.
+
+        Returns:
+            tuple: the kind of page and its url
+        """
+        kind = self.random.choices(self.kinds, weights=self.kind_weights)[0]
+        locus, allele = self.draw_allele()
+        allele_group = '_'.join(allele.split('_')[:3])
+        if kind == 'species':
+            return kind, f"/alleles/species/{self.species_stem(locus)}/"
+        elif kind == 'locus':
+            return kind, f"/alleles/locus/{locus}/?page_number={self.page_number(len(self.allele_groups.get(locus, {})))}"
+        elif kind == 'allele_group':
+            # the reference allele is shown separately from the paginated alleles
+            allele_count = len(self.allele_groups.get(locus, {}).get(allele_group, [])) - 1
+            return kind, f"/alleles/allele_group/{allele_group}/?page_number={self.page_number(allele_count)}"
+        elif kind == 'lookup':
+            protein_allele_name = self.protein_alleles[locus][allele]['alleles'][0]['protein_allele_name']
+            return kind, f"/alleles/lookup/?allele_number_query={requests.utils.quote(protein_allele_name)}"
+        return kind, f"/alleles/allele/{allele}/"
+
+
+def percentile(sorted_values:List[float], fraction:float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(math.ceil(fraction * len(sorted_values))) - 1)]
+
+
+def summarise(results:List[Dict], elapsed:float) -> Dict:
+    """
+    This function summarises the requests made at one concurrency level.
+
+    Args:
+        results (list): the kind, status, latency and any error of each request
+        elapsed (float): the wall time of the run in seconds
+
+    Returns:
+        dict: the throughput, latency percentiles and error rate overall and by kind of page
+    """
+    def summary(subset:List[Dict]) -> Dict:
+        latencies = sorted(result['ms'] for result in subset)
+        errors = len([result for result in subset if result['error']])
+        return {
+            'requests': len(subset),
+            'errors': errors,
+            'error_rate': round(errors / len(subset), 4) if subset else 0.0,
+            'mean_ms': round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+            'p50_ms': round(percentile(latencies, 0.5), 2),
+            'p90_ms': round(percentile(latencies, 0.9), 2),
+            'p95_ms': round(percentile(latencies, 0.95), 2),
+            'p99_ms': round(percentile(latencies, 0.99), 2),
+            'max_ms': round(latencies[-1], 2) if latencies else 0.0
+        }
+
+    overall = summary(results)
+    overall['throughput_rps'] = round(len(results) / elapsed, 2) if elapsed > 0 else 0.0
+    overall['elapsed_s'] = round(elapsed, 3)
+    overall['kinds'] = {kind: summary([result for result in results if result['kind'] == kind]) for kind in sorted(set(result['kind'] for result in results))}
+    overall['statuses'] = {}
+    for result in results:
+        overall['statuses'][str(result['status'])] = overall['statuses'].get(str(result['status']), 0) + 1
+    return overall
+
+
+def run_level(target:str, workload:Workload, concurrency:int, request_count:int, timeout:float) -> Dict:
+    """
+    This function makes a number of requests with a fixed number of clients, each making its next request as soon as its last one completes.
+
+    Args:
+        target (string): the base url of the app e.g. http://127.0.0.1:8088
+        workload (Workload): the workload to draw requests from
+        concurrency (int): the number of clients
+        request_count (int): the total number of requests to make
+        timeout (float): the timeout for each request in seconds
+
+    Returns:
+        dict: the summary of the requests
+    """
+    # drawn up front, so every level with the same seed and count replays the same requests
+    planned = [workload.next_request() for i in range(request_count)]
+    sessions = local()
+
+    def make_request(planned_request:Tuple[str, str]) -> Dict:
+        kind, url = planned_request
+        if not hasattr(sessions, 'session'):
+            sessions.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            # redirects from the lookup aren't followed, the allele page they lead to is already part of the mix
+            response = sessions.session.get(f"{target}{url}", timeout=timeout, allow_redirects=False)
+            status = response.status_code
+            error = None if status < 400 else f"HTTP {status}"
+        except requests.RequestException as e:
+            status = 'error'
+            error = type(e).__name__
+        return {'kind': kind, 'url': url, 'status': status, 'ms': (time.perf_counter() - start) * 1000, 'error': error}
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(make_request, planned))
+    elapsed = time.perf_counter() - start
+
+    summary = summarise(results, elapsed)
+    summary['concurrency'] = concurrency
+    summary['failed_urls'] = sorted(set(result['url'] for result in results if result['error']))[:20]
+    return summary
+
+
+def parse_mix(mix_arguments:Optional[List[str]]) -> Dict[str, float]:
+    mix = dict(default_mix)
+    for mix_argument in mix_arguments or []:
+        kind, share = mix_argument.split('=')
+        if kind not in default_mix:
+            raise argparse.ArgumentTypeError(f"Unknown kind of page {kind}, expected one of {', '.join(default_mix)}")
+        mix[kind] = float(share)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test a running alleles app with a realistic mix of pages, at several concurrency levels')
+    parser.add_argument('--target', default='http://127.0.0.1:8088', help='the base url of the running app')
+    parser.add_argument('--concurrency', action='append', type=int, dest='concurrency_levels', help='a number of concurrent clients to test with (can be repeated), by default 1, 4, 16 and 32')
+    parser.add_argument('--requests', type=int, default=500, help='the number of requests made at each concurrency level')
+    parser.add_argument('--warmup', type=int, default=50, help='the number of requests made before the first level, which are not reported')
+    parser.add_argument('--timeout', type=float, default=30.0, help='the timeout for each request in seconds')
+    parser.add_argument('--mix', action='append', help='the share of requests for a kind of page, e.g. allele=0.5 (can be repeated)')
+    parser.add_argument('--zipf', type=float, default=1.1, help='the exponent of the Zipf distribution of allele popularity')
+    parser.add_argument('--seed', type=int, default=42, help='the seed for the workload')
+    parser.add_argument('--data-dir', default='data', help='the data folder the app is serving, to draw alleles from')
+    parser.add_argument('--structure-server', action='store_true', help='run the stand-in structure server, the app needs ALLELES_STRUCTURE_ROUTE set to its url')
+    parser.add_argument('--structures-only', action='store_true', help='only run the stand-in structure server, until interrupted')
+    parser.add_argument('--structure-port', type=int, default=8089, help='the port for the stand-in structure server')
+    parser.add_argument('--structure-dir', help='a folder of structures for the stand-in to serve, the stub structure is served for any it does not hold')
+    parser.add_argument('--structure-latency', type=float, default=50.0, help='the mean delay of the stand-in structure server in milliseconds')
+    parser.add_argument('--structure-jitter', type=float, default=10.0, help='the standard deviation of the stand-in delay in milliseconds')
+    parser.add_argument('--strict-structures', action='store_true', help='return a 404 for structures the stand-in does not hold, rather than the stub structure')
+    parser.add_argument('--output', default='load_test_results.json', help='the file to write the results to')
+    args = parser.parse_args()
+
+    structure_server = None
+    if args.structure_server or args.structures_only:
+        structure_server = StructureServer(args.structure_dir, args.structure_port, args.structure_latency, args.structure_jitter, args.strict_structures)
+        structure_server.start()
+        print (f"Stand-in structure server at {structure_server.url}, start the app with ALLELES_STRUCTURE_ROUTE={structure_server.url}")
+
+    if args.structures_only:
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            structure_server.stop()
+        return
+
+    workload = Workload(args.data_dir, parse_mix(args.mix), args.zipf, args.seed)
+
+    if args.warmup > 0:
+        run_level(args.target, workload, 1, args.warmup, args.timeout)
+
+    levels = []
+    for concurrency in args.concurrency_levels or [1, 4, 16, 32]:
+        level = run_level(args.target, workload, concurrency, args.requests, args.timeout)
+        levels.append(level)
+        print (f"concurrency {concurrency}: {level['throughput_rps']} req/s, p50 {level['p50_ms']}ms, p95 {level['p95_ms']}ms, p99 {level['p99_ms']}ms, errors {round(level['error_rate'] * 100, 2)}%")
+
+    output = {
+        'target': args.target,
+        'python_version': platform.python_version(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'workload': {'mix': parse_mix(args.mix), 'zipf': args.zipf, 'seed': args.seed, 'requests': args.requests, 'warmup': args.warmup},
+        'structure_server': structure_server.stats if structure_server else None,
+        'levels': levels
+    }
+    with open(args.output, 'w') as f:
+        json.dump(output, f, indent=4)
+    print (f"Wrote results for {len(levels)} concurrency levels to {args.output}")
+
+    if structure_server:
+        structure_server.stop()
+
+    if any(level['error_rate'] > 0 for level in levels):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
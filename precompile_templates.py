@@ -0,0 +1,47 @@
+import argparse
+import os
+import shutil
+import time
+
+
+def precompile_templates(target:str) -> int:
+    """
+    This function compiles every template into a folder of Python modules, which are shipped in the deployment package and loaded by a ModuleLoader.
+
+    The app's own Jinja environment is used, so the compiled templates have the same whitespace and autoescaping settings as the running app. The hash of the template sources is written alongside them, and the app ignores the compiled templates once the sources no longer match it.
+
+    Args:
+        target (string): the folder to write the compiled templates to
+
+    Returns:
+        int: the number of templates compiled
+    """
+    # the previous build is removed before the app is imported, so that the app loads the template sources rather than the compiled modules
+    if os.path.exists(target):
+        shutil.rmtree(target)
+
+    from app import app
+    from functions.cache import hash_files
+    from functions.templating import template_hash_filename
+
+    os.makedirs(target)
+
+    template_names = app.jinja_env.list_templates()
+    app.jinja_env.compile_templates(target, zip=None, ignore_errors=False)
+    with open(f"{target}/{template_hash_filename}", 'w') as f:
+        f.write(hash_files([f"{app.root_path}/{app.template_folder}"]))
+    return len(template_names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompile the Jinja templates for the deployment package')
+    parser.add_argument('--output', default='compiled_templates', help='the folder to write the compiled templates to')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    template_count = precompile_templates(args.output)
+    print (f"Compiled {template_count} templates to {args.output} in {round(time.perf_counter() - start, 2)}s")
+
+
+if __name__ == '__main__':
+    main()